@@ -0,0 +1,135 @@
+"""Deterministic synthetic PDF and DOCX documents for the benchmarks."""
+
+import random
+import zipfile
+from io import BytesIO
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+
+TABLE_HEADERS = ["Project Name", "Task Name", "Start Date", "Days Required", "Progress"]
+_WORDS = (
+    "alpha beta gamma delta review design build deploy test audit plan report "
+    "budget vendor release migration support network storage security"
+).split()
+
+
+def _table_rows(rng: random.Random, count: int) -> List[List[str]]:
+    return [
+        [
+            f"Project {rng.choice(_WORDS).title()}",
+            rng.choice(_WORDS).title(),
+            f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}",
+            str(rng.randint(1, 60)),
+            f"{rng.randint(0, 100)}%",
+        ]
+        for _ in range(count)
+    ]
+
+
+def _aligned_lines(rows: List[List[str]]) -> List[str]:
+    """Render rows as fixed-width text columns separated by at least two spaces."""
+    widths = [max(len(r[i]) for r in rows) + 2 for i in range(len(rows[0]))]
+    return ["".join(c.ljust(w) for c, w in zip(r, widths)).rstrip() for r in rows]
+
+
+def _free_text_lines(rng: random.Random, count: int) -> List[str]:
+    lines = []
+    for i in range(count):
+        if i % 3 == 0:
+            lines.append(f"owner: {rng.choice(_WORDS)}, status: {rng.choice(_WORDS)}")
+        else:
+            lines.append(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 12))))
+    return lines
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Build a minimal uncompressed PDF with one text line per list entry."""
+    objects = []
+    font_id = 3 + 2 * len(pages)
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    for i, lines in enumerate(pages):
+        ops = " ".join(f"({_pdf_string(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 8 Tf 10 TL 30 780 Td {ops} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>")
+
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n".encode()
+    )
+    return out.getvalue()
+
+
+def make_docx(paragraphs: List[str], table: Optional[List[List[str]]] = None) -> bytes:
+    """Build a minimal DOCX with the given paragraphs and an optional table."""
+
+    def paragraph(text: str) -> str:
+        return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+    body = "".join(paragraph(p) for p in paragraphs)
+    if table:
+        rows = "".join(
+            "<w:tr>" + "".join(f"<w:tc>{paragraph(c)}</w:tc>" for c in row) + "</w:tr>"
+            for row in table
+        )
+        body += f"<w:tbl>{rows}</w:tbl>"
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>'
+    )
+    out = BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        # fixed timestamps keep the archive bytes deterministic
+        for name, data in (("[Content_Types].xml", content_types), ("word/document.xml", document)):
+            info = zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, data)
+    return out.getvalue()
+
+
+def build_corpus(seed: int = 7) -> Dict[str, bytes]:
+    """Return named documents covering small/large, table/free-text and many-page cases."""
+    rng = random.Random(seed)
+    header = [TABLE_HEADERS]
+
+    def table_page(rows: int) -> List[str]:
+        return _aligned_lines(header + _table_rows(rng, rows))
+
+    return {
+        "pdf_small_table.pdf": make_pdf([table_page(10)]),
+        "pdf_large_table.pdf": make_pdf([table_page(60) for _ in range(20)]),
+        "pdf_free_text.pdf": make_pdf([_free_text_lines(rng, 50) for _ in range(5)]),
+        "pdf_many_pages.pdf": make_pdf([table_page(40) for _ in range(250)]),
+        "docx_small_table.docx": make_docx(["Status report"], header + _table_rows(rng, 10)),
+        "docx_large_table.docx": make_docx(["Status report"], header + _table_rows(rng, 5000)),
+        "docx_aligned_text.docx": make_docx(_aligned_lines(header + _table_rows(rng, 500))),
+        "docx_free_text.docx": make_docx(_free_text_lines(rng, 2000)),
+    }
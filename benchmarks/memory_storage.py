@@ -0,0 +1,108 @@
+import hashlib
+import itertools
+import threading
+from io import BytesIO
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from app.interfaces.storage_interface import (
+    ConcurrentModificationError,
+    IStorage,
+    StoredObject,
+)
+from app.utils.streams import iter_blocks
+
+
+class InMemoryStorage(IStorage):
+    """Process-local IStorage stand-in so benchmarks measure our code, not the network.
+
+    Objects are kept as bytearrays so appends are amortized O(1), and ETags
+    are write counters rather than content hashes.
+    """
+
+    def __init__(self):
+        self._objects: Dict[str, bytearray] = {}
+        self._etags: Dict[str, str] = {}
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _url(self, name: str) -> str:
+        return f"memory://{name}"
+
+    def _put(self, name: str, data: bytes):
+        self._objects[name] = bytearray(data)
+        self._etags[name] = str(next(self._versions))
+
+    def save(self, name: str, data: bytes) -> str:
+        with self._lock:
+            self._put(name, data)
+        return self._url(name)
+
+    def save_if_match(self, name: str, data: bytes, etag: Optional[str]) -> str:
+        with self._lock:
+            if self._etags.get(name) != etag:
+                raise ConcurrentModificationError(name)
+            self._put(name, data)
+            return self._etags[name]
+
+    def create(self, name: str, data: bytes) -> bool:
+        with self._lock:
+            if name in self._objects:
+                return False
+            self._put(name, data)
+        return True
+
+    def save_stream(
+        self, name: str, source: Union[BinaryIO, Iterable[bytes]]
+    ) -> StoredObject:
+        digest = hashlib.sha256()
+        data = bytearray()
+        for block in iter_blocks(source):
+            digest.update(block)
+            data += block
+        self.save(name, data)
+        return StoredObject(url=self._url(name), size=len(data), sha256=digest.hexdigest())
+
+    def get(self, name: str) -> bytes:
+        return self.get_range(name)
+
+    def open(self, name: str) -> BinaryIO:
+        return BytesIO(self.get(name))
+
+    def open_versioned(self, name: str) -> Tuple[BinaryIO, str]:
+        with self._lock:
+            if name not in self._objects:
+                raise FileNotFoundError(name)
+            return BytesIO(bytes(self._objects[name])), self._etags[name]
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            self._objects.pop(name, None)
+            self._etags.pop(name, None)
+
+    def list(self, prefix: str = "") -> Iterator[str]:
+        with self._lock:
+            names = [name for name in self._objects if name.startswith(prefix)]
+        return iter(sorted(names))
+
+    def append(self, name: str, data: bytes, expected_offset: Optional[int] = None) -> int:
+        with self._lock:
+            current = self._objects.setdefault(name, bytearray())
+            offset = len(current)
+            if expected_offset is not None and offset != expected_offset:
+                raise ConcurrentModificationError(name)
+            current += data
+            self._etags[name] = str(next(self._versions))
+            return offset
+
+    def get_range(self, name: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        with self._lock:
+            if name not in self._objects:
+                raise FileNotFoundError(name)
+            end = None if length is None else offset + length
+            return bytes(self._objects[name][offset:end])
+
+    def get_etag(self, name: str) -> str:
+        with self._lock:
+            if name not in self._etags:
+                raise FileNotFoundError(name)
+            return self._etags[name]
@@ -0,0 +1,202 @@
+"""Time the document pipeline's hot paths on a synthetic corpus.
+
+Usage::
+
+    python -m app.benchmarks.run --output bench.json
+    python -m app.benchmarks.run --output new.json --baseline bench.json
+
+Results are written as JSON; with ``--baseline`` every benchmark whose
+median is slower than the baseline by more than ``--threshold`` is reported
+and the process exits with status 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+from typing import Callable, Dict
+
+# compaction is triggered explicitly below instead of on a background timer
+os.environ.setdefault("EXCEL_COMPACT_INTERVAL_SECONDS", "0")
+
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+from app.benchmarks.corpus import build_corpus  # noqa: E402
+from app.benchmarks.memory_storage import InMemoryStorage  # noqa: E402
+from app.implementations.docx_parser import DocxParser  # noqa: E402
+from app.implementations.excel_repository import ExcelRepository  # noqa: E402
+from app.implementations.pdf_parser import PdfParser  # noqa: E402
+from app.implementations.sqlite_record_repository import SqliteRecordRepository  # noqa: E402
+from app.services.document_service import DocumentService  # noqa: E402
+from app.utils.file_validator import validate_file  # noqa: E402
+
+APPEND_ROW_COUNTS = (100, 1000, 10000)
+
+
+def _measure(fn: Callable[[], object], repeat: int, setup: Callable[[], None] = None) -> dict:
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "runs": runs,
+    }
+
+
+def _file_storage(name: str, data: bytes) -> FileStorage:
+    return FileStorage(stream=BytesIO(data), filename=name)
+
+
+def _fragment_records(groups: int) -> list:
+    """Records shaped like the single-value fragments _consolidate_records merges."""
+    lines = []
+    for i in range(groups):
+        lines += [
+            {"Project": f"Project {i}"},
+            {"Task": f"Task {i}", "Progress": "Owner"},
+            {"Start": "20240101"},
+            {"Days": str(i % 30)},
+            {"End": "20240201"},
+            {"Pct": f"{i % 100}%"},
+        ]
+    return lines
+
+
+def run_benchmarks(repeat: int = 5) -> Dict[str, dict]:
+    corpus = build_corpus()
+    results = {}
+
+    for name, data in corpus.items():
+        results[f"validate_file[{name}]"] = _measure(
+            lambda: validate_file(_file_storage(name, data)), repeat
+        )
+
+    pdf_parser = PdfParser()
+    serial_pdf_parser = PdfParser(workers=1)
+    docx_parser = DocxParser()
+    for name, data in corpus.items():
+        if name.endswith(".pdf"):
+            results[f"PdfParser.parse[{name}]"] = _measure(lambda: pdf_parser.parse(data), repeat)
+            results[f"PdfParser.parse[{name},serial]"] = _measure(
+                lambda: serial_pdf_parser.parse(data), repeat
+            )
+        else:
+            results[f"DocxParser.parse[{name}]"] = _measure(
+                lambda: docx_parser.parse(data), repeat
+            )
+
+    storage = InMemoryStorage()
+    service = DocumentService(storage=storage, excel_repo=ExcelRepository(storage))
+    for groups in (100, 5000):
+        fragments = _fragment_records(groups)
+        results[f"DocumentService._consolidate_records[{groups * 6}_fragments]"] = _measure(
+            lambda: list(service._consolidate_records(fragments)), repeat
+        )
+
+    json_data = pdf_parser.parse(corpus["pdf_small_table.pdf"])
+    record = {"id": "doc.pdf", "filename": "doc.pdf", "file_type": "pdf", "json_data": json_data}
+    for rows in APPEND_ROW_COUNTS:
+        storage = InMemoryStorage()
+        repo = ExcelRepository(storage)
+        repo.append_many([record] * rows)
+        repo.compact()
+        results[f"ExcelRepository.append[{rows}_rows]"] = _measure(
+            lambda: repo.append(record), repeat
+        )
+        results[f"ExcelRepository.compact[{rows}_rows]"] = _measure(
+            repo.compact, repeat, setup=lambda: repo.append(record)
+        )
+
+        service = DocumentService(storage=storage, excel_repo=repo)
+        results[f"get_excel[{rows}_rows,cold]"] = _measure(
+            lambda: service.get_excel_page(), repeat, setup=service._view_cache.invalidate
+        )
+        results[f"get_excel[{rows}_rows,page_100]"] = _measure(
+            lambda: service.get_excel_page(offset=rows // 2, limit=100),
+            repeat,
+            setup=service._view_cache.invalidate,
+        )
+        service.get_excel_page()
+        results[f"get_excel[{rows}_rows,cached]"] = _measure(
+            lambda: service.get_excel_page(), repeat
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in APPEND_ROW_COUNTS:
+            repo = SqliteRecordRepository(os.path.join(tmp, f"records_{rows}.db"))
+            repo.append_many([record] * rows)
+            results[f"SqliteRecordRepository.append[{rows}_rows]"] = _measure(
+                lambda: repo.append(record), repeat
+            )
+            service = DocumentService(storage=InMemoryStorage(), excel_repo=repo)
+            results[f"get_excel[{rows}_rows,sqlite,cold]"] = _measure(
+                lambda: service.get_excel_page(), repeat, setup=service._view_cache.invalidate
+            )
+            results[f"SqliteRecordRepository.get_stream[{rows}_rows]"] = _measure(
+                lambda: repo.get_stream().close(), repeat, setup=lambda: repo.append(record)
+            )
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> list:
+    """Return (name, baseline_median, median) for benchmarks that regressed."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous and result["median"] > previous["median"] * (1 + threshold):
+            regressions.append((name, previous["median"], result["median"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed slowdown ratio, 0.2 = 20%%"
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(repeat=args.repeat)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+
+    width = max(len(name) for name in results)
+    for name, result in results.items():
+        print(f"{name:<{width}}  median={result['median'] * 1000:10.3f} ms")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Ingest an archive directory, or reprocess stored documents, in parallel.
+
+Usage::
+
+    python -m app.cli.bulk_ingest --dir /archive
+    python -m app.cli.bulk_ingest --reprocess
+
+``--dir`` validates, stores and parses every allowed file below the
+directory, exactly like a batch upload. ``--reprocess`` parses the raw
+documents already stored under their ``<uuid>.<ext>`` names again with the
+current parsers and replaces the json_data of their existing rows; a stored
+document without a row is appended. Documents are prepared on a pool of worker processes and their
+rows are written in bulk. Sources are added to the checkpoint file
+after each bulk write, and a rerun with the same checkpoint skips them;
+a source whose rows were written just before a crash is ingested again,
+which appends its rows a second time unless it is being reprocessed.
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from typing import Iterator, Optional, Set, Tuple
+
+from werkzeug.datastructures import FileStorage
+
+from app.implementations.pdf_parser import PdfParser
+from app.implementations.storage_factory import create_record_repository, create_storage
+from app.logging_config import get_logger, setup_logging
+from app.services.document_service import BatchItemResult, DocumentService
+from app.utils.file_validator import ALLOWED_EXTENSIONS
+from app.utils.parse_session import ParseSession
+
+logger = get_logger(__name__)
+
+# raw documents are stored at the container root as <uuid4>.<ext>
+RAW_DOCUMENT_NAME = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.(?:"
+    + "|".join(sorted(ALLOWED_EXTENSIONS))
+    + r")$"
+)
+# seconds between progress log lines
+PROGRESS_INTERVAL_SECONDS = 10
+
+# per worker process; set by _init_worker
+_worker_service: Optional[DocumentService] = None
+_worker_filenames: dict = {}
+
+
+def _init_worker(filenames: dict):
+    global _worker_service, _worker_filenames
+    setup_logging()
+    _worker_service = DocumentService(storage=create_storage())
+    # documents are already spread over the worker processes
+    _worker_service.parsers["pdf"] = PdfParser(workers=1)
+    _worker_filenames = filenames
+
+
+def _prepare_file(task: Tuple[str, str]):
+    """Worker entry point for --dir: validate, store and parse one archive file."""
+    key, path = task
+    try:
+        with open(path, "rb") as fh:
+            prepared = _worker_service.prepare_item(
+                FileStorage(stream=fh, filename=os.path.basename(path))
+            )
+    except OSError as e:
+        result = BatchItemResult(filename=os.path.basename(path), error=str(e))
+        return key, (result, None, None)
+    return key, prepared
+
+
+def _reprocess_blob(task: Tuple[str, str]):
+    """Worker entry point for --reprocess: parse one stored document again."""
+    key, blob_name = task
+    ext = blob_name.rsplit(".", 1)[-1]
+    filename = _worker_filenames.get(blob_name, blob_name)
+    result = BatchItemResult(filename=filename, id=blob_name)
+    try:
+        with _worker_service.storage.open(blob_name) as stream:
+            session = ParseSession.open(ext, stream)
+            try:
+                digest = _worker_service.content_digest(session)
+                json_data = _worker_service.parse_document(session)
+            finally:
+                session.close()
+    except Exception as e:
+        logger.exception("Reprocessing failed: blob_id='%s'", blob_name)
+        result.error = str(e) or type(e).__name__
+        return key, (result, None, None)
+    record = DocumentService.repository_record(blob_name, filename, ext, json_data)
+    # the digest lets the content hash index entry follow the new records
+    return key, (result, record, digest)
+
+
+def _archive_tasks(root: str) -> Iterator[Tuple[str, str]]:
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if name.rsplit(".", 1)[-1].lower() in ALLOWED_EXTENSIONS:
+                path = os.path.join(directory, name)
+                yield os.path.relpath(path, root), path
+
+
+def _stored_tasks(service: DocumentService) -> Iterator[Tuple[str, str]]:
+    for name in service.storage.list():
+        if RAW_DOCUMENT_NAME.match(name):
+            yield name, name
+
+
+def _stored_filenames(service: DocumentService) -> dict:
+    """Map blob names to their original upload names, which live in the repository rows."""
+    try:
+        return {document["id"]: document["filename"] for document in service.iter_documents()}
+    except FileNotFoundError:
+        return {}
+
+
+def _read_checkpoint(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as fh:
+        return {line.rstrip("\n") for line in fh if line.strip()}
+
+
+class _Checkpoint:
+    """Append-only file of finished source keys, synced after every bulk append."""
+
+    def __init__(self, path: str):
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def add(self, keys):
+        for key in keys:
+            self._fh.write(key + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self):
+        self._fh.close()
+
+
+def run(
+    service: DocumentService,
+    tasks: Iterator[Tuple[str, str]],
+    worker,
+    checkpoint_path: str,
+    workers: int,
+    batch_size: int,
+    filenames: Optional[dict] = None,
+    replace: bool = False,
+) -> dict:
+    """Prepare tasks on a process pool and write their rows in batches.
+
+    With ``replace``, documents whose id is in ``filenames`` (those that
+    already have rows) replace the json_data of their rows; all others are
+    appended. Returns counts of recorded, skipped (finished in an earlier
+    run or duplicates) and failed sources.
+    """
+    existing = filenames if replace and filenames else {}
+    done = _read_checkpoint(checkpoint_path)
+    tasks = list(tasks)
+    pending = [task for task in tasks if task[0] not in done]
+    # the checkpoint may name sources that are no longer among the tasks
+    stats = {"recorded": 0, "skipped": len(tasks) - len(pending), "failed": 0}
+    logger.info(
+        "Bulk ingest started: pending=%d, already_done=%d, workers=%d",
+        len(pending),
+        stats["skipped"],
+        workers,
+    )
+    checkpoint = _Checkpoint(checkpoint_path)
+    started = last_progress = time.perf_counter()
+    batch = []
+
+    def flush():
+        replaced, appended = [], []
+        for _, item in batch:
+            record = item[1]
+            (replaced if record is not None and record["id"] in existing else appended).append(item)
+        stats["recorded"] += len(service.replace_prepared(replaced))
+        stats["recorded"] += len(service.record_prepared(appended))
+        # failed items stay out of the checkpoint so a rerun retries them
+        checkpoint.add(key for key, (result, _, _) in batch if not result.error)
+        batch.clear()
+
+    # spawn: forking a process with storage clients and threads is not safe
+    context = multiprocessing.get_context("spawn")
+    try:
+        with context.Pool(workers, initializer=_init_worker, initargs=(filenames or {},)) as pool:
+            for key, prepared in pool.imap_unordered(worker, pending):
+                result, record, _ = prepared
+                if result.error:
+                    stats["failed"] += 1
+                    logger.warning(
+                        "Bulk ingest item failed: source='%s', reason=%s", key, result.error
+                    )
+                elif record is None:
+                    stats["skipped"] += 1
+                batch.append((key, prepared))
+                if len(batch) >= batch_size:
+                    flush()
+                now = time.perf_counter()
+                if now - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                    last_progress = now
+                    logger.info(
+                        "Bulk ingest progress: recorded=%d, failed=%d, docs_per_second=%.1f",
+                        stats["recorded"],
+                        stats["failed"],
+                        stats["recorded"] / (now - started),
+                    )
+            if batch:
+                flush()
+    finally:
+        checkpoint.close()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Bulk ingest completed: recorded=%d, skipped=%d, failed=%d, seconds=%.3f",
+        stats["recorded"],
+        stats["skipped"],
+        stats["failed"],
+        stats["seconds"],
+    )
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="archive directory to ingest")
+    source.add_argument(
+        "--reprocess", action="store_true", help="parse stored raw documents again"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--batch-size", type=int, default=200, help="rows appended per repository write"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default="bulk_ingest.checkpoint",
+        help="file of finished sources; reruns skip them",
+    )
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    storage = create_storage()
+    service = DocumentService(storage=storage, excel_repo=create_record_repository(storage))
+    if args.dir:
+        tasks, worker, filenames = _archive_tasks(args.dir), _prepare_file, None
+    else:
+        tasks, worker = _stored_tasks(service), _reprocess_blob
+        filenames = _stored_filenames(service)
+    try:
+        stats = run(
+            service,
+            tasks,
+            worker,
+            args.checkpoint,
+            args.workers,
+            args.batch_size,
+            filenames,
+            replace=args.reprocess,
+        )
+    finally:
+        close = getattr(service.excel_repo, "close", None)
+        if close is not None:
+            # materialize journaled rows before exiting
+            close()
+    print(
+        f"recorded={stats['recorded']} skipped={stats['skipped']} "
+        f"failed={stats['failed']} seconds={stats['seconds']}"
+    )
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
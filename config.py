@@ -5,3 +5,9 @@ class Config:
     AZURE_STORAGE_CONNECTION_STRING = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
     AZURE_CONTAINER = os.environ.get("AZURE_CONTAINER", "documents")
     EXCEL_PATH = os.environ.get("EXCEL_PATH", "./data/data.xlsx")
+    # "azure" stores documents in blob storage, "local" under LOCAL_STORAGE_ROOT
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "azure").lower()
+    LOCAL_STORAGE_ROOT = os.environ.get("LOCAL_STORAGE_ROOT", "./data/storage")
+    # "excel" keeps records in the journaled workbook blob, "sqlite" in SQLITE_PATH
+    RECORD_STORE = os.environ.get("RECORD_STORE", "excel").lower()
+    SQLITE_PATH = os.environ.get("SQLITE_PATH", "./data/records.db")
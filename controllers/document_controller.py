@@ -1,14 +1,62 @@
+import csv
+import io
 import json
-from openpyxl import load_workbook
-from flask import jsonify, request
+import os
+import threading
+import time
 
+from flask import Response, jsonify, request, url_for
+
+from app.implementations.storage_factory import create_record_repository, create_storage
+from app.interfaces.excel_interface import DOCUMENT_FIELDS, RecordQuery
 from app.logging_config import get_logger
 from app.services.document_service import DocumentService
 from app.utils.file_validator import validate_file
+from app.utils.metrics import metrics
+
+# upper bound for the page size a client may request from get_excel
+MAX_PAGE_LIMIT = int(os.environ.get("EXCEL_MAX_PAGE_LIMIT", "1000"))
+# maximum number of files accepted by one batch upload
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "500"))
+# page size of the records query when the client does not pass a limit
+RECORDS_DEFAULT_LIMIT = int(os.environ.get("RECORDS_DEFAULT_LIMIT", "100"))
+# query parameters with this prefix filter on top-level record fields
+FIELD_FILTER_PREFIX = "field."
+# bytes buffered per chunk of a streamed export
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+EXPORT_CSV_COLUMNS = ("id", "filename", "file_type", "transformed_data")
+# "async" makes every upload return 202 and ingest on the worker pool
+INGEST_MODE = os.environ.get("INGEST_MODE", "sync").lower()
 
-service = DocumentService()
 logger = get_logger(__name__)
 
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> DocumentService:
+    """Build the document service on first use so importing this module stays cheap."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                started = time.perf_counter()
+                with metrics.stage("startup", "service_init"):
+                    storage = create_storage()
+                    _service = DocumentService(
+                        storage=storage, excel_repo=create_record_repository(storage)
+                    )
+                logger.info(
+                    "Document service initialized on first use: init_seconds=%.3f",
+                    time.perf_counter() - started,
+                )
+    return _service
+
 
 def upload_document():
     logger.info("Upload request received")
@@ -18,19 +66,30 @@ def upload_document():
         return jsonify({"error": "No file provided"}), 400
 
     try:
-        validate_file(file)
+        with metrics.stage("upload", "validate"):
+            session = validate_file(file)
     except ValueError as e:
         logger.warning("Upload request rejected: validation failed (%s)", str(e))
         return jsonify({"error": str(e)}), 400
 
+    if _wants_async():
+        try:
+            return _submit_upload(file, session)
+        finally:
+            session.close()
+
     try:
-        result = service.process_upload(file.stream, file.filename)
+        with metrics.stage("upload", "process"):
+            result = get_service().process_upload(file.stream, file.filename, session=session)
     except ValueError as e:
         logger.warning("Upload request rejected by service: %s", str(e))
         return jsonify({"error": str(e)}), 400
     except Exception:
         logger.exception("Upload request failed due to an unexpected server error")
         return jsonify({"error": "Internal server error"}), 500
+    finally:
+        # releases the memory map or spill file of a large upload
+        session.close()
     logger.info(
         "Upload request completed: filename='%s', document_id='%s'",
         file.filename,
@@ -39,87 +98,312 @@ def upload_document():
     return jsonify(result.__dict__), 201
 
 
+def upload_batch():
+    files = [f for f in request.files.getlist("files") if f]
+    logger.info("Batch upload request received: files=%d", len(files))
+    if not files:
+        logger.warning("Batch upload request rejected: missing file parts 'files'")
+        return jsonify({"error": "No files provided"}), 400
+    if len(files) > BATCH_MAX_FILES:
+        logger.warning("Batch upload request rejected: files=%d exceeds limit", len(files))
+        return jsonify({"error": f"At most {BATCH_MAX_FILES} files per batch"}), 400
+
+    try:
+        results = get_service().process_batch(files)
+    except Exception:
+        logger.exception("Batch upload request failed due to an unexpected server error")
+        return jsonify({"error": "Internal server error"}), 500
+    failed = sum(1 for r in results if r.error)
+    logger.info(
+        "Batch upload request completed: files=%d, failed=%d", len(results), failed
+    )
+    return jsonify(
+        {
+            "results": [r.__dict__ for r in results],
+            "succeeded": len(results) - failed,
+            "failed": failed,
+        }
+    ), 200
+
+
+def _wants_async() -> bool:
+    flag = request.args.get("async")
+    if flag is None:
+        return INGEST_MODE == "async"
+    return flag.lower() in ("1", "true", "yes")
+
+
+def _submit_upload(file, session):
+    try:
+        job = get_service().submit_upload(file.stream, file.filename, session=session)
+    except ValueError as e:
+        logger.warning("Upload request rejected by service: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        logger.exception("Upload request failed due to an unexpected server error")
+        return jsonify({"error": "Internal server error"}), 500
+    status_url = url_for("documents.get_job_route", job_id=job.id)
+    logger.info(
+        "Upload request accepted for async ingest: filename='%s', job_id='%s'",
+        file.filename,
+        job.id,
+    )
+    return jsonify({**job.to_dict(), "status_url": status_url}), 202, {"Location": status_url}
+
+
+def get_metrics():
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def get_job(job_id):
+    logger.info("Job status request received: job_id='%s'", job_id)
+    job = get_service().get_job(job_id)
+    if job is None:
+        logger.warning("Job status request failed: job_id='%s' not found", job_id)
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+
+def _parse_page_args():
+    """Read the optional limit/cursor query parameters of the Excel listing."""
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor", "0")
+    try:
+        limit = int(limit) if limit is not None else None
+        cursor = int(cursor)
+    except ValueError:
+        raise ValueError("limit and cursor must be integers")
+    if limit is not None and not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+    if cursor < 0:
+        raise ValueError("cursor must not be negative")
+    return limit, cursor
+
+
 def get_excel():
     try:
         logger.info("Excel fetch request received")
-        stream = service.get_excel_stream()
-        # parse workbook in-memory and return structured JSON for all entries
-
-        stream.seek(0)
-        wb = load_workbook(stream)
-        ws = wb.active
-
-        rows = list(ws.iter_rows(values_only=True))
-        if not rows or len(rows) < 2:
-            return jsonify({"data": []}), 200
-
-        headers = [h for h in rows[0]]
-        # common column names that may contain transformed JSON
-        json_cols = [
-            name for name in ("json_data", "transformed_data") if name in headers
-        ]
-        json_col_idx = headers.index(json_cols[0]) if json_cols else None
-
-        # locate id/filename/file_type indices if present
-        id_idx = headers.index("id") if "id" in headers else None
-        filename_idx = headers.index("filename") if "filename" in headers else None
-        filetype_idx = headers.index("file_type") if "file_type" in headers else None
-
-        entries = []
-        for r in rows[1:]:
-            entry = {
-                "id": r[id_idx] if id_idx is not None else None,
-                "filename": r[filename_idx] if filename_idx is not None else None,
-                "file_type": r[filetype_idx] if filetype_idx is not None else None,
-                "transformed_data": [],
-            }
-
-            if json_col_idx is not None:
-                cell = r[json_col_idx]
-                if not cell:
-                    entry["transformed_data"] = []
-                elif isinstance(cell, str):
-                    lines = [l for l in cell.splitlines() if l.strip()]
-                    parsed = []
-                    for ln in lines:
-                        try:
-                            val = json.loads(ln)
-                        except Exception:
-                            # if the cell is a JSON array
-                            try:
-                                val = json.loads(cell)
-                                if isinstance(val, list):
-                                    parsed.extend(val)
-                                    break
-                            except Exception:
-                                val = ln
-                        if isinstance(val, list):
-                            parsed.extend(val)
-                        else:
-                            parsed.append(val)
-                    entry["transformed_data"] = parsed
-                else:
-                    # non-string (unlikely) - include raw
-                    entry["transformed_data"] = [cell]
-            else:
-                # reconstruct object from all columns except id/filename/file_type
-                obj = {}
-                for k, val in zip(headers, r):
-                    if k in ("id", "filename", "file_type"):
-                        continue
-                    obj[k] = val
-                entry["transformed_data"] = [obj]
-
-            entries.append(entry)
+        try:
+            limit, cursor = _parse_page_args()
+        except ValueError as e:
+            logger.warning("Excel fetch request rejected: %s", str(e))
+            return jsonify({"error": str(e)}), 400
+
+        version = get_service().get_excel_version()
+        headers = {"ETag": f'"{version}"'}
+        if request.if_none_match.contains(version):
+            logger.info("Excel fetch request not modified: version='%s'", version)
+            return "", 304, headers
+
+        # decode only the requested page using read-only workbook iteration
+        with metrics.stage("get_excel", "page"):
+            page = get_service().get_excel_page(offset=cursor, limit=limit, version=version)
+        entries, total = page.entries, page.total
+        next_cursor = cursor + len(entries)
+        body = {
+            "data": entries,
+            "next_cursor": next_cursor if next_cursor < total else None,
+        }
+        headers["X-Total-Count"] = str(total)
 
         logger.info(
-            "Excel fetch request completed successfully: returned_entries=%d",
+            "Excel fetch request completed successfully: returned_entries=%d, cursor=%d, total=%d",
             len(entries),
+            cursor,
+            total,
         )
-        return jsonify({"data": entries}), 200
+        return jsonify(body), 200, headers
     except FileNotFoundError:
         logger.warning("Excel fetch request failed: workbook file not found")
         return jsonify({"error": "Excel file not found"}), 404
     except Exception:
         logger.exception("Excel fetch request failed due to an unexpected server error")
         return jsonify({"error": "Internal server error"}), 500
+
+
+def _parse_record_query() -> RecordQuery:
+    """Build a RecordQuery from the filter, fields, sort and page parameters."""
+    limit, cursor = _parse_page_args()
+    query = RecordQuery(offset=cursor, limit=limit or RECORDS_DEFAULT_LIMIT)
+    for name in DOCUMENT_FIELDS:
+        if name in request.args:
+            query.filters[name] = request.args[name]
+    for name, value in request.args.items():
+        if name.startswith(FIELD_FILTER_PREFIX) and len(name) > len(FIELD_FILTER_PREFIX):
+            query.field_filters[name[len(FIELD_FILTER_PREFIX):]] = value
+    fields = request.args.get("fields")
+    if fields:
+        query.fields = [f.strip() for f in fields.split(",") if f.strip()]
+    sort = request.args.get("sort", "").strip()
+    if sort:
+        query.descending = sort.startswith("-")
+        query.sort = sort.lstrip("-") or None
+    return query
+
+
+def query_records():
+    logger.info("Records query request received")
+    try:
+        query = _parse_record_query()
+    except ValueError as e:
+        logger.warning("Records query request rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        records, total = get_service().query_records(query)
+    except Exception:
+        logger.exception("Records query request failed due to an unexpected server error")
+        return jsonify({"error": "Internal server error"}), 500
+    next_cursor = query.offset + len(records)
+    logger.info(
+        "Records query request completed: filters=%s, field_filters=%s, returned=%d, total=%d",
+        query.filters,
+        query.field_filters,
+        len(records),
+        total,
+    )
+    body = {"data": records, "next_cursor": next_cursor if next_cursor < total else None}
+    return jsonify(body), 200, {"X-Total-Count": str(total)}
+
+
+def _export_format():
+    """Pick the export format from ?format= or the Accept header; None if none fits."""
+    requested = request.args.get("format")
+    if requested:
+        if requested not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        return requested
+    if not request.accept_mimetypes:
+        # no Accept header: NDJSON is the default representation
+        return "ndjson"
+    best = request.accept_mimetypes.best_match(list(EXPORT_FORMATS.values()))
+    return next((name for name, mimetype in EXPORT_FORMATS.items() if mimetype == best), None)
+
+
+def _chunked(pieces):
+    """Join small string pieces into chunks of about EXPORT_CHUNK_SIZE characters."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _ndjson_lines(entries):
+    for entry in entries:
+        yield json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+
+
+def _csv_lines(entries):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    for entry in entries:
+        writer.writerow(
+            [
+                entry["id"],
+                entry["filename"],
+                entry["file_type"],
+                json.dumps(entry["transformed_data"], ensure_ascii=False, default=str),
+            ]
+        )
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue()
+
+
+def _file_chunks(stream, start: int, stop: int):
+    """Yield stream[start:stop] in EXPORT_CHUNK_SIZE reads and close the stream."""
+    try:
+        stream.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = stream.read(min(EXPORT_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        stream.close()
+
+
+def _export_workbook(stream, etag: str, headers: dict):
+    """Pass the workbook file through, honouring a single Range request.
+
+    ``etag`` must describe the bytes of ``stream``; If-Range relies on it.
+    """
+    size = stream.seek(0, io.SEEK_END)
+    headers["Accept-Ranges"] = "bytes"
+    start, stop, status = 0, size, 200
+
+    byte_range = request.range
+    if_range = request.if_range
+    # a stale If-Range validator means the client gets the whole new file
+    range_current = if_range.date is None and if_range.etag in (None, etag)
+    if byte_range is not None and range_current and len(byte_range.ranges) == 1:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            stream.close()
+            headers["Content-Range"] = f"bytes */{size}"
+            return jsonify({"error": "Requested range not satisfiable"}), 416, headers
+        start, stop = bounds
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    headers["Content-Length"] = str(stop - start)
+    return Response(
+        _file_chunks(stream, start, stop),
+        status=status,
+        mimetype=EXPORT_FORMATS["xlsx"],
+        headers=headers,
+    )
+
+
+def export_excel():
+    logger.info("Excel export request received")
+    try:
+        fmt = _export_format()
+    except ValueError as e:
+        logger.warning("Excel export request rejected: %s", str(e))
+        return jsonify({"error": str(e)}), 400
+    if fmt is None:
+        logger.warning("Excel export request rejected: no acceptable format")
+        return jsonify({"error": "Not acceptable", "formats": list(EXPORT_FORMATS.values())}), 406
+
+    try:
+        stream = None
+        if fmt == "xlsx":
+            # the tag must come from the same open as the bytes sent under it
+            stream, version = get_service().get_excel_versioned_stream()
+        else:
+            version = get_service().get_excel_version()
+        # each format is its own representation, so each gets its own tag
+        etag = f"{version}.{fmt}"
+        headers = {
+            "ETag": f'"{etag}"',
+            "Vary": "Accept",
+            "Content-Disposition": f'attachment; filename="export.{fmt}"',
+        }
+        if request.if_none_match.contains(etag):
+            logger.info("Excel export request not modified: version='%s'", version)
+            if stream is not None:
+                stream.close()
+            return "", 304, headers
+        if stream is not None:
+            response = _export_workbook(stream, etag, headers)
+        else:
+            entries = get_service().iter_excel_entries()
+            lines = _ndjson_lines(entries) if fmt == "ndjson" else _csv_lines(entries)
+            response = Response(_chunked(lines), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+    except FileNotFoundError:
+        logger.warning("Excel export request failed: workbook file not found")
+        return jsonify({"error": "Excel file not found"}), 404
+    except Exception:
+        logger.exception("Excel export request failed due to an unexpected server error")
+        return jsonify({"error": "Internal server error"}), 500
+    logger.info("Excel export response started: format=%s, version='%s'", fmt, version)
+    return response
@@ -1,9 +1,82 @@
+import base64
+import hashlib
+import io
 import os
-from typing import Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
 
-from azure.storage.blob import BlobClient, BlobServiceClient, ContainerClient
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.storage.blob import BlobBlock, BlobClient, BlobServiceClient, ContainerClient
 
-from app.interfaces.storage_interface import IStorage
+from app.interfaces.storage_interface import (
+    ConcurrentModificationError,
+    IStorage,
+    ObjectFullError,
+    StoredObject,
+)
+from app.utils.streams import DEFAULT_BLOCK_SIZE, iter_blocks
+
+# size of each staged block and number of blocks uploaded concurrently
+UPLOAD_BLOCK_SIZE = int(os.environ.get("AZURE_UPLOAD_BLOCK_SIZE", str(DEFAULT_BLOCK_SIZE)))
+UPLOAD_CONCURRENCY = int(os.environ.get("AZURE_UPLOAD_CONCURRENCY", "4"))
+# bytes fetched per ranged download when a blob is read through open()
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("AZURE_DOWNLOAD_CHUNK_SIZE", str(DEFAULT_BLOCK_SIZE)))
+
+
+class _BlobRangeReader(io.RawIOBase):
+    """Seekable reader that downloads only the byte ranges that are read.
+
+    Every range is requested with If-Match on the ETag seen when the reader
+    was opened, so a blob replaced mid-read fails instead of mixing versions.
+    """
+
+    def __init__(self, blob_client: BlobClient, size: int, etag: str):
+        self._client = blob_client
+        self._size = size
+        self._etag = etag
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self._size - self._pos)
+        if length <= 0:
+            return 0
+        data = self._client.download_blob(
+            offset=self._pos,
+            length=length,
+            etag=self._etag,
+            match_condition=MatchConditions.IfNotModified,
+        ).readall()
+        n = len(data)
+        buffer[:n] = data
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
 
 
 class AzureBlobStorage(IStorage):
@@ -31,8 +104,134 @@ class AzureBlobStorage(IStorage):
         blob_client.upload_blob(data, overwrite=True)
         return blob_client.url
 
+    def save_if_match(self, name: str, data: bytes, etag: Optional[str]) -> str:
+        """Upload with an If-Match (or If-None-Match: * when etag is None) condition."""
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        try:
+            if etag is None:
+                result = blob_client.upload_blob(data, overwrite=False)
+            else:
+                result = blob_client.upload_blob(
+                    data,
+                    overwrite=True,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified,
+                )
+        except (ResourceExistsError, ResourceModifiedError) as e:
+            raise ConcurrentModificationError(f"{name} was modified concurrently") from e
+        return result["etag"]
+
+    def create(self, name: str, data: bytes) -> bool:
+        """Upload bytes unless the blob already exists."""
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        try:
+            blob_client.upload_blob(data, overwrite=False)
+        except ResourceExistsError:
+            return False
+        return True
+
+    def save_stream(
+        self, name: str, source: Union[BinaryIO, Iterable[bytes]]
+    ) -> StoredObject:
+        """Stage the source block by block and commit the block list.
+
+        At most UPLOAD_CONCURRENCY blocks are in flight, so memory stays at a
+        few block sizes regardless of the upload size.
+        """
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        digest = hashlib.sha256()
+        size = 0
+        blocks = []
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as pool:
+            for chunk in iter_blocks(source, UPLOAD_BLOCK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                # block ids must all have the same length within a blob
+                block_id = base64.b64encode(f"{len(blocks):010d}".encode()).decode()
+                blocks.append(BlobBlock(block_id=block_id))
+                in_flight.append(pool.submit(blob_client.stage_block, block_id, chunk))
+                if len(in_flight) >= UPLOAD_CONCURRENCY:
+                    in_flight.popleft().result()
+            for future in in_flight:
+                future.result()
+        blob_client.commit_block_list(blocks)
+        return StoredObject(url=blob_client.url, size=size, sha256=digest.hexdigest())
+
     def get(self, name: str) -> bytes:
         """Download blob contents as bytes."""
         blob_client: BlobClient = self._container_client.get_blob_client(name)
         downloader = blob_client.download_blob()
         return downloader.readall()
+
+    def open(self, name: str) -> BinaryIO:
+        """Return a reader that fetches the blob lazily in DOWNLOAD_CHUNK_SIZE ranges."""
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        properties = blob_client.get_blob_properties()
+        reader = _BlobRangeReader(blob_client, properties.size, properties.etag)
+        return io.BufferedReader(reader, buffer_size=DOWNLOAD_CHUNK_SIZE)
+
+    def open_versioned(self, name: str) -> Tuple[BinaryIO, str]:
+        """Download the blob together with the ETag of the downloaded version."""
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        downloader = blob_client.download_blob()
+        return BytesIO(downloader.readall()), downloader.properties.etag
+
+    def delete(self, name: str) -> None:
+        """Delete the blob if it exists."""
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        try:
+            blob_client.delete_blob()
+        except ResourceNotFoundError:
+            pass
+
+    def list(self, prefix: str = "") -> Iterator[str]:
+        """List blob names page by page."""
+        for blob in self._container_client.list_blobs(name_starts_with=prefix or None):
+            yield blob.name
+
+    def append(self, name: str, data: bytes, expected_offset: Optional[int] = None) -> int:
+        """Append bytes to an append blob, creating it on first use.
+
+        ``expected_offset`` is sent as the append-position condition. An append
+        blob takes at most 50,000 blocks and every call appends one, so a blob
+        at that limit raises ObjectFullError.
+        """
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        try:
+            try:
+                result = blob_client.append_block(data, appendpos_condition=expected_offset)
+            except ResourceNotFoundError:
+                if expected_offset:
+                    raise ConcurrentModificationError(f"{name} does not exist")
+                # only create when missing so concurrent writers never truncate it
+                try:
+                    blob_client.create_append_blob(match_condition=MatchConditions.IfMissing)
+                except (ResourceExistsError, ResourceModifiedError):
+                    pass
+                result = blob_client.append_block(data, appendpos_condition=expected_offset)
+        except HttpResponseError as e:
+            # 412: the blob is no longer expected_offset bytes long
+            if e.status_code == 412:
+                raise ConcurrentModificationError(f"{name} was appended to concurrently") from e
+            if e.error_code == "BlockCountExceedsLimit":
+                raise ObjectFullError(f"{name} has reached the append blob block limit") from e
+            raise
+        return int(result["blob_append_offset"])
+
+    def get_range(self, name: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """Download part of a blob; reading at the end of the blob returns b""."""
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        try:
+            downloader = blob_client.download_blob(offset=offset, length=length)
+        except HttpResponseError as e:
+            # 416: requested range starts at or after the end of the blob
+            if e.status_code == 416:
+                return b""
+            raise
+        return downloader.readall()
+
+    def get_etag(self, name: str) -> str:
+        """Return the blob ETag without downloading its contents."""
+        blob_client: BlobClient = self._container_client.get_blob_client(name)
+        return blob_client.get_blob_properties().etag
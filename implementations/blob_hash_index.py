@@ -0,0 +1,45 @@
+import json
+import os
+from typing import Optional
+
+from app.interfaces.hash_index_interface import IHashIndex
+from app.interfaces.storage_interface import IStorage
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# entries are stored as one small JSON object per content hash under this prefix
+HASH_INDEX_PREFIX = os.environ.get("HASH_INDEX_PREFIX", "hash_index/")
+
+
+class BlobHashIndex(IHashIndex):
+    """Content-hash index persisted as one object per digest in storage.
+
+    Entries are written with create-if-absent semantics, so the index
+    survives restarts and the first of several concurrent writers wins.
+    """
+
+    def __init__(self, storage: IStorage, prefix: str = HASH_INDEX_PREFIX):
+        self.storage = storage
+        self.prefix = prefix
+
+    def _name(self, digest: str) -> str:
+        return f"{self.prefix}{digest}.json"
+
+    def get(self, digest: str) -> Optional[dict]:
+        try:
+            data = self.storage.get(self._name(digest))
+        except Exception:
+            return None
+        return json.loads(data)
+
+    def put(self, digest: str, entry: dict) -> bool:
+        written = self.storage.create(
+            self._name(digest), json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        )
+        if not written:
+            logger.info("Hash index entry already present: sha256=%s", digest)
+        return written
+
+    def replace(self, digest: str, entry: dict) -> None:
+        self.storage.save(self._name(digest), json.dumps(entry, ensure_ascii=False).encode("utf-8"))
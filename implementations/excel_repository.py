@@ -1,55 +1,452 @@
+import json
 import os
+import threading
 from io import BytesIO
+from typing import BinaryIO, Iterator, List, Optional, Tuple
 
-from openpyxl import Workbook, load_workbook
+from app.interfaces.excel_interface import IExcelRepository, RecordQuery
+from app.interfaces.storage_interface import (
+    ConcurrentModificationError,
+    IStorage,
+    ObjectFullError,
+)
+from app.logging_config import get_logger
+from app.utils.metrics import metrics
+from app.utils.payload_store import PayloadStore
+from app.utils.record_index import RecordIndex
+from app.utils.workbook_reader import (
+    PayloadReference,
+    decode_json_cell,
+    iter_documents,
+    iter_entries,
+    payload_reference,
+    read_entries,
+    xlsx_safe,
+)
 
-from app.implementations.azure_blob_storage import AzureBlobStorage
-from app.interfaces.excel_interface import IExcelRepository
+logger = get_logger(__name__)
 
 # blob name where workbook will be stored; environment variable only
 EXCEL_BLOB_NAME = os.environ.get('EXCEL_BLOB_NAME', 'transformed_data/output.xlsx')
+# appended records are journaled as NDJSON segments under this prefix
+JOURNAL_PREFIX = os.environ.get('EXCEL_JOURNAL_PREFIX', 'transformed_data/journal/')
+# a new segment is started once the current one grows past this size
+JOURNAL_SEGMENT_MAX_BYTES = int(
+    os.environ.get('EXCEL_JOURNAL_SEGMENT_MAX_BYTES', str(16 * 1024 * 1024))
+)
+# seconds between background compactions; 0 disables the background compactor
+COMPACT_INTERVAL_SECONDS = float(os.environ.get('EXCEL_COMPACT_INTERVAL_SECONDS', '30'))
+# attempts before an append or compaction gives up against concurrent writers
+WRITE_MAX_ATTEMPTS = int(os.environ.get('EXCEL_WRITE_MAX_ATTEMPTS', '50'))
+
+HEADERS = ['id', 'filename', 'file_type', 'json_data']
+# hidden sheet recording how far into the journal the workbook is materialized
+CHECKPOINT_SHEET = '_journal'
 
 
 class ExcelRepository(IExcelRepository):
-    def __init__(self):
-        self.storage = AzureBlobStorage()
+    """Workbook repository backed by an append-only journal.
+
+    ``append`` writes one NDJSON line to the current journal segment, so its
+    cost does not depend on how many rows exist. Rows are journaled as JSON
+    arrays; ``replace_json_data`` journals JSON objects, which rewrite
+    existing rows when they are materialized and do not add rows. A compactor materializes the
+    journaled records into the workbook blob periodically in the background
+    and on demand before the workbook is read. Nothing is downloaded until
+    the repository is first used.
+
+    Several processes may share the same storage. Journal appends are
+    conditional on the segment length, so every writer knows exactly which
+    records precede its own and row numbers stay unique. The workbook is
+    only replaced if its ETag is unchanged; a compactor that loses the race
+    reloads the winner's workbook and replays the journal from its
+    checkpoint, so no journaled record is lost.
+
+    Large json_data payloads are stored as separate blobs by a PayloadStore
+    before they are journaled; their cells hold a reference and summary, and
+    readers load the records only for the entries they return.
+    """
+
+    def __init__(self, storage: IStorage):
+        self.storage = storage
         self.blob_name = EXCEL_BLOB_NAME
-        
-        # Try to fetch existing workbook from blob, or create new one
+        self.payloads = PayloadStore(storage)
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        # set when the in-memory workbook may differ from the blob it was loaded from
+        self._stale = False
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._compactor = None
+        # the workbook is downloaded and the journal replayed on first use
+        self.wb = None
+        self._etag = None
+        self._loaded = False
+        # query index over materialized workbook rows, extended after compaction
+        self._index = RecordIndex()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                with metrics.stage("startup", "workbook_load"):
+                    self._load()
+
+    def _load(self):
+        self._load_workbook()
+        # the append head starts at the checkpoint and catches up with the journal
+        self._segment, self._offset = self._read_checkpoint()
+        self._rows = self.wb.active.max_row
+        self._catch_up()
+        metrics.set_gauge("app_workbook_rows", self._rows)
+        logger.info(
+            "Excel repository initialized: rows=%d, segment=%d, offset=%d",
+            self._rows,
+            self._segment,
+            self._offset,
+        )
+        self._loaded = True
+
+        if COMPACT_INTERVAL_SECONDS > 0:
+            self._compactor = threading.Thread(
+                target=self._compact_loop, name='excel-compactor', daemon=True
+            )
+            self._compactor.start()
+
+    def _load_workbook(self):
+        """Fetch the workbook and its ETag from blob, or start a new one."""
+        from openpyxl import Workbook, load_workbook
+
         try:
-            data = self.storage.get(self.blob_name)
-            self.wb = load_workbook(BytesIO(data))
+            fh, self._etag = self.storage.open_versioned(self.blob_name)
         except Exception:
             # Create new workbook if it doesn't exist in blob
             self.wb = Workbook()
             ws = self.wb.active
-            ws.append(['id', 'filename', 'file_type', 'json_data'])
+            ws.append(HEADERS)
+            self._etag = None
+            return
+        with fh:
+            self.wb = load_workbook(fh)
+            metrics.set_gauge("app_workbook_bytes", fh.seek(0, 2))
+
+    def _segment_name(self, segment: int) -> str:
+        return f"{JOURNAL_PREFIX}{segment:08d}.ndjson"
+
+    def _checkpoint_sheet(self):
+        if CHECKPOINT_SHEET in self.wb.sheetnames:
+            return self.wb[CHECKPOINT_SHEET]
+        ws = self.wb.create_sheet(CHECKPOINT_SHEET)
+        ws.sheet_state = 'hidden'
+        return ws
+
+    def _read_checkpoint(self):
+        ws = self._checkpoint_sheet()
+        return int(ws['A1'].value or 0), int(ws['B1'].value or 0)
+
+    def _write_checkpoint(self, segment: int, offset: int):
+        ws = self._checkpoint_sheet()
+        ws['A1'] = segment
+        ws['B1'] = offset
+
+    def _read_journal(self, segment: int, offset: int) -> Tuple[List[bytes], int, int]:
+        """Read journal lines from (segment, offset) to the end of the journal.
+
+        Returns the lines and the (segment, offset) just past them. Writers
+        start the next segment once the current one reached
+        JOURNAL_SEGMENT_MAX_BYTES, or earlier when storage refuses to grow it
+        (an Azure append blob holds at most 50,000 appends). A segment that
+        has a successor never changes again, so its tail is read once more
+        before moving on and no line is ever skipped.
+        """
+        lines = []
+        while True:
+            if offset >= JOURNAL_SEGMENT_MAX_BYTES:
+                segment, offset = segment + 1, 0
+            data = self._read_segment(segment, offset)
+            if not data:
+                if not self._segment_exists(segment + 1):
+                    break
+                # the segment was full; lines appended before the next one started
+                data = self._read_segment(segment, offset)
+                lines.extend(line for line in data.splitlines() if line.strip())
+                segment, offset = segment + 1, 0
+                continue
+            lines.extend(line for line in data.splitlines() if line.strip())
+            offset += len(data)
+        return lines, segment, offset
+
+    def _read_segment(self, segment: int, offset: int) -> bytes:
+        try:
+            return self.storage.get_range(self._segment_name(segment), offset)
+        except Exception:
+            # segment does not exist yet
+            return b''
+
+    def _segment_exists(self, segment: int) -> bool:
+        try:
+            self.storage.get_etag(self._segment_name(segment))
+        except Exception:
+            return False
+        return True
+
+    def _catch_up(self):
+        """Advance the append head past records other processes journaled."""
+        lines, self._segment, self._offset = self._read_journal(self._segment, self._offset)
+        self._rows += sum(1 for line in lines if line.startswith(b'['))
 
     def _sync_to_blob(self):
-        """Save workbook to blob storage"""
-        bio = BytesIO()
-        self.wb.save(bio)
-        bio.seek(0)
-        self.storage.save(self.blob_name, bio.read())
+        """Save workbook to blob storage unless another process replaced it meanwhile."""
+        with metrics.stage("excel_repository", "sync_to_blob"):
+            bio = BytesIO()
+            self.wb.save(bio)
+            bio.seek(0)
+            data = bio.read()
+            self._etag = self.storage.save_if_match(self.blob_name, data, self._etag)
+        metrics.set_gauge("app_workbook_bytes", len(data))
 
-    def append(self, record: dict) -> int:
-        ws = self.wb.active
-        row = ws.max_row + 1
-        ws.append([
-            record.get('id'), 
+    def _row_values(self, record: dict) -> list:
+        return [
+            record.get('id'),
             record.get('filename'),
             record.get('file_type'),
             record.get('json_data')
-        ])
-        # Save to blob storage
-        self._sync_to_blob()
-        return row
+        ]
 
-    def get_stream(self) -> BytesIO:
+    def append(self, record: dict) -> int:
+        return self.append_many([record])[0]
+
+    def append_many(self, records: List[dict]) -> List[int]:
+        if not records:
+            return []
+        self._ensure_loaded()
+        # payloads are stored before the journal line that refers to them
+        records = self.payloads.offload_many(records)
+        rows = [self._row_values(record) for record in records]
+        # all records go to the journal as a single append block
+        data = "".join(json.dumps(values, ensure_ascii=False) + "\n" for values in rows)
+        first = self._journal(data.encode('utf-8'), len(rows))
+        return list(range(first, first + len(rows)))
+
+    def replace_json_data(self, records: List[dict]) -> None:
+        if not records:
+            return
+        self._ensure_loaded()
+        records = self.payloads.offload_many(records)
+        data = "".join(
+            json.dumps(
+                {"replace": {"id": record.get('id'), "json_data": record.get('json_data')}},
+                ensure_ascii=False,
+            )
+            + "\n"
+            for record in records
+        )
+        self._journal(data.encode('utf-8'), 0)
+
+    def _journal(self, data: bytes, rows: int) -> int:
+        """Append lines adding ``rows`` rows to the journal; return the first new row."""
+        with self._lock:
+            for _ in range(WRITE_MAX_ATTEMPTS):
+                if self._offset >= JOURNAL_SEGMENT_MAX_BYTES:
+                    self._segment, self._offset = self._segment + 1, 0
+                try:
+                    self.storage.append(
+                        self._segment_name(self._segment), data, expected_offset=self._offset
+                    )
+                except ConcurrentModificationError:
+                    # another process appended first: count its records and retry
+                    self._catch_up()
+                    continue
+                except ObjectFullError:
+                    # storage will not grow this segment any further: continue in the next one
+                    full = self._segment
+                    self._catch_up()
+                    if self._segment == full:
+                        self._segment, self._offset = full + 1, 0
+                    continue
+                self._offset += len(data)
+                first = self._rows + 1
+                self._rows += rows
+                metrics.set_gauge("app_workbook_rows", self._rows)
+                return first
+        raise RuntimeError(
+            f"Journal append failed after {WRITE_MAX_ATTEMPTS} attempts due to concurrent writers"
+        )
+
+    def compact(self) -> bool:
+        """Materialize journaled records into the workbook blob.
+
+        Returns True when the workbook blob was rewritten.
+        """
+        self._ensure_loaded()
+        with self._compact_lock:
+            for _ in range(WRITE_MAX_ATTEMPTS):
+                if self._stale:
+                    # a failed attempt may have left rows in the workbook; start from the blob
+                    self._load_workbook()
+                    self._stale = False
+                segment, offset = self._read_checkpoint()
+                lines, segment, offset = self._read_journal(segment, offset)
+                if not lines:
+                    return False
+                try:
+                    self._materialize(lines)
+                    self._write_checkpoint(segment, offset)
+                    self._sync_to_blob()
+                except ConcurrentModificationError:
+                    # another process compacted first: start again from its workbook
+                    logger.info("Excel compaction lost a concurrent write; reloading workbook")
+                    self._stale = True
+                    continue
+                except BaseException:
+                    # the next run replays the same lines onto a freshly loaded workbook
+                    self._stale = True
+                    raise
+                logger.info(
+                    "Excel compaction completed: materialized_records=%d, segment=%d, offset=%d",
+                    len(lines),
+                    segment,
+                    offset,
+                )
+                return True
+        raise RuntimeError(
+            f"Excel compaction failed after {WRITE_MAX_ATTEMPTS} attempts due to concurrent writers"
+        )
+
+    def _materialize(self, lines: List[bytes]):
+        """Apply journal lines to the in-memory workbook in journal order."""
+        ws = self.wb.active
+        # row numbers by id, built when the first replacement needs them
+        rows_by_id = None
+        for line in lines:
+            values = json.loads(line)
+            if isinstance(values, list):
+                ws.append([xlsx_safe(value) for value in values])
+                if rows_by_id is not None:
+                    rows_by_id.setdefault(values[0], []).append(ws.max_row)
+                continue
+            replacement = values.get("replace")
+            if replacement is None:
+                logger.warning("Skipping unknown journal entry: keys=%s", sorted(values))
+                continue
+            if rows_by_id is None:
+                rows_by_id = {}
+                for row, (doc_id,) in enumerate(
+                    ws.iter_rows(min_row=2, max_col=1, values_only=True), start=2
+                ):
+                    rows_by_id.setdefault(doc_id, []).append(row)
+                # replaced rows must be indexed again
+                self._index = RecordIndex()
+            for row in rows_by_id.get(replacement["id"], ()):
+                ws.cell(row=row, column=HEADERS.index('json_data') + 1).value = xlsx_safe(
+                    replacement["json_data"]
+                )
+
+    def _compact_loop(self):
+        while not self._stop.wait(COMPACT_INTERVAL_SECONDS):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Background Excel compaction failed")
+
+    def close(self):
+        """Stop the background compactor and flush pending records."""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._loaded:
+            self.compact()
+
+    def get_stream(self) -> BinaryIO:
+        # make sure journaled records are materialized before reading
+        self.compact()
         # Fetch fresh copy from blob storage
         try:
-            data = self.storage.get(self.blob_name)
-            bio = BytesIO(data)
-            return bio
+            return self.storage.open(self.blob_name)
         except Exception:
             raise FileNotFoundError(f"Excel file {self.blob_name} not found in blob storage")
+
+    def get_versioned_stream(self) -> Tuple[BinaryIO, str]:
+        """Open the workbook and return it with the ETag of the opened blob.
+
+        The tag is read before and after opening; a compaction in between
+        changes it, and the workbook is opened again.
+        """
+        self.compact()
+        for _ in range(WRITE_MAX_ATTEMPTS):
+            try:
+                before = self.storage.get_etag(self.blob_name)
+                stream = self.storage.open(self.blob_name)
+            except Exception:
+                raise FileNotFoundError(f"Excel file {self.blob_name} not found in blob storage")
+            try:
+                after = self.storage.get_etag(self.blob_name)
+            except Exception:
+                after = None
+            if after == before:
+                return stream, after.strip('"')
+            stream.close()
+            logger.info("Excel workbook replaced while opening it; opening again")
+        raise RuntimeError(
+            f"Excel workbook changed on every one of {WRITE_MAX_ATTEMPTS} attempts to open it"
+        )
+
+    def get_version(self) -> str:
+        # journaled records must be materialized for the blob ETag to cover them
+        self.compact()
+        try:
+            return self.storage.get_etag(self.blob_name).strip('"')
+        except Exception:
+            raise FileNotFoundError(f"Excel file {self.blob_name} not found in blob storage")
+
+    def get_entries(
+        self, offset: int = 0, limit: Optional[int] = None
+    ) -> Tuple[List[dict], int]:
+        with self.get_stream() as stream:
+            entries, total = read_entries(stream, offset=offset, limit=limit)
+        # only the payloads of the requested page are fetched
+        return self.payloads.resolve_entries(entries), total
+
+    def iter_entries(self) -> Iterator[dict]:
+        # open eagerly so a missing workbook fails before a response starts
+        stream = self.get_stream()
+        return self._iter_stream_entries(stream)
+
+    def _iter_stream_entries(self, stream: BinaryIO) -> Iterator[dict]:
+        with stream:
+            yield from self.payloads.iter_resolved(iter_entries(stream))
+
+    def iter_documents(self) -> Iterator[dict]:
+        stream = self.get_stream()
+        return self._iter_stream_documents(stream)
+
+    def _iter_stream_documents(self, stream: BinaryIO) -> Iterator[dict]:
+        # offloaded payloads are never fetched
+        with stream:
+            yield from iter_documents(stream)
+
+    def _index_new_rows(self):
+        """Add workbook rows materialized since the last call to the query index."""
+        ws = self.wb.active
+        first = self._index.documents + 2
+        rows = []
+        for row, values in enumerate(
+            ws.iter_rows(min_row=first, max_col=len(HEADERS), values_only=True), start=first
+        ):
+            doc_id, filename, file_type, json_data = values
+            reference = payload_reference(json_data)
+            data = reference if reference is not None else decode_json_cell(json_data)
+            rows.append([row, doc_id, filename, file_type, data])
+        pending = [values for values in rows if isinstance(values[4], PayloadReference)]
+        for values, data in zip(pending, self.payloads.load_many([v[4] for v in pending])):
+            values[4] = data
+        for values in rows:
+            self._index.add(*values)
+
+    def query_records(self, query: RecordQuery) -> Tuple[List[dict], int]:
+        self.compact()
+        # the workbook only changes under the compaction lock
+        with self._compact_lock:
+            self._index_new_rows()
+        return self._index.query(query)
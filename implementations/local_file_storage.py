@@ -0,0 +1,168 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+from app.interfaces.storage_interface import (
+    ConcurrentModificationError,
+    IStorage,
+    StoredObject,
+)
+from app.utils.streams import DEFAULT_BLOCK_SIZE, iter_blocks, map_file
+
+
+class LocalFileStorage(IStorage):
+    """IStorage on a local directory for tests and single-node deployments.
+
+    Whole-object writes go to a temporary file in the target directory and
+    are renamed into place, so readers never see a partially written object.
+    Reads are served from memory maps of the stored files.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, name: str) -> Path:
+        path = (self.root / name).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Storage name escapes the storage root: {name}")
+        return path
+
+    def _write_temp(self, path: Path, blocks: Iterable[bytes]):
+        """Write blocks to a synced temporary file next to path; return (temp, size, sha256)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for block in blocks:
+                    fh.write(block)
+                    digest.update(block)
+                    size += len(block)
+                fh.flush()
+                os.fsync(fh.fileno())
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp, size, digest.hexdigest()
+
+    @contextmanager
+    def _directory_lock(self, path: Path):
+        """Serialize conditional writes in path's directory across processes."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def save(self, name: str, data: bytes) -> str:
+        """Atomically replace the file under name and return its file URL."""
+        path = self._path(name)
+        tmp, _, _ = self._write_temp(path, [data])
+        os.replace(tmp, path)
+        return path.as_uri()
+
+    def save_if_match(self, name: str, data: bytes, etag: Optional[str]) -> str:
+        """Atomically replace the file if its tag still equals etag."""
+        path = self._path(name)
+        tmp, _, _ = self._write_temp(path, [data])
+        try:
+            with self._directory_lock(path):
+                try:
+                    current = _etag(os.stat(path))
+                except FileNotFoundError:
+                    current = None
+                if current != etag:
+                    raise ConcurrentModificationError(f"{name} was modified concurrently")
+                os.replace(tmp, path)
+                return _etag(os.stat(path))
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def create(self, name: str, data: bytes) -> bool:
+        """Write the file unless it exists; hard-linking into place is atomic."""
+        path = self._path(name)
+        tmp, _, _ = self._write_temp(path, [data])
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp)
+        return True
+
+    def save_stream(
+        self, name: str, source: Union[BinaryIO, Iterable[bytes]]
+    ) -> StoredObject:
+        """Copy the source block by block into a temporary file, then rename it."""
+        path = self._path(name)
+        tmp, size, sha256 = self._write_temp(path, iter_blocks(source, DEFAULT_BLOCK_SIZE))
+        os.replace(tmp, path)
+        return StoredObject(url=path.as_uri(), size=size, sha256=sha256)
+
+    def open(self, name: str) -> BinaryIO:
+        """Return a memory-mapped, seekable reader over the stored file."""
+        return self.open_versioned(name)[0]
+
+    def open_versioned(self, name: str) -> Tuple[BinaryIO, str]:
+        """Map the file; the tag is taken from the same open file, so they match."""
+        with open(self._path(name), "rb") as fh:
+            st = os.fstat(fh.fileno())
+            return map_file(fh.fileno()), _etag(st)
+
+    def get(self, name: str) -> bytes:
+        """Read the whole file."""
+        with self.open(name) as fh:
+            return fh.read()
+
+    def delete(self, name: str) -> None:
+        """Remove the file if it exists."""
+        self._path(name).unlink(missing_ok=True)
+
+    def list(self, prefix: str = "") -> Iterator[str]:
+        """Yield stored names under the root, skipping in-flight temporary files."""
+        for path in self.root.rglob("*"):
+            if path.name.startswith(".") or not path.is_file():
+                continue
+            name = path.relative_to(self.root).as_posix()
+            if name.startswith(prefix):
+                yield name
+
+    def append(self, name: str, data: bytes, expected_offset: Optional[int] = None) -> int:
+        """Append under an exclusive lock so concurrent processes never interleave."""
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                offset = fh.seek(0, os.SEEK_END)
+                if expected_offset is not None and offset != expected_offset:
+                    raise ConcurrentModificationError(f"{name} was appended to concurrently")
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        return offset
+
+    def get_range(self, name: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """Read part of the file; reading at or past its end returns b""."""
+        with self.open(name) as fh:
+            fh.seek(offset)
+            return fh.read(-1 if length is None else length)
+
+    def get_etag(self, name: str) -> str:
+        """Derive a tag from inode, modification time and size; renames change the inode."""
+        return _etag(os.stat(self._path(name)))
+
+
+def _etag(st: os.stat_result) -> str:
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
@@ -1,72 +1,176 @@
 import json
-import re
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
-
-from PyPDF2 import PdfReader
+from typing import Iterator, List, Optional, Union
 
 from app.interfaces.parser_interface import IParser
+from app.utils.parse_session import ParseSession
+from app.utils.records import Record, RecordLayout, encode_records
+from app.utils.streams import map_file
+from app.utils.table_layout import (
+    KV_SEPARATOR,
+    NUMBER,
+    aligned_layout,
+    slice_row,
+    split_cells,
+    split_raw,
+)
+
+
+# documents with at least this many pages are parsed in page chunks in parallel
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', '50'))
+# size of the page-parsing process pool; 1 keeps parsing serial
+PDF_PARSE_WORKERS = int(os.environ.get('PDF_PARSE_WORKERS', str(os.cpu_count() or 1)))
+
+# fields of a page line that matched no record pattern
+PAGE_LINE_FIELDS = ("page", "line")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded web worker is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _parse_page_range(source: Union[bytes, str], start: int, stop: int) -> List[list]:
+    """Process-pool entry point: parse pages [start, stop) of a PDF given as bytes or a path."""
+    from PyPDF2 import PdfReader
+
+    if isinstance(source, str):
+        with open(source, 'rb') as fh:
+            stream = map_file(fh.fileno())
+    else:
+        stream = BytesIO(source)
+    with stream:
+        reader = PdfReader(stream)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        parser = PdfParser()
+        return [
+            parser._parse_page(index + 1, reader.pages[index].extract_text() or "")
+            for index in range(start, stop)
+        ]
 
 
 class PdfParser(IParser):
-    def parse(self, data: bytes) -> str:
-        reader = PdfReader(BytesIO(data))
+    def __init__(
+        self,
+        parallel_min_pages: int = PDF_PARALLEL_MIN_PAGES,
+        workers: int = PDF_PARSE_WORKERS,
+    ):
+        self.parallel_min_pages = parallel_min_pages
+        self.workers = workers
+
+    def parse(
+        self, data: Optional[bytes] = None, session: Optional[ParseSession] = None
+    ) -> str:
+        if session is None:
+            session = ParseSession.from_bytes('pdf', data)
+        return encode_records(self.iter_records(session))
+
+    def iter_records(self, session: ParseSession) -> Iterator[object]:
+        """Yield records page by page; page text is dropped once its page is parsed.
+
+        Table rows and page lines are ``Record`` objects; JSON found on a
+        line is yielded as decoded.
+        """
+        if session.reader is None:
+            # no validation session: open the document ourselves
+            from PyPDF2 import PdfReader
+
+            session.reader = PdfReader(session.stream)
+        reader = session.reader
         if reader.is_encrypted:
             reader.decrypt('')
+        page_count = len(reader.pages)
+
+        if self.workers > 1 and page_count >= self.parallel_min_pages:
+            page_records = self._parse_pages_parallel(session, page_count)
+        else:
+            # pages already extracted during validation are served from the session
+            page_records = (
+                self._parse_page(page_num, session.take_page_text(page_num - 1))
+                for page_num in range(1, page_count + 1)
+            )
+        parsed = False
+        for records in page_records:
+            for obj in records:
+                parsed = True
+                yield obj
+
+        if not parsed:
+            # nothing parsed: return minimal metadata
+            yield {"total_pages": page_count, "pages": []}
+
+    def _parse_pages_parallel(self, session: ParseSession, page_count: int) -> Iterator[list]:
+        """Fan page ranges out to the process pool and yield them in page order.
+
+        Workers open a document that is on disk by path; only in-memory
+        uploads are sent to them as bytes.
+        """
+        source = session.path or session.read_bytes()
+        chunk = -(-page_count // self.workers)
+        pool = _get_pool()
+        futures = deque(
+            pool.submit(_parse_page_range, source, start, min(start + chunk, page_count))
+            for start in range(0, page_count, chunk)
+        )
+        while futures:
+            # drop each chunk's result as soon as it has been consumed
+            yield from futures.popleft().result()
+
+    def _parse_page(self, page_num: int, page_text: str) -> list:
+        """Parse the records of a single page."""
         parsed_objects = []
 
-        for page_num, page in enumerate(reader.pages, start=1):
-            page_text = page.extract_text() or ""
+        # Try to parse table data from the page
+        table_data = self._parse_table_from_text(page_text)
 
-            # Try to parse table data from the page
-            table_data = self._parse_table_from_text(page_text)
+        if table_data:
+            return list(table_data.get('rows', []))
 
-            if table_data:
-                rows = table_data.get('rows', [])
-                for row in rows:
-                    parsed_objects.append(row)
-                # continue to next page (don't return early)
+        # fallback: split page into lines and try to parse each line
+        for line in page_text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            # try full-line JSON
+            try:
+                obj = json.loads(line)
+                parsed_objects.append(obj)
                 continue
+            except Exception:
+                pass
 
-            # fallback: split page into lines and try to parse each line
-            for line in page_text.splitlines():
-                line = line.strip()
-                if not line:
+            # try to parse key:value pairs separated by comma or semicolon
+            # e.g. "k1: v1, k2: v2"
+            parts = KV_SEPARATOR.split(line)
+            if len(parts) > 1 and all(':' in p for p in parts if p.strip()):
+                obj = {}
+                for p in parts:
+                    if ':' in p:
+                        k, v = p.split(':', 1)
+                        obj[k.strip()] = v.strip()
+                if obj:
+                    parsed_objects.append(Record.from_dict(obj))
                     continue
-                # try full-line JSON
-                try:
-                    obj = json.loads(line)
-                    parsed_objects.append(obj)
-                    continue
-                except Exception:
-                    pass
-
-                # try to parse key:value pairs separated by comma or semicolon
-                # e.g. "k1: v1, k2: v2"
-                parts = re.split(r'[;,]\s*', line)
-                if len(parts) > 1 and all(':' in p for p in parts if p.strip()):
-                    obj = {}
-                    for p in parts:
-                        if ':' in p:
-                            k, v = p.split(':', 1)
-                            obj[k.strip()] = v.strip()
-                    if obj:
-                        parsed_objects.append(obj)
-                        continue
-
-                # otherwise store as a raw line with page context
-                parsed_objects.append({"page": page_num, "line": line})
-
-        # If we collected any parsed objects, return NDJSON (one JSON object per line)
-        if parsed_objects:
-            return "\n".join(json.dumps(o, ensure_ascii=False) for o in parsed_objects)
-
-        # nothing parsed: return minimal metadata
-        pdf_json = {
-            "total_pages": len(reader.pages),
-            "pages": []
-        }
-        return json.dumps(pdf_json, indent=2)
-    
+
+            # otherwise store as a raw line with page context
+            parsed_objects.append(Record(PAGE_LINE_FIELDS, (page_num, line)))
+        return parsed_objects
 
     def _parse_table_from_text(self, text: str):
         # split into non-empty lines
@@ -74,32 +178,37 @@ class PdfParser(IParser):
         if len(lines) < 2:
             return None
 
-        # first try a simple delimiter (tab or 2+ spaces)
         header_line = lines[0]
-        # pick appropriate delimiter pattern
-        if '\t' in header_line:
-            delim = '\t'
-        else:
-            delim = r'\s{2,}'
-        tentative = [h.strip() for h in re.split(delim, header_line) if h.strip()]
+        # fixed-width layouts: infer column offsets once and slice every row
+        columns = aligned_layout(header_line, lines[1:])
+        if columns:
+            headers = slice_row(header_line, columns)
+            layout = RecordLayout(headers)
+            rows = [layout.record(slice_row(line, columns)) for line in lines[1:]]
+            return {"headers": headers, "rows": rows, "row_count": len(rows)}
+
+        # next try a simple delimiter (tab or 2+ spaces)
+        delim = '\t' if '\t' in header_line else ' '
+        tentative = split_cells(header_line, delim)
         if len(tentative) >= 2:
             # see if first data row matches same count
-            first_vals = [v.strip() for v in re.split(delim, lines[1])]
+            first_vals = [v.strip() for v in split_raw(lines[1], delim)]
             if len(first_vals) == len(tentative):
                 headers = tentative
+                layout = RecordLayout(headers)
                 rows = []
                 for line in lines[1:]:
-                    vals = [v.strip() for v in re.split(delim, line)]
+                    vals = [v.strip() for v in split_raw(line, delim)]
                     if len(vals) < len(headers):
                         vals += [''] * (len(headers) - len(vals))
-                    rows.append(dict(zip(headers, vals)))
+                    rows.append(layout.record(vals))
                 return {"headers": headers, "rows": rows, "row_count": len(rows)}
 
         # fallback: use token grouping based on data token count
         header_tokens = header_line.split()
         data_tokens = lines[1].split()
         # group numeric headers from right based on known suffixes
-        numeric_count = len([t for t in data_tokens if re.fullmatch(r"\d+(\.\d+)?", t)])
+        numeric_count = len([t for t in data_tokens if NUMBER.fullmatch(t)])
         suffixes = {'Date', 'Required'}
         tokens = header_tokens[:]
         numeric_headers = []
@@ -122,6 +231,7 @@ class PdfParser(IParser):
             text_headers.append(tokens[i])
         headers = text_headers + numeric_headers
         ncols = len(headers)
+        layout = RecordLayout(headers)
         # construct rows by splitting tokens according to header count
         rows = []
         # numeric_count already computed earlier
@@ -162,7 +272,7 @@ class PdfParser(IParser):
             # pad/trim to length
             if len(combined) < ncols:
                 combined += [''] * (ncols - len(combined))
-            rows.append(dict(zip(headers, combined[:ncols])))
+            rows.append(layout.record(combined[:ncols]))
         if rows:
             return {"headers": headers, "rows": rows, "row_count": len(rows)}
         return None
\ No newline at end of file
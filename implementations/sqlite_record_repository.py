@@ -0,0 +1,373 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from app.interfaces.excel_interface import DOCUMENT_FIELDS, IExcelRepository, RecordQuery
+from app.logging_config import get_logger
+from app.utils.metrics import metrics
+from app.utils.record_index import index_value, order_by, result, sort_number
+from app.utils.records import Record
+from app.utils.workbook_reader import decode_json_cell, xlsx_safe
+
+logger = get_logger(__name__)
+
+# columns of the exported workbook, same layout as the blob workbook
+HEADERS = ['id', 'filename', 'file_type', 'json_data']
+# rows fetched from SQLite per round trip while exporting
+EXPORT_BATCH_ROWS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    row INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    filename TEXT,
+    file_type TEXT,
+    json_data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_id ON documents (id);
+CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents (filename);
+CREATE INDEX IF NOT EXISTS idx_documents_file_type ON documents (file_type);
+CREATE TABLE IF NOT EXISTS records (
+    document_row INTEGER NOT NULL REFERENCES documents (row),
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (document_row, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS record_fields (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    number REAL,
+    document_row INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (field, value, document_row, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_record_fields_record
+    ON record_fields (document_row, position, field);
+CREATE TABLE IF NOT EXISTS replacements (
+    revision INTEGER PRIMARY KEY AUTOINCREMENT
+);
+"""
+# bumped when the schema gains tables that existing databases must backfill
+SCHEMA_VERSION = 1
+
+
+class SqliteRecordRepository(IExcelRepository):
+    """Record store in a local SQLite database in WAL mode.
+
+    Each upload is a row in ``documents``; its transformed records are also
+    split into ``records`` so they can be read without re-decoding the whole
+    cell. Row numbers are reported like workbook rows (the first document is
+    row 2, below the header) so API responses do not change. The xlsx is only
+    produced when ``get_stream`` is called, and is reused until rows are added
+    or replaced.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._export_lock = threading.Lock()
+        self._export_version = None
+        self._export_path = os.path.join(directory, f".{os.path.basename(path)}.export.xlsx")
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._backfill_record_fields(conn)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's connection; SQLite connections are not shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _backfill_record_fields(self, conn: sqlite3.Connection):
+        """Index the fields of records written before record_fields existed."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM record_fields")
+            for row, position, data in conn.execute(
+                "SELECT document_row, position, data FROM records"
+            ).fetchall():
+                self._insert_fields(conn, row, position, json.loads(data))
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _insert_fields(self, conn: sqlite3.Connection, row: int, position: int, value):
+        if not isinstance(value, (dict, Record)):
+            return
+        fields = []
+        for name, field_value in value.items():
+            text = index_value(field_value)
+            if text is not None:
+                fields.append((name, text, sort_number(text), row, position))
+        conn.executemany(
+            "INSERT OR IGNORE INTO record_fields (field, value, number, document_row, position)"
+            " VALUES (?, ?, ?, ?, ?)",
+            fields,
+        )
+
+    def append(self, record: dict) -> int:
+        return self.append_many([record])[0]
+
+    def append_many(self, records: List[dict]) -> List[int]:
+        if not records:
+            return []
+        conn = self._conn()
+        rows = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in records:
+                cursor = conn.execute(
+                    "INSERT INTO documents (id, filename, file_type, json_data) VALUES (?, ?, ?, ?)",
+                    (
+                        record.get('id'),
+                        record.get('filename'),
+                        record.get('file_type'),
+                        record.get('json_data'),
+                    ),
+                )
+                row = cursor.lastrowid
+                self._insert_records(conn, row, record)
+                rows.append(row + 1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        metrics.set_gauge("app_workbook_rows", rows[-1])
+        return rows
+
+    def _insert_records(self, conn: sqlite3.Connection, row: int, record: dict):
+        encoded = record.get('encoded')
+        if encoded is not None:
+            # parsed just now: reuse each record's slice of the cell text
+            values, texts = encoded.records, encoded.encoded()
+        else:
+            values = decode_json_cell(record.get('json_data'))
+            texts = (json.dumps(value, ensure_ascii=False) for value in values)
+        conn.executemany(
+            "INSERT INTO records (document_row, position, data) VALUES (?, ?, ?)",
+            ((row, position, text) for position, text in enumerate(texts)),
+        )
+        for position, value in enumerate(values):
+            self._insert_fields(conn, row, position, value)
+
+    def replace_json_data(self, records: List[dict]) -> None:
+        if not records:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in records:
+                for (row,) in conn.execute(
+                    "SELECT row FROM documents WHERE id = ?", (record.get('id'),)
+                ).fetchall():
+                    conn.execute(
+                        "UPDATE documents SET json_data = ? WHERE row = ?",
+                        (record.get('json_data'), row),
+                    )
+                    conn.execute("DELETE FROM record_fields WHERE document_row = ?", (row,))
+                    conn.execute("DELETE FROM records WHERE document_row = ?", (row,))
+                    self._insert_records(conn, row, record)
+            conn.execute("INSERT INTO replacements DEFAULT VALUES")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_version(self) -> str:
+        return self._version(self._conn())
+
+    def _version(self, conn: sqlite3.Connection) -> str:
+        # rows are only added or replaced, so the newest row and the number of
+        # replacements identify the contents
+        latest, revision = conn.execute(
+            "SELECT (SELECT max(row) FROM documents), (SELECT max(revision) FROM replacements)"
+        ).fetchone()
+        if revision:
+            return f"sqlite-{latest or 0}-{revision}"
+        return f"sqlite-{latest or 0}"
+
+    def get_entries(
+        self, offset: int = 0, limit: Optional[int] = None
+    ) -> Tuple[List[dict], int]:
+        conn = self._conn()
+        # one read transaction, so the total and the records match the page
+        conn.execute("BEGIN")
+        try:
+            total = conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+            documents = conn.execute(
+                "SELECT row, id, filename, file_type FROM documents ORDER BY row LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+            if not documents:
+                return [], total
+            entries = {}
+            for row, doc_id, filename, file_type in documents:
+                entries[row] = {
+                    "id": doc_id,
+                    "filename": filename,
+                    "file_type": file_type,
+                    "transformed_data": [],
+                }
+            for row, data in conn.execute(
+                "SELECT document_row, data FROM records"
+                " WHERE document_row BETWEEN ? AND ? ORDER BY document_row, position",
+                (documents[0][0], documents[-1][0]),
+            ):
+                entries[row]["transformed_data"].append(json.loads(data))
+        finally:
+            conn.execute("COMMIT")
+        return list(entries.values()), total
+
+    def iter_entries(self) -> Iterator[dict]:
+        """Stream entries from one read transaction, merging documents with their records."""
+        # a private connection keeps the snapshot open while the caller iterates
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        return self._iter_snapshot_entries(conn)
+
+    def _iter_snapshot_entries(self, conn: sqlite3.Connection) -> Iterator[dict]:
+        try:
+            conn.execute("BEGIN")
+            documents = conn.execute(
+                "SELECT row, id, filename, file_type FROM documents ORDER BY row"
+            )
+            records = conn.execute(
+                "SELECT document_row, data FROM records ORDER BY document_row, position"
+            )
+            pending = records.fetchone()
+            for row, doc_id, filename, file_type in documents:
+                entry = {
+                    "id": doc_id,
+                    "filename": filename,
+                    "file_type": file_type,
+                    "transformed_data": [],
+                }
+                while pending is not None and pending[0] <= row:
+                    if pending[0] == row:
+                        entry["transformed_data"].append(json.loads(pending[1]))
+                    pending = records.fetchone()
+                yield entry
+        finally:
+            conn.close()
+
+    def iter_documents(self) -> Iterator[dict]:
+        """Stream the document columns only; neither json_data nor records are read."""
+        cursor = self._conn().execute("SELECT id, filename, file_type FROM documents ORDER BY row")
+        for doc_id, filename, file_type in cursor:
+            yield {"id": doc_id, "filename": filename, "file_type": file_type}
+
+    def query_records(self, query: RecordQuery) -> Tuple[List[dict], int]:
+        """Answer the query from the documents indexes and the record_fields index."""
+        joins, where, params = [], [], []
+        for i, (name, value) in enumerate(query.field_filters.items()):
+            joins.append(
+                f"JOIN record_fields f{i} ON f{i}.document_row = r.document_row"
+                f" AND f{i}.position = r.position AND f{i}.field = ? AND f{i}.value = ?"
+            )
+            params += [name, value]
+        for name, value in query.filters.items():
+            if name not in DOCUMENT_FIELDS:
+                raise ValueError(f"Unknown document filter: {name}")
+            where.append(f"d.{name} = ?")
+            params.append(value)
+        source = (
+            "FROM records r JOIN documents d ON d.row = r.document_row "
+            + " ".join(joins)
+            + (" WHERE " + " AND ".join(where) if where else "")
+        )
+
+        direction = "DESC" if query.descending else "ASC"
+        order = f"r.document_row {direction}, r.position {direction}"
+        sort_join, sort_params = "", []
+        if query.sort == "row":
+            pass
+        elif query.sort in DOCUMENT_FIELDS:
+            order = order_by(f"d.{query.sort}", None, direction) + ", " + order
+        elif query.sort:
+            sort_join = (
+                "LEFT JOIN record_fields s ON s.document_row = r.document_row"
+                " AND s.position = r.position AND s.field = ? "
+            )
+            sort_params = [query.sort]
+            # the collation RecordIndex sorts by
+            order = order_by("s.value", "s.number", direction) + ", " + order
+
+        conn = self._conn()
+        # one read transaction, so the total counts the rows the page is cut from
+        conn.execute("BEGIN")
+        try:
+            total = conn.execute(f"SELECT count(*) {source}", params).fetchone()[0]
+            rows = conn.execute(
+                "SELECT r.document_row, d.id, d.filename, d.file_type, r.data "
+                + source.replace("FROM records r ", "FROM records r " + sort_join, 1)
+                + f" ORDER BY {order} LIMIT ? OFFSET ?",
+                sort_params + params + [-1 if query.limit is None else query.limit, query.offset],
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return [
+            result(row + 1, doc_id, filename, file_type, json.loads(data), query.fields)
+            for row, doc_id, filename, file_type, data in rows
+        ], total
+
+    def get_stream(self) -> BinaryIO:
+        """Return the records as an xlsx, exporting only when rows were added since."""
+        return self.get_versioned_stream()[0]
+
+    def get_versioned_stream(self) -> Tuple[BinaryIO, str]:
+        """Return the xlsx export and the version of the rows it was written from."""
+        version = self.get_version()
+        with self._export_lock:
+            if version != self._export_version or not os.path.exists(self._export_path):
+                with metrics.stage("sqlite_repository", "export"):
+                    self._export_version = self._export(self._export_path)
+            return open(self._export_path, "rb"), self._export_version
+
+    def _export(self, path: str) -> str:
+        """Write every document row to an xlsx with openpyxl's streaming writer.
+
+        Returns the version of the exported rows, read in the same transaction.
+        """
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(HEADERS)
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            version = self._version(conn)
+            cursor = conn.execute(
+                "SELECT id, filename, file_type, json_data FROM documents ORDER BY row"
+            )
+            while True:
+                batch = cursor.fetchmany(EXPORT_BATCH_ROWS)
+                if not batch:
+                    break
+                for row in batch:
+                    ws.append([xlsx_safe(value) for value in row])
+        finally:
+            conn.execute("COMMIT")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            wb.save(tmp)
+            # readers holding the previous export keep their open file
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        logger.info("SQLite workbook export completed: path='%s'", path)
+        return version
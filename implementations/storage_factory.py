@@ -0,0 +1,32 @@
+from app.config import Config
+from app.interfaces.excel_interface import IExcelRepository
+from app.interfaces.storage_interface import IStorage
+
+
+def create_storage(backend: str = Config.STORAGE_BACKEND) -> IStorage:
+    """Build the storage backend selected by Config.STORAGE_BACKEND."""
+    if backend == "local":
+        from app.implementations.local_file_storage import LocalFileStorage
+
+        return LocalFileStorage(Config.LOCAL_STORAGE_ROOT)
+    if backend == "azure":
+        # imported lazily so the local backend does not require the Azure SDK
+        from app.implementations.azure_blob_storage import AzureBlobStorage
+
+        return AzureBlobStorage(Config.AZURE_CONTAINER)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def create_record_repository(
+    storage: IStorage, backend: str = Config.RECORD_STORE
+) -> IExcelRepository:
+    """Build the record repository selected by Config.RECORD_STORE."""
+    if backend == "sqlite":
+        from app.implementations.sqlite_record_repository import SqliteRecordRepository
+
+        return SqliteRecordRepository(Config.SQLITE_PATH)
+    if backend == "excel":
+        from app.implementations.excel_repository import ExcelRepository
+
+        return ExcelRepository(storage)
+    raise ValueError(f"Unknown record store: {backend}")
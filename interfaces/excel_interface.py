@@ -1,11 +1,77 @@
-from typing import BinaryIO, Protocol
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Protocol, Tuple
+
+# document columns that can be filtered and sorted on besides record fields
+DOCUMENT_FIELDS = ("id", "filename", "file_type")
+
+
+@dataclass
+class RecordQuery:
+    """Filter, projection, sort and page of a transformed-record query.
+
+    ``filters`` match the document columns in DOCUMENT_FIELDS and
+    ``field_filters`` top-level fields of the records; all must match.
+    Values are compared as text. ``sort`` names a document column, "row" or
+    a record field.
+    """
+
+    filters: Dict[str, str] = field(default_factory=dict)
+    field_filters: Dict[str, str] = field(default_factory=dict)
+    fields: Optional[List[str]] = None
+    sort: Optional[str] = None
+    descending: bool = False
+    offset: int = 0
+    limit: Optional[int] = None
 
 
 class IExcelRepository(Protocol):
     def append(self, record: dict) -> int:
-        """Append a record and return row number."""
+        """Append a record and return row number.
+
+        ``json_data`` is the cell text; an optional "encoded" EncodedRecords
+        holds the same records already split, for stores that keep them
+        individually.
+        """
+        ...
+
+    def append_many(self, records: List[dict]) -> List[int]:
+        """Append several records in one write and return their row numbers."""
+        ...
+
+    def replace_json_data(self, records: List[dict]) -> None:
+        """Give every row whose id matches a record that record's json_data.
+
+        Rows keep their position, filename and file_type; records whose id
+        has no row are ignored.
+        """
         ...
 
     def get_stream(self) -> BinaryIO:
         """Return a file-like stream of the workbook."""
         ...
+
+    def get_versioned_stream(self) -> Tuple[BinaryIO, str]:
+        """Return a workbook stream together with the version of exactly those bytes."""
+        ...
+
+    def get_version(self) -> str:
+        """Return an opaque token that changes whenever the workbook changes."""
+        ...
+
+    def get_entries(
+        self, offset: int = 0, limit: Optional[int] = None
+    ) -> Tuple[List[dict], int]:
+        """Return one page of decoded entries and the total number of entries."""
+        ...
+
+    def iter_entries(self) -> Iterator[dict]:
+        """Yield every decoded entry in row order without materializing them all."""
+        ...
+
+    def iter_documents(self) -> Iterator[dict]:
+        """Yield the DOCUMENT_FIELDS of every entry in row order, leaving json_data undecoded."""
+        ...
+
+    def query_records(self, query: RecordQuery) -> Tuple[List[dict], int]:
+        """Return one page of matching records and the total number of matches."""
+        ...
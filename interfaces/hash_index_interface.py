@@ -0,0 +1,15 @@
+from typing import Optional, Protocol
+
+
+class IHashIndex(Protocol):
+    def get(self, digest: str) -> Optional[dict]:
+        """Return the entry recorded for a content hash, if any."""
+        ...
+
+    def put(self, digest: str, entry: dict) -> bool:
+        """Record an entry unless one exists; return whether it was written."""
+        ...
+
+    def replace(self, digest: str, entry: dict) -> None:
+        """Overwrite the entry recorded for a content hash."""
+        ...
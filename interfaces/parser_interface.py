@@ -1,7 +1,19 @@
-from typing import Protocol
+from typing import Iterator, Optional, Protocol
+
+from app.utils.parse_session import ParseSession
 
 
 class IParser(Protocol):
-    def parse(self, data: bytes) -> str:
-        """Extract text from raw document bytes."""
+    def iter_records(self, session: ParseSession) -> Iterator[object]:
+        """Yield the document's records one at a time, as they are extracted.
+
+        Records are ``Record`` objects, or plain JSON values when the
+        document itself contains JSON.
+        """
+        ...
+
+    def parse(
+        self, data: Optional[bytes] = None, session: Optional[ParseSession] = None
+    ) -> str:
+        """Extract records from raw document bytes or a validation session as a JSON array."""
         ...
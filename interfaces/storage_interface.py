@@ -1,4 +1,20 @@
-from typing import Protocol
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, Optional, Protocol, Tuple, Union
+
+
+class ConcurrentModificationError(Exception):
+    """A conditional write lost against a concurrent writer."""
+
+
+class ObjectFullError(Exception):
+    """An append was refused because the object cannot grow any further."""
+
+
+@dataclass
+class StoredObject:
+    url: str
+    size: int
+    sha256: str
 
 
 class IStorage(Protocol):
@@ -6,6 +22,63 @@ class IStorage(Protocol):
         """Save bytes under given name and return a URL."""
         ...
 
+    def save_if_match(self, name: str, data: bytes, etag: Optional[str]) -> str:
+        """Replace the object only if its entity tag still equals etag.
+
+        ``etag=None`` requires that nothing is stored under name yet. Returns
+        the new entity tag; raises ConcurrentModificationError otherwise.
+        """
+        ...
+
+    def create(self, name: str, data: bytes) -> bool:
+        """Save bytes only if nothing is stored under name yet.
+
+        Returns False when the name already exists; concurrent writers race
+        safely and exactly one of them wins.
+        """
+        ...
+
+    def save_stream(
+        self, name: str, source: Union[BinaryIO, Iterable[bytes]]
+    ) -> StoredObject:
+        """Save a file-like object or byte iterable without buffering it whole."""
+        ...
+
     def get(self, name: str) -> bytes:
         """Retrieve stored bytes."""
         ...
+
+    def open(self, name: str) -> BinaryIO:
+        """Return a seekable, readable file object over the stored bytes."""
+        ...
+
+    def open_versioned(self, name: str) -> Tuple[BinaryIO, str]:
+        """Like open, plus the entity tag of exactly the bytes returned."""
+        ...
+
+    def delete(self, name: str) -> None:
+        """Remove the named object; removing a missing object is not an error."""
+        ...
+
+    def list(self, prefix: str = "") -> Iterator[str]:
+        """Yield the names of stored objects that start with prefix."""
+        ...
+
+    def append(self, name: str, data: bytes, expected_offset: Optional[int] = None) -> int:
+        """Append bytes to the named object, creating it if needed.
+
+        With ``expected_offset`` the append only happens if the object is
+        exactly that long, and ConcurrentModificationError is raised otherwise.
+        ObjectFullError is raised, and nothing is written, once the backend
+        refuses further appends to the object. Returns the offset at which
+        the bytes were written.
+        """
+        ...
+
+    def get_range(self, name: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """Retrieve stored bytes starting at offset; empty at end of object."""
+        ...
+
+    def get_etag(self, name: str) -> str:
+        """Return the current entity tag of the stored object."""
+        ...
@@ -1,21 +1,69 @@
 from flask import Blueprint
 
-from app.controllers.document_controller import get_excel, upload_document
+from app.controllers.document_controller import (
+    export_excel,
+    get_excel,
+    get_job,
+    get_metrics,
+    query_records,
+    upload_batch,
+    upload_document,
+)
 from app.logging_config import get_logger
+from app.utils.metrics import metrics
 
 document_bp = Blueprint("documents", __name__, url_prefix="/api/documents")
 logger = get_logger(__name__)
 
 
+@document_bp.before_request
+def _track_request_start():
+    metrics.inc_gauge("app_inflight_requests", 1)
+
+
+@document_bp.teardown_request
+def _track_request_end(exc):
+    metrics.inc_gauge("app_inflight_requests", -1)
+
+
 def upload_document_route():
     logger.info("Received request: method=POST path=/api/documents")
     return upload_document()
 
 
+def upload_batch_route():
+    logger.info("Received request: method=POST path=/api/documents/batch")
+    return upload_batch()
+
+
 def get_excel_route():
     logger.info("Received request: method=GET path=/api/documents/excel")
     return get_excel()
 
 
+def query_records_route():
+    logger.info("Received request: method=GET path=/api/documents/records")
+    return query_records()
+
+
+def export_excel_route():
+    logger.info("Received request: method=GET path=/api/documents/export")
+    return export_excel()
+
+
+def get_metrics_route():
+    return get_metrics()
+
+
+def get_job_route(job_id):
+    logger.info("Received request: method=GET path=/api/documents/jobs/%s", job_id)
+    return get_job(job_id)
+
+
 document_bp.add_url_rule("", view_func=upload_document_route, methods=["POST"])
+document_bp.add_url_rule("/batch", view_func=upload_batch_route, methods=["POST"])
 document_bp.add_url_rule("/excel", view_func=get_excel_route, methods=["GET"])
+document_bp.add_url_rule("/export", view_func=export_excel_route, methods=["GET"])
+document_bp.add_url_rule("/records", view_func=query_records_route, methods=["GET"])
+document_bp.add_url_rule("/jobs/<job_id>", view_func=get_job_route, methods=["GET"])
+document_bp.add_url_rule("/metrics", view_func=get_metrics_route, methods=["GET"])
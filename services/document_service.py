@@ -1,17 +1,36 @@
-import json
+import os
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Union
 
-from app.implementations.azure_blob_storage import AzureBlobStorage
+from app.implementations.blob_hash_index import BlobHashIndex
 from app.implementations.docx_parser import DocxParser
 from app.implementations.excel_repository import ExcelRepository
 from app.implementations.pdf_parser import PdfParser
-from app.interfaces.excel_interface import IExcelRepository
+from app.interfaces.excel_interface import IExcelRepository, RecordQuery
+from app.interfaces.hash_index_interface import IHashIndex
 from app.interfaces.storage_interface import IStorage
 from app.logging_config import get_logger
+from app.services.excel_view_cache import ExcelPage, ExcelViewCache
+from app.services.ingest_jobs import IngestJob, IngestJobManager
+from app.utils.file_validator import validate_file
+from app.utils.metrics import TimedIterator, metrics
+from app.utils.parse_session import ParseSession
+from app.utils.records import EncodedRecords, Record, encode_record_list
+from app.utils.streams import sha256_of
 
 logger = get_logger(__name__)
 
+# threads used to validate, store and parse the files of one batch upload
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", str(os.cpu_count() or 1)))
+# threads that store raw uploads while the request thread parses them
+UPLOAD_IO_WORKERS = int(os.environ.get("UPLOAD_IO_WORKERS", "16"))
+# duplicate uploads: "reuse" returns the existing row, "record" appends a new
+# row from the cached parse, "off" disables content-hash deduplication
+DEDUP_MODE = os.environ.get("DEDUP_MODE", "reuse").lower()
+
 
 @dataclass
 class UploadResult:
@@ -20,41 +39,64 @@ class UploadResult:
     excel_row: int
 
 
+@dataclass
+class BatchItemResult:
+    filename: str
+    id: Optional[str] = None
+    blob_url: Optional[str] = None
+    excel_row: Optional[int] = None
+    error: Optional[str] = None
+
+
 class DocumentService:
-    def __init__(self, storage: IStorage = None, excel_repo: IExcelRepository = None):
-        self.storage = storage or AzureBlobStorage()
-        self.excel_repo = excel_repo or ExcelRepository()
+    def __init__(
+        self,
+        storage: IStorage,
+        excel_repo: IExcelRepository = None,
+        hash_index: IHashIndex = None,
+        dedup_mode: str = DEDUP_MODE,
+    ):
+        self.storage = storage
+        self.excel_repo = excel_repo or ExcelRepository(storage)
+        self.hash_index = hash_index or BlobHashIndex(self.storage)
+        self.dedup_mode = dedup_mode
         self.parsers = {
             "doc": DocxParser(),
             "docx": DocxParser(),
             "pdf": PdfParser(),
         }
+        self._view_cache = ExcelViewCache()
+        # shared by all requests; threads are started on first use
+        self._io_pool = ThreadPoolExecutor(
+            max_workers=UPLOAD_IO_WORKERS, thread_name_prefix="upload-io"
+        )
+        # worker pool for asynchronous ingest; threads start on first submit
+        self.jobs = IngestJobManager(storage)
         logger.info("DocumentService initialized: available_parsers=%s", list(self.parsers))
 
-    def _consolidate_fragments(self, ndjson_str: str) -> str:
-        """Consolidate fragmented JSON lines into complete records."""
-        if not ndjson_str or not ndjson_str.strip():
-            return ndjson_str
-
-        lines = [l.strip() for l in ndjson_str.splitlines() if l.strip()]
-        if len(lines) < 2:
-            return ndjson_str
+    def _consolidate_records(self, records: Iterable) -> Iterator:
+        """Consolidate fragmented records into complete records as they stream past.
 
+        Fragments are only merged when every record of the document is a
+        single-value fragment, so those are held back until the first full
+        record arrives; from then on records pass straight through.
+        """
         fragments = []
-        for ln in lines:
-            try:
-                obj = json.loads(ln)
-                fragments.append(obj)
-            except Exception:
-                pass
-
-        if not fragments:
-            return ndjson_str
+        records = iter(records)
+        for record in records:
+            if isinstance(record, (dict, Record)) and (
+                len(record) == 1 or (len(record) == 2 and "Progress" in record)
+            ):
+                fragments.append(record)
+                continue
+            # not a fragmented document: emit everything unchanged
+            yield from fragments
+            yield record
+            yield from records
+            return
 
         # Detect grouping: if fragments are single-valued, group by 6
-        if len(fragments) >= 6 and all(
-            len(f) == 1 or (len(f) == 2 and "Progress" in f) for f in fragments
-        ):
+        if len(fragments) >= 6:
             consolidated = []
             i = 0
             while i < len(fragments):
@@ -70,13 +112,12 @@ class DocumentService:
                 i += 1
 
             if consolidated:
-                return "\n".join(
-                    json.dumps(r, ensure_ascii=False) for r in consolidated
-                )
+                yield from consolidated
+                return
 
-        return ndjson_str
+        yield from fragments
 
-    def _merge_six_fragments(self, frags: list) -> dict:
+    def _merge_six_fragments(self, frags: list) -> Optional[Record]:
         """Merge 6 JSON fragments into one complete record."""
         if len(frags) != 6:
             return None
@@ -104,21 +145,11 @@ class DocumentService:
                 record["End Date"] = f4_vals[0]
             if f5_vals:
                 record["Progress"] = f5_vals[0]
-            return record if len(record) >= 5 else None
+            return Record.from_dict(record) if len(record) >= 5 else None
         except Exception:
             return None
 
-    def process_upload(self, file_stream, filename) -> UploadResult:
-        # validation assumed done upstream
-        ext = filename.rsplit(".", 1)[-1].lower()
-        logger.info(
-            "Upload processing started: filename='%s', extension='%s'",
-            filename,
-            ext,
-        )
-        content = file_stream.read()
-        blob_name = f"{uuid.uuid4()}.{ext}"
-        url = self.storage.save(blob_name, content)
+    def _parser_for(self, ext: str):
         parser = self.parsers.get(ext)
         if not parser:
             logger.error(
@@ -126,24 +157,349 @@ class DocumentService:
                 ext,
             )
             raise ValueError(f"Unsupported file extension: {ext}")
-        json_data = parser.parse(content)
-        # consolidate fragmented lines if needed
-        json_data = self._consolidate_fragments(json_data)
-        row = self.excel_repo.append(
-            {
-                "id": blob_name,
-                "filename": filename,
-                "file_type": ext,
-                "json_data": json_data,
-            }
+        return parser
+
+    def _store_raw(self, session: ParseSession, source=None):
+        """Stream the raw document to storage and return its blob name and stored object.
+
+        ``source`` replaces the session stream when the store runs concurrently
+        with parsing; see ParseSession.upload_source.
+        """
+        blob_name = f"{uuid.uuid4()}.{session.ext}"
+        if source is None:
+            session.stream.seek(0)
+            source = session.stream
+        with metrics.stage("upload", "storage_save"):
+            stored = self.storage.save_stream(blob_name, source)
+        logger.info(
+            "Raw document stored: blob_id='%s', size_bytes=%d, sha256=%s",
+            blob_name,
+            stored.size,
+            stored.sha256,
         )
+        return blob_name, stored
+
+    def _parse(self, session: ParseSession) -> EncodedRecords:
+        parser = self._parser_for(session.ext)
+        # records stream from the parser through consolidation and are encoded
+        # once, here; repositories reuse the text instead of encoding again
+        start = time.perf_counter()
+        parsed = TimedIterator(parser.iter_records(session))
+        consolidated = TimedIterator(self._consolidate_records(parsed))
+        try:
+            return encode_record_list(consolidated)
+        finally:
+            # consolidation runs interleaved with parsing but keeps its own stage
+            consolidate = consolidated.elapsed - parsed.elapsed
+            metrics.observe_stage("upload", "consolidate", consolidate)
+            metrics.observe_stage("upload", "parse", time.perf_counter() - start - consolidate)
+
+    @staticmethod
+    def repository_record(
+        blob_name: str, filename: str, ext: str, json_data: Union[str, EncodedRecords]
+    ) -> dict:
+        """Build the record handed to the repository for one document.
+
+        Parsed documents also carry their ``EncodedRecords`` under "encoded";
+        cell text taken from the hash index is passed as it is.
+        """
+        record = {"id": blob_name, "filename": filename, "file_type": ext}
+        if isinstance(json_data, EncodedRecords):
+            record["json_data"] = json_data.text
+            record["encoded"] = json_data
+        else:
+            record["json_data"] = json_data
+        return record
+
+    def _record(
+        self, blob_name: str, filename: str, ext: str, json_data: Union[str, EncodedRecords]
+    ) -> int:
+        with metrics.stage("upload", "repository_append"):
+            row = self.excel_repo.append(
+                self.repository_record(blob_name, filename, ext, json_data)
+            )
+        self._view_cache.invalidate()
+        return row
+
+    def content_digest(self, session: ParseSession) -> Optional[str]:
+        """Hash an upload for the content index; None when deduplication is off."""
+        if self.dedup_mode == "off":
+            return None
+        return sha256_of(session.stream)
+
+    def _find_duplicate(self, session: ParseSession):
+        """Hash the upload and look it up in the content index.
+
+        Returns the digest (None when deduplication is off) and the entry of a
+        previous upload with the same content, if there is one.
+        """
+        if self.dedup_mode == "off":
+            return None, None
+        with metrics.stage("upload", "dedup_lookup"):
+            digest = self.content_digest(session)
+            entry = self.hash_index.get(digest)
+        if entry is not None:
+            logger.info(
+                "Duplicate upload detected: sha256=%s, existing_blob_id='%s', mode=%s",
+                digest,
+                entry["id"],
+                self.dedup_mode,
+            )
+        return digest, entry
+
+    def _remember(self, digest: Optional[str], blob_name: str, url: str, json_data: str, row: int):
+        if digest is None:
+            return
+        try:
+            self.hash_index.put(
+                digest,
+                {"id": blob_name, "blob_url": url, "excel_row": row, "json_data": json_data},
+            )
+        except Exception:
+            # a missing index entry only costs a re-parse of the next duplicate
+            logger.exception("Failed to record hash index entry: sha256=%s", digest)
+
+    def _refresh(self, digest: Optional[str], blob_name: str, json_data: str):
+        """Give the index entry of a reprocessed document its new json_data.
+
+        Entries of other blobs with the same content are left alone, so an
+        upload indexed first keeps answering its duplicates.
+        """
+        if digest is None:
+            return
+        try:
+            entry = self.hash_index.get(digest)
+            if entry is not None and entry["id"] == blob_name and entry["json_data"] != json_data:
+                self.hash_index.replace(digest, {**entry, "json_data": json_data})
+        except Exception:
+            # a stale entry would hand the old records to later duplicates
+            logger.exception("Failed to refresh hash index entry: sha256=%s", digest)
+
+    def _record_duplicate(self, entry: dict, filename: str, ext: str) -> UploadResult:
+        """Answer a duplicate upload from the index without storing or parsing it."""
+        if self.dedup_mode == "record":
+            row = self._record(entry["id"], filename, ext, entry["json_data"])
+        else:
+            row = entry["excel_row"]
+        return UploadResult(id=entry["id"], blob_url=entry["blob_url"], excel_row=row)
+
+    def _ingest_stored(
+        self, blob_name: str, url: str, filename: str, ext: str, digest: Optional[str]
+    ) -> int:
+        # the request stream is closed once the 202 is sent, so read the stored copy
+        with self.storage.open(blob_name) as stream:
+            session = ParseSession.open(ext, stream)
+            try:
+                json_data = self._parse(session)
+            finally:
+                session.close()
+        row = self._record(blob_name, filename, ext, json_data)
+        self._remember(digest, blob_name, url, json_data.text, row)
+        return row
+
+    def _store_and_parse(self, session: ParseSession):
+        """Store the raw document on the I/O pool while parsing it on this thread.
+
+        Both sides are joined before anything is recorded. If the parse fails
+        the stored blob is deleted again; if the store fails its error wins.
+        """
+        upload = self._io_pool.submit(self._store_raw, session, session.upload_source())
+        try:
+            json_data = self._parse(session)
+        except Exception:
+            try:
+                blob_name, _ = upload.result()
+            except Exception:
+                logger.exception("Raw document store failed alongside parse failure")
+            else:
+                logger.info("Removing stored document after parse failure: blob_id='%s'", blob_name)
+                self.storage.delete(blob_name)
+            raise
+        blob_name, stored = upload.result()
+        return blob_name, stored, json_data
+
+    def process_upload(
+        self, file_stream, filename, session: Optional[ParseSession] = None
+    ) -> UploadResult:
+        # validation assumed done upstream; its parse session is reused if given
+        ext = filename.rsplit(".", 1)[-1].lower()
+        logger.info(
+            "Upload processing started: filename='%s', extension='%s'",
+            filename,
+            ext,
+        )
+        if session is None:
+            session = ParseSession(ext=ext, stream=file_stream)
+        digest, entry = self._find_duplicate(session)
+        if entry is not None:
+            return self._record_duplicate(entry, filename, ext)
+        blob_name, stored, json_data = self._store_and_parse(session)
+        row = self._record(blob_name, filename, ext, json_data)
+        self._remember(digest, blob_name, stored.url, json_data.text, row)
         logger.info(
             "Upload processing completed: blob_id='%s', excel_row=%s",
             blob_name,
             row,
         )
-        return UploadResult(id=blob_name, blob_url=url, excel_row=row)
+        return UploadResult(id=blob_name, blob_url=stored.url, excel_row=row)
+
+    def submit_upload(
+        self, file_stream, filename, session: Optional[ParseSession] = None
+    ) -> IngestJob:
+        """Store the raw document now and parse/record it on the ingest pool."""
+        ext = filename.rsplit(".", 1)[-1].lower()
+        self._parser_for(ext)
+        if session is None:
+            session = ParseSession(ext=ext, stream=file_stream)
+        digest, entry = self._find_duplicate(session)
+        if entry is not None:
+            return self.jobs.submit(
+                filename,
+                entry["id"],
+                entry["blob_url"],
+                lambda: self._record_duplicate(entry, filename, ext).excel_row,
+            )
+        blob_name, stored = self._store_raw(session)
+        return self.jobs.submit(
+            filename,
+            blob_name,
+            stored.url,
+            lambda: self._ingest_stored(blob_name, stored.url, filename, ext, digest),
+        )
+
+    def prepare_item(self, file_storage):
+        """Validate, store and parse one batch file.
+
+        Returns the item result, the record to append (None when nothing is
+        appended) and the content digest to index once the row is known.
+        Items prepared anywhere, including other processes, are recorded
+        with ``record_prepared``.
+        """
+        result = BatchItemResult(filename=file_storage.filename)
+        digest = None
+        session = None
+        try:
+            session = validate_file(file_storage)
+            ext = session.ext
+            self._parser_for(ext)
+            digest, entry = self._find_duplicate(session)
+            if entry is not None:
+                result.id, result.blob_url = entry["id"], entry["blob_url"]
+                if self.dedup_mode != "record":
+                    result.excel_row = entry["excel_row"]
+                    return result, None, None
+                json_data = entry["json_data"]
+                # the existing index entry already covers this content
+                digest = None
+            else:
+                blob_name, stored, json_data = self._store_and_parse(session)
+                result.id, result.blob_url = blob_name, stored.url
+        except ValueError as e:
+            logger.warning(
+                "Batch item rejected: filename='%s', reason=%s", file_storage.filename, str(e)
+            )
+            result.error = str(e)
+            return result, None, None
+        except Exception:
+            logger.exception("Batch item failed: filename='%s'", file_storage.filename)
+            result.error = "Internal server error"
+            return result, None, None
+        finally:
+            if session is not None:
+                session.close()
+        record = self.repository_record(result.id, file_storage.filename, ext, json_data)
+        return result, record, digest
+
+    def process_batch(self, files) -> List[BatchItemResult]:
+        """Process many uploads concurrently and record them with one repository write."""
+        logger.info("Batch processing started: files=%d", len(files))
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            prepared = list(pool.map(self.prepare_item, files))
+        recorded = self.record_prepared(prepared)
+        logger.info(
+            "Batch processing completed: files=%d, recorded=%d, failed=%d",
+            len(files),
+            len(recorded),
+            sum(1 for result, _, _ in prepared if result.error),
+        )
+        return [result for result, _, _ in prepared]
+
+    def record_prepared(self, prepared: list) -> list:
+        """Append the records of prepared items with one repository write.
+
+        Fills in each recorded item's row and returns the recorded items.
+        """
+        recorded = [item for item in prepared if item[1] is not None]
+        if recorded:
+            with metrics.stage("upload", "repository_append"):
+                rows = self.excel_repo.append_many([record for _, record, _ in recorded])
+            for (result, record, digest), row in zip(recorded, rows):
+                result.excel_row = row
+                self._remember(digest, result.id, result.blob_url, record["json_data"], row)
+            self._view_cache.invalidate()
+        return recorded
+
+    def replace_prepared(self, prepared: list) -> list:
+        """Replace the json_data of existing rows with the records of prepared items.
+
+        Rows are matched by id and keep their row numbers, which are not
+        looked up; the content index entry of an item's digest is refreshed
+        too. Returns the items that carried a record.
+        """
+        replaced = [item for item in prepared if item[1] is not None]
+        if replaced:
+            with metrics.stage("upload", "repository_replace"):
+                self.excel_repo.replace_json_data([record for _, record, _ in replaced])
+            for result, record, digest in replaced:
+                self._refresh(digest, result.id, record["json_data"])
+            self._view_cache.invalidate()
+        return replaced
+
+    def parse_document(self, session: ParseSession) -> EncodedRecords:
+        """Parse and consolidate a document into the records the repository stores."""
+        return self._parse(session)
+
+    def get_job(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
 
     def get_excel_stream(self):
         logger.info("Excel stream retrieval started")
         return self.excel_repo.get_stream()
+
+    def get_excel_versioned_stream(self):
+        """Return the workbook stream and the version of the bytes it yields."""
+        logger.info("Excel stream retrieval started")
+        return self.excel_repo.get_versioned_stream()
+
+    def iter_excel_entries(self):
+        """Yield every decoded workbook entry; memory does not grow with the dataset."""
+        logger.info("Excel entry stream started")
+        return self.excel_repo.iter_entries()
+
+    def iter_documents(self):
+        """Yield the id, filename and file_type of every entry without its records."""
+        return self.excel_repo.iter_documents()
+
+    def get_excel_version(self) -> str:
+        with metrics.stage("get_excel", "version"):
+            return self.excel_repo.get_version()
+
+    def get_excel_page(
+        self, offset: int = 0, limit: Optional[int] = None, version: Optional[str] = None
+    ) -> ExcelPage:
+        """Return decoded workbook entries, served from cache while the version holds."""
+        version = version or self.get_excel_version()
+        page = self._view_cache.get(version, offset, limit)
+        if page is not None:
+            logger.info("Excel page served from cache: version='%s', offset=%d", version, offset)
+            return page
+        with metrics.stage("get_excel", "read_entries"):
+            entries, total = self.excel_repo.get_entries(offset=offset, limit=limit)
+        page = ExcelPage(entries=entries, total=total, version=version)
+        self._view_cache.put(page, offset, limit)
+        return page
+
+    def query_records(self, query: RecordQuery):
+        """Return one page of transformed records matching the query and the match count."""
+        with metrics.stage("query_records", "query"):
+            return self.excel_repo.query_records(query)
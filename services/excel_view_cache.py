@@ -0,0 +1,54 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+# number of decoded pages kept for the current workbook version
+EXCEL_VIEW_CACHE_PAGES = int(os.environ.get("EXCEL_VIEW_CACHE_PAGES", "64"))
+
+
+@dataclass
+class ExcelPage:
+    entries: List[dict]
+    total: int
+    version: str
+
+
+class ExcelViewCache:
+    """LRU cache of decoded workbook pages for a single workbook version.
+
+    Pages are keyed by (offset, limit) and only valid for the version they
+    were decoded from; storing a page of a newer version or calling
+    ``invalidate`` drops everything cached so far.
+    """
+
+    def __init__(self, max_pages: int = EXCEL_VIEW_CACHE_PAGES):
+        self.max_pages = max_pages
+        self._version: Optional[str] = None
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: str, offset: int, limit: Optional[int]) -> Optional[ExcelPage]:
+        with self._lock:
+            if version != self._version:
+                return None
+            page = self._pages.get((offset, limit))
+            if page is not None:
+                self._pages.move_to_end((offset, limit))
+            return page
+
+    def put(self, page: ExcelPage, offset: int, limit: Optional[int]):
+        with self._lock:
+            if page.version != self._version:
+                self._pages.clear()
+                self._version = page.version
+            self._pages[(offset, limit)] = page
+            self._pages.move_to_end((offset, limit))
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._pages.clear()
+            self._version = None
@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Optional
+
+from app.interfaces.storage_interface import IStorage
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# size of the ingest worker pool; defaults to one worker per core
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", str(os.cpu_count() or 1)))
+# finished jobs kept for status queries before the oldest are dropped
+INGEST_JOB_HISTORY = int(os.environ.get("INGEST_JOB_HISTORY", "1000"))
+# job states are stored as one JSON object per job under this prefix
+INGEST_JOBS_PREFIX = os.environ.get("INGEST_JOBS_PREFIX", "ingest_jobs/")
+# seconds between refreshes of the stored state of unfinished jobs
+INGEST_JOB_HEARTBEAT_SECONDS = float(os.environ.get("INGEST_JOB_HEARTBEAT_SECONDS", "15"))
+# an unfinished job not refreshed for this long belonged to a worker that stopped
+INGEST_JOB_LEASE_SECONDS = float(
+    os.environ.get("INGEST_JOB_LEASE_SECONDS", str(4 * INGEST_JOB_HEARTBEAT_SECONDS))
+)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class IngestJob:
+    id: str
+    filename: str
+    blob_id: str
+    blob_url: str
+    state: str = QUEUED
+    excel_row: Optional[int] = None
+    error: Optional[str] = None
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    updated_at: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IngestJob":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+    def to_dict(self) -> dict:
+        data = dict(self.__dict__)
+        data["queue_seconds"] = (
+            self.started_at - self.submitted_at if self.started_at else None
+        )
+        data["run_seconds"] = (
+            self.finished_at - self.started_at
+            if self.started_at and self.finished_at
+            else None
+        )
+        return data
+
+
+class IngestJobManager:
+    """Runs ingest work on a thread pool and tracks job state for polling.
+
+    With a storage backend every state change is also written to
+    ``<INGEST_JOBS_PREFIX><job id>.json``, so any worker process can answer
+    a status query and a job outlives the process that accepted it.
+    Unfinished jobs are refreshed every INGEST_JOB_HEARTBEAT_SECONDS; one
+    whose state was not refreshed for INGEST_JOB_LEASE_SECONDS belonged to
+    a process that stopped, and is reported as failed so clients stop
+    polling and can upload again.
+    """
+
+    def __init__(
+        self,
+        storage: Optional[IStorage] = None,
+        workers: int = INGEST_WORKERS,
+        history: int = INGEST_JOB_HISTORY,
+        prefix: str = INGEST_JOBS_PREFIX,
+    ):
+        self.storage = storage
+        self.prefix = prefix
+        self.history = history
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(workers, 1), thread_name_prefix="ingest"
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        logger.info("Ingest job manager initialized: workers=%d", max(workers, 1))
+
+    def submit(self, filename: str, blob_id: str, blob_url: str, work: Callable[[], int]) -> IngestJob:
+        """Queue ``work``, which returns the resulting Excel row, as a new job."""
+        job = IngestJob(
+            id=str(uuid.uuid4()),
+            filename=filename,
+            blob_id=blob_id,
+            blob_url=blob_url,
+            submitted_at=time.time(),
+        )
+        # the job must be visible to every worker before its id is handed out
+        self._save(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        self._start_heartbeat()
+        self._executor.submit(self._run, job, work)
+        logger.info("Ingest job queued: job_id='%s', blob_id='%s'", job.id, blob_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or self.storage is None:
+            return job
+        return self._load(job_id)
+
+    def _name(self, job_id: str) -> str:
+        return f"{self.prefix}{job_id}.json"
+
+    def _save(self, job: IngestJob):
+        if self.storage is None:
+            return
+        with self._lock:
+            job.updated_at = time.time()
+            data = json.dumps(asdict(job)).encode("utf-8")
+        self.storage.save(self._name(job.id), data)
+
+    def _try_save(self, job: IngestJob):
+        try:
+            self._save(job)
+        except Exception:
+            # this process still answers for the job; other workers see the last stored state
+            logger.exception("Failed to store ingest job state: job_id='%s'", job.id)
+
+    def _load(self, job_id: str) -> Optional[IngestJob]:
+        try:
+            # only job ids name stored jobs; anything else could address other objects
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+        try:
+            job = IngestJob.from_dict(json.loads(self.storage.get(self._name(job_id))))
+        except Exception:
+            return None
+        expired = (job.updated_at or 0) + INGEST_JOB_LEASE_SECONDS < time.time()
+        if job.state in (QUEUED, RUNNING) and expired:
+            job.state = FAILED
+            job.error = "Ingest worker stopped before the job finished; upload the document again"
+        return job
+
+    def _start_heartbeat(self):
+        if self.storage is None or self._heartbeat is not None:
+            return
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(
+                    target=self._heartbeat_loop, name="ingest-heartbeat", daemon=True
+                )
+                self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(INGEST_JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                active = [job for job in self._jobs.values() if job.state in (QUEUED, RUNNING)]
+            for job in active:
+                self._try_save(job)
+
+    def _run(self, job: IngestJob, work: Callable[[], int]):
+        job.started_at = time.time()
+        job.state = RUNNING
+        self._try_save(job)
+        try:
+            job.excel_row = work()
+            job.state = SUCCEEDED
+        except Exception as e:
+            logger.exception("Ingest job failed: job_id='%s'", job.id)
+            job.error = str(e)
+            job.state = FAILED
+        finally:
+            job.finished_at = time.time()
+            self._try_save(job)
+        logger.info(
+            "Ingest job finished: job_id='%s', state='%s', run_seconds=%.3f",
+            job.id,
+            job.state,
+            job.finished_at - job.started_at,
+        )
+
+    def _evict(self):
+        # drop the oldest finished jobs once the history limit is exceeded
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].state in (SUCCEEDED, FAILED):
+                del self._jobs[job_id]
+                if self.storage is not None:
+                    self._executor.submit(self.storage.delete, self._name(job_id))
+                excess -= 1
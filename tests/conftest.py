@@ -0,0 +1,58 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _import_package_as_app():
+    """Make the checkout importable as ``app``, the name the code imports itself by."""
+    if "app" in sys.modules:
+        return
+    if PACKAGE_DIR.name == "app":
+        sys.path.insert(0, str(PACKAGE_DIR.parent))
+        return
+    spec = importlib.util.spec_from_file_location(
+        "app", PACKAGE_DIR / "__init__.py", submodule_search_locations=[str(PACKAGE_DIR)]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app"] = module
+    spec.loader.exec_module(module)
+
+
+_import_package_as_app()
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    from app.implementations.local_file_storage import LocalFileStorage
+
+    return LocalFileStorage(str(tmp_path / "storage"))
+
+
+@pytest.fixture
+def memory_storage():
+    from app.benchmarks.memory_storage import InMemoryStorage
+
+    return InMemoryStorage()
+
+
+@pytest.fixture
+def service(local_storage, monkeypatch):
+    from app.implementations import excel_repository
+    from app.implementations.excel_repository import ExcelRepository
+    from app.services.document_service import DocumentService
+
+    monkeypatch.setattr(excel_repository, "COMPACT_INTERVAL_SECONDS", 0)
+    return DocumentService(storage=local_storage, excel_repo=ExcelRepository(local_storage))
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    from app.app import create_app
+    from app.controllers import document_controller
+
+    monkeypatch.setattr(document_controller, "_service", service)
+    return create_app().test_client()
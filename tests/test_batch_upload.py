@@ -0,0 +1,66 @@
+import io
+
+from app.benchmarks.corpus import make_pdf
+from app.controllers import document_controller
+
+BATCH = "/api/documents/batch"
+HEADER = "Project Name   Task Name   Progress"
+
+
+def _pdf(task: str) -> bytes:
+    return make_pdf([[HEADER, f"Alpha          {task:<12}10%"]])
+
+
+def _post(client, files):
+    data = {"files": [(io.BytesIO(content), name) for name, content in files]}
+    return client.post(BATCH, data=data, content_type="multipart/form-data")
+
+
+def test_batch_records_valid_files_with_one_write(client, service, monkeypatch):
+    writes = []
+    append_many = service.excel_repo.append_many
+
+    def counted(records):
+        writes.append([record["filename"] for record in records])
+        return append_many(records)
+
+    monkeypatch.setattr(service.excel_repo, "append_many", counted)
+    response = _post(
+        client, [("a.pdf", _pdf("Review")), ("broken.pdf", b"not a pdf"), ("b.pdf", _pdf("Write"))]
+    )
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    a, broken, b = body["results"]
+    assert [r["filename"] for r in body["results"]] == ["a.pdf", "broken.pdf", "b.pdf"]
+    assert broken["error"] and broken["id"] is None and broken["excel_row"] is None
+    assert (a["excel_row"], b["excel_row"]) == (2, 3)
+    assert writes == [["a.pdf", "b.pdf"]]
+    entries = service.excel_repo.get_entries()[0]
+    assert [(e["id"], e["transformed_data"][0]["Task Name"]) for e in entries] == [
+        (a["id"], "Review"),
+        (b["id"], "Write"),
+    ]
+
+
+def test_batch_answers_indexed_duplicates_without_appending(client, service):
+    first = _post(client, [("a.pdf", _pdf("Review"))]).get_json()["results"][0]
+
+    body = _post(client, [("copy.pdf", _pdf("Review")), ("b.pdf", _pdf("Write"))]).get_json()
+    copy, b = body["results"]
+    assert (copy["id"], copy["excel_row"]) == (first["id"], first["excel_row"])
+    assert b["excel_row"] == first["excel_row"] + 1
+    assert [e["filename"] for e in service.excel_repo.get_entries()[0]] == ["a.pdf", "b.pdf"]
+
+
+def test_batch_without_files_is_rejected(client):
+    response = client.post(BATCH, data={}, content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+def test_batch_over_the_file_limit_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(document_controller, "BATCH_MAX_FILES", 1)
+    response = _post(client, [("a.pdf", _pdf("Review")), ("b.pdf", _pdf("Write"))])
+    assert response.status_code == 400
+    assert "At most 1" in response.get_json()["error"]
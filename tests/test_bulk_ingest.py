@@ -0,0 +1,147 @@
+import io
+import json
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.benchmarks.corpus import make_pdf
+from app.cli import bulk_ingest
+from app.implementations.sqlite_record_repository import SqliteRecordRepository
+from app.services.document_service import DocumentService
+from app.utils.file_validator import validate_file
+from app.utils.records import Record
+
+PDF = make_pdf([["Project Name   Task Name   Progress", "Alpha          Review      10%"]])
+FILENAMES = {"0.pdf": "upload-0.pdf", "1.pdf": "upload-1.pdf"}
+
+
+def _document(i: int, records: int = 1) -> dict:
+    data = json.dumps([{"n": n, "text": "x" * 100} for n in range(records)])
+    return {"id": f"{i}.pdf", "filename": f"upload-{i}.pdf", "file_type": "pdf", "json_data": data}
+
+
+def test_stored_filenames_do_not_load_payloads(service, monkeypatch):
+    # the second document is large enough to be offloaded to its own blob
+    service.excel_repo.append_many([_document(0), _document(1, records=500)])
+    monkeypatch.setattr(
+        service.excel_repo.payloads, "load", lambda reference: pytest.fail("payload loaded")
+    )
+
+    assert bulk_ingest._stored_filenames(service) == FILENAMES
+
+
+def test_stored_filenames_from_sqlite(local_storage, tmp_path):
+    service = DocumentService(
+        storage=local_storage, excel_repo=SqliteRecordRepository(str(tmp_path / "records.db"))
+    )
+    service.excel_repo.append_many([_document(0), _document(1)])
+
+    assert bulk_ingest._stored_filenames(service) == FILENAMES
+
+
+class _InlinePool:
+    """Stands in for the process pool so workers run in the test process."""
+
+    def __init__(self, workers, initializer=None, initargs=()):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def imap_unordered(self, func, iterable):
+        return map(func, iterable)
+
+
+class _InlineContext:
+    Pool = _InlinePool
+
+
+def _worker(failing: set):
+    def prepare(task):
+        key, _ = task
+        result = bulk_ingest.BatchItemResult(filename=key, id=key)
+        if key in failing:
+            result.error = "parse failed"
+            return key, (result, None, None)
+        record = DocumentService.repository_record(key, key, "pdf", _document(0)["json_data"])
+        return key, (result, record, None)
+
+    return prepare
+
+
+def test_rerun_resumes_from_the_checkpoint(service, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_ingest.multiprocessing, "get_context", lambda _: _InlineContext)
+    checkpoint = str(tmp_path / "run.checkpoint")
+    tasks = [(f"{i}.pdf", f"{i}.pdf") for i in range(5)]
+
+    first = bulk_ingest.run(service, iter(tasks), _worker({"3.pdf"}), checkpoint, 1, 2)
+    assert (first["recorded"], first["skipped"], first["failed"]) == (4, 0, 1)
+
+    # a source finished earlier that is not part of this run is not counted
+    with open(checkpoint, "a", encoding="utf-8") as fh:
+        fh.write("gone.pdf\n")
+    second = bulk_ingest.run(service, iter(tasks), _worker(set()), checkpoint, 1, 2)
+    assert (second["recorded"], second["skipped"], second["failed"]) == (1, 4, 0)
+
+    ids = [document["id"] for document in service.iter_documents()]
+    assert sorted(ids) == [key for key, _ in tasks]
+
+
+def test_reprocess_replaces_rows_by_id(service, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_ingest.multiprocessing, "get_context", lambda _: _InlineContext)
+    service.excel_repo.append_many([_document(0), _document(1, records=3)])
+    tasks = [(f"{i}.pdf", f"{i}.pdf") for i in range(3)]
+
+    for run in range(2):
+        # the stored document without a row is appended once, then replaced
+        checkpoint = str(tmp_path / f"run-{run}.checkpoint")
+        filenames = bulk_ingest._stored_filenames(service)
+        stats = bulk_ingest.run(
+            service, iter(tasks), _worker(set()), checkpoint, 1, 10, filenames, replace=True
+        )
+        assert stats["recorded"] == 3
+
+    entries = list(service.iter_excel_entries())
+    assert [entry["id"] for entry in entries] == ["0.pdf", "1.pdf", "2.pdf"]
+    assert [entry["filename"] for entry in entries[:2]] == ["upload-0.pdf", "upload-1.pdf"]
+    assert all(len(entry["transformed_data"]) == 1 for entry in entries)
+
+
+class _Parser:
+    def iter_records(self, session):
+        yield Record.from_dict({"Project Name": "Beta", "Task Name": "Ship"})
+
+
+def test_reprocessed_records_reach_later_duplicates(service, tmp_path, monkeypatch):
+    session = validate_file(FileStorage(stream=io.BytesIO(PDF), filename="doc.pdf"))
+    first = service.process_upload(session.stream, "doc.pdf", session)
+    session.close()
+    service.parsers["pdf"] = _Parser()
+    monkeypatch.setattr(bulk_ingest.multiprocessing, "get_context", lambda _: _InlineContext)
+    monkeypatch.setattr(bulk_ingest, "_worker_service", service)
+    filenames = bulk_ingest._stored_filenames(service)
+    stats = bulk_ingest.run(
+        service,
+        bulk_ingest._stored_tasks(service),
+        bulk_ingest._reprocess_blob,
+        str(tmp_path / "reprocess.checkpoint"),
+        1,
+        10,
+        filenames=filenames,
+        replace=True,
+    )
+    assert stats["recorded"] == 1
+
+    # a duplicate recorded from the index gets the reprocessed records
+    service.dedup_mode = "record"
+    session = validate_file(FileStorage(stream=io.BytesIO(PDF), filename="copy.pdf"))
+    service.process_upload(session.stream, "copy.pdf", session)
+    session.close()
+    beta = [{"Project Name": "Beta", "Task Name": "Ship"}]
+    assert [(e["id"], e["transformed_data"]) for e in service.excel_repo.get_entries()[0]] == [
+        (first.id, beta),
+        (first.id, beta),
+    ]
@@ -0,0 +1,99 @@
+import io
+import threading
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.benchmarks.corpus import make_pdf
+from app.cli import bulk_ingest
+from app.implementations.blob_hash_index import HASH_INDEX_PREFIX
+from app.utils.file_validator import validate_file
+
+PDF = make_pdf([["Project Name   Task Name   Progress", "Alpha          Review      10%"]])
+ALPHA = [{"Project Name": "Alpha", "Task Name": "Review", "Progress": "10%"}]
+
+
+def _upload(service, filename="doc.pdf"):
+    session = validate_file(FileStorage(stream=io.BytesIO(PDF), filename=filename))
+    try:
+        return service.process_upload(session.stream, filename, session)
+    finally:
+        session.close()
+
+
+def _entries(service):
+    return service.excel_repo.get_entries()[0]
+
+
+def _raw_documents(service):
+    return [name for name in service.storage.list() if bulk_ingest.RAW_DOCUMENT_NAME.match(name)]
+
+
+def _fail_parse(service, monkeypatch):
+    monkeypatch.setattr(
+        service.parsers["pdf"], "iter_records", lambda session: pytest.fail("parsed again")
+    )
+
+
+def test_reuse_answers_a_duplicate_with_the_existing_row(service, monkeypatch):
+    first = _upload(service)
+    _fail_parse(service, monkeypatch)
+
+    assert _upload(service, "copy.pdf") == first
+    assert [entry["filename"] for entry in _entries(service)] == ["doc.pdf"]
+    assert _raw_documents(service) == [first.id]
+
+
+def test_record_appends_a_row_from_the_indexed_records(service, monkeypatch):
+    service.dedup_mode = "record"
+    first = _upload(service)
+    _fail_parse(service, monkeypatch)
+
+    second = _upload(service, "copy.pdf")
+    assert (second.id, second.blob_url) == (first.id, first.blob_url)
+    assert second.excel_row == first.excel_row + 1
+    assert [(e["id"], e["filename"], e["transformed_data"]) for e in _entries(service)] == [
+        (first.id, "doc.pdf", ALPHA),
+        (first.id, "copy.pdf", ALPHA),
+    ]
+    assert _raw_documents(service) == [first.id]
+
+
+def test_off_stores_and_parses_every_upload(service):
+    service.dedup_mode = "off"
+    first, second = _upload(service), _upload(service, "copy.pdf")
+
+    assert first.id != second.id
+    assert [entry["transformed_data"] for entry in _entries(service)] == [ALPHA, ALPHA]
+    assert list(service.storage.list(HASH_INDEX_PREFIX)) == []
+
+
+def test_racing_writers_keep_the_first_index_entry(service, monkeypatch):
+    # both uploads miss the index before either has recorded its entry
+    lookup = service.hash_index.get
+    both_looked = threading.Barrier(2)
+
+    def get(digest):
+        both_looked.wait(timeout=10)
+        return None
+
+    monkeypatch.setattr(service.hash_index, "get", get)
+    results = [None, None]
+
+    def upload(i):
+        results[i] = _upload(service, f"doc{i}.pdf")
+
+    threads = [threading.Thread(target=upload, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    (name,) = service.storage.list(HASH_INDEX_PREFIX)
+    digest = name[len(HASH_INDEX_PREFIX) : -len(".json")]
+    winner = lookup(digest)
+    assert winner["id"] in {result.id for result in results}
+    assert {result.id: result.excel_row for result in results}[winner["id"]] == winner["excel_row"]
+
+    monkeypatch.setattr(service.hash_index, "get", lookup)
+    assert _upload(service, "copy.pdf").id == winner["id"]
@@ -0,0 +1,82 @@
+import io
+import zipfile
+
+from app.utils.docx_extractor import extract_docx
+
+
+def _extract(body: str):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        zf.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>",
+        )
+    return extract_docx(out)
+
+
+def _p(*runs: str) -> str:
+    return "<w:p>" + "".join(f"<w:r>{run}</w:r>" for run in runs) + "</w:p>"
+
+
+def _t(text: str) -> str:
+    return f"<w:t>{text}</w:t>"
+
+
+def _table(*rows) -> str:
+    return "<w:tbl>" + "".join(
+        "<w:tr>" + "".join(f"<w:tc>{cell}</w:tc>" for cell in row) + "</w:tr>" for row in rows
+    ) + "</w:tbl>"
+
+
+def test_paragraphs_and_table_rows_become_blocks_in_order():
+    content = _extract(
+        _p(_t("Intro"))
+        + _table([_p(_t("Name")), _p(_t("Progress"))], [_p(_t("Alpha")), _p(_t("10%"))])
+        + _p(_t("Outro"))
+    )
+    assert content.blocks == ["Intro", ["Name", "Progress"], ["Alpha", "10%"], "Outro"]
+    assert content.paragraphs == ["Intro", "Outro"]
+    assert content.tables == [[["Name", "Progress"], ["Alpha", "10%"]]]
+    assert content.text == "Intro\nName\tProgress\nAlpha\t10%\nOutro"
+
+
+def test_cell_paragraphs_are_joined_by_lines_without_blank_ones():
+    content = _extract(_table([_p(_t("first")) + _p() + _p(_t("second"))]))
+    assert content.blocks == [["first\nsecond"]]
+
+
+def test_nested_table_cells_are_flattened_into_the_enclosing_cell():
+    inner = _table([_p(_t("a")), _p(_t("b"))], [_p(_t("c")), _p(_t("d"))])
+    content = _extract(_table([_p(_t("outer")) + inner, _p(_t("next"))]))
+    assert content.blocks == [["outer\na\nb\nc\nd", "next"]]
+
+
+def test_run_tabs_are_text_but_tab_stops_are_not():
+    tab_stops = '<w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>'
+    content = _extract(
+        "<w:p>" + tab_stops + "<w:r><w:t>Name</w:t><w:tab/><w:t>Alpha</w:t></w:r></w:p>"
+    )
+    assert content.blocks == ["Name\tAlpha"]
+
+
+def test_breaks_and_carriage_returns_become_newlines():
+    content = _extract(_p(_t("one") + "<w:br/>" + _t("two") + "<w:cr/>" + _t("three")))
+    assert content.blocks == ["one\ntwo\nthree"]
+
+
+def test_textbox_paragraph_does_not_cut_the_enclosing_paragraph():
+    textbox = "<w:pict><w:txbxContent>" + _p(_t("boxed")) + "</w:txbxContent></w:pict>"
+    content = _extract(_p(_t("before "), textbox, _t("after")))
+    assert content.blocks == ["before \nboxed\nafter"]
+
+
+def test_textbox_inside_a_table_cell_stays_in_the_cell():
+    textbox = "<w:pict><w:txbxContent>" + _p(_t("boxed")) + "</w:txbxContent></w:pict>"
+    content = _extract(_table([_p(_t("cell"), textbox), _p(_t("next"))]))
+    assert content.blocks == [["cell\nboxed", "next"]]
+
+
+def test_has_text_ignores_blank_paragraphs_and_cells():
+    assert not _extract(_p(_t("  ")) + _table([_p(), _p(_t(" "))])).has_text()
+    assert _extract(_p() + _table([_p(), _p(_t("x"))])).has_text()
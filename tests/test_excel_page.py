@@ -0,0 +1,112 @@
+import pytest
+
+from app.services.excel_view_cache import ExcelPage, ExcelViewCache
+
+EXCEL = "/api/documents/excel"
+
+
+def _document(i: int) -> dict:
+    name = f"{i}.pdf"
+    return {"id": name, "filename": name, "file_type": "pdf", "json_data": f'[{{"n":{i}}}]'}
+
+
+@pytest.fixture
+def stored(service):
+    service.excel_repo.append_many([_document(i) for i in range(5)])
+
+
+def _ids(response):
+    return [entry["id"] for entry in response.get_json()["data"]]
+
+
+def test_pages_follow_the_cursor_to_the_end(client, stored):
+    cursor, pages = 0, []
+    while cursor is not None:
+        response = client.get(f"{EXCEL}?limit=2&cursor={cursor}")
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "5"
+        pages.append(_ids(response))
+        cursor = response.get_json()["next_cursor"]
+
+    assert pages == [["0.pdf", "1.pdf"], ["2.pdf", "3.pdf"], ["4.pdf"]]
+
+
+def test_page_entries_are_decoded(client, stored):
+    (entry,) = client.get(f"{EXCEL}?limit=1&cursor=3").get_json()["data"]
+    assert entry == {
+        "id": "3.pdf",
+        "filename": "3.pdf",
+        "file_type": "pdf",
+        "transformed_data": [{"n": 3}],
+    }
+
+
+def test_without_a_limit_everything_after_the_cursor_is_returned(client, stored):
+    response = client.get(f"{EXCEL}?cursor=1")
+    assert _ids(response) == ["1.pdf", "2.pdf", "3.pdf", "4.pdf"]
+    assert response.get_json()["next_cursor"] is None
+
+
+def test_cursor_past_the_end_returns_an_empty_page(client, stored):
+    body = client.get(f"{EXCEL}?cursor=9").get_json()
+    assert body == {"data": [], "next_cursor": None}
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=1001", "cursor=-1", "limit=two"])
+def test_invalid_page_arguments_are_rejected(client, stored, query):
+    response = client.get(f"{EXCEL}?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_unchanged_listing_is_not_modified(client, service, stored):
+    etag = client.get(EXCEL).headers["ETag"]
+
+    response = client.get(EXCEL, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.get_data() == b""
+
+    service.excel_repo.append(_document(5))
+    response = client.get(EXCEL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.headers["X-Total-Count"] == "6"
+
+
+def test_repeated_page_is_served_from_the_view_cache(client, service, stored, monkeypatch):
+    first = client.get(f"{EXCEL}?limit=2").get_json()
+    monkeypatch.setattr(
+        service.excel_repo, "get_entries", lambda **kwargs: pytest.fail("page decoded again")
+    )
+
+    assert client.get(f"{EXCEL}?limit=2").get_json() == first
+
+
+def test_view_cache_misses_once_the_workbook_changed(client, service, stored):
+    client.get(f"{EXCEL}?limit=2")
+    service.excel_repo.append(_document(5))
+
+    assert client.get(EXCEL).headers["X-Total-Count"] == "6"
+    assert _ids(client.get(f"{EXCEL}?cursor=4")) == ["4.pdf", "5.pdf"]
+
+
+def test_view_cache_keeps_the_most_recent_pages_of_one_version():
+    cache = ExcelViewCache(max_pages=2)
+    pages = {offset: ExcelPage(entries=[], total=9, version="v1") for offset in range(3)}
+    for offset in (0, 1):
+        cache.put(pages[offset], offset, 1)
+    cache.get("v1", 0, 1)
+    cache.put(pages[2], 2, 1)
+
+    # page 1 was the least recently used
+    assert cache.get("v1", 1, 1) is None
+    assert cache.get("v1", 0, 1) is pages[0]
+    assert cache.get("v1", 2, 1) is pages[2]
+    assert cache.get("v2", 0, 1) is None
+
+    cache.put(ExcelPage(entries=[], total=9, version="v2"), 0, 1)
+    assert cache.get("v1", 2, 1) is None
+
+    cache.invalidate()
+    assert cache.get("v2", 0, 1) is None
@@ -0,0 +1,319 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from app.benchmarks.memory_storage import InMemoryStorage
+from app.implementations import excel_repository
+from app.implementations.excel_repository import ExcelRepository
+from app.implementations.local_file_storage import LocalFileStorage
+from app.interfaces.storage_interface import ObjectFullError
+
+
+class BlockLimitedStorage(InMemoryStorage):
+    """In-memory storage that, like an Azure append blob, refuses appends past a block count."""
+
+    def __init__(self, max_blocks: int):
+        super().__init__()
+        self.max_blocks = max_blocks
+        self.blocks = {}
+
+    def append(self, name, data, expected_offset=None):
+        if self.blocks.get(name, 0) >= self.max_blocks:
+            raise ObjectFullError(name)
+        offset = super().append(name, data, expected_offset)
+        self.blocks[name] = self.blocks.get(name, 0) + 1
+        return offset
+
+
+@pytest.fixture(autouse=True)
+def no_background_compaction(monkeypatch):
+    monkeypatch.setattr(excel_repository, "COMPACT_INTERVAL_SECONDS", 0)
+
+
+def _record(i: int) -> dict:
+    return {"id": f"doc-{i}", "filename": f"f{i}.pdf", "file_type": "pdf", "json_data": f"[{i}]"}
+
+
+def _ids(repo: ExcelRepository) -> list:
+    return [entry["id"] for entry in repo.iter_entries()]
+
+
+def test_full_segment_rolls_over_to_the_next():
+    storage = BlockLimitedStorage(max_blocks=3)
+    first, second = ExcelRepository(storage), ExcelRepository(storage)
+    rows = []
+    for i in range(20):
+        # two writers sharing the journal, as two worker processes would
+        rows.append((first if i % 2 else second).append(_record(i)))
+
+    assert rows == list(range(2, 22))
+    segments = list(storage.list(excel_repository.JOURNAL_PREFIX))
+    assert len(segments) == 7
+    assert _ids(first) == [f"doc-{i}" for i in range(20)]
+    assert _ids(second) == [f"doc-{i}" for i in range(20)]
+
+
+def test_reader_follows_segments_below_the_size_limit():
+    storage = BlockLimitedStorage(max_blocks=2)
+    writer = ExcelRepository(storage)
+    writer.append_many([_record(0), _record(1)])
+    writer.append(_record(2))
+    writer.append(_record(3))
+
+    # a process started later replays the journal from the beginning
+    reader = ExcelRepository(storage)
+    assert reader.append(_record(4)) == 6
+    assert _ids(reader) == [f"doc-{i}" for i in range(5)]
+
+
+class FailingSyncStorage(InMemoryStorage):
+    """In-memory storage whose next workbook writes fail with the given errors."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = []
+
+    def save_if_match(self, name, data, etag):
+        if self.failures:
+            raise self.failures.pop(0)
+        return super().save_if_match(name, data, etag)
+
+
+def test_compaction_after_failed_sync_does_not_duplicate_rows():
+    storage = FailingSyncStorage()
+    repo = ExcelRepository(storage)
+    repo.append_many([_record(0), _record(1)])
+    storage.failures.append(OSError("network down"))
+    with pytest.raises(OSError):
+        repo.compact()
+
+    repo.append(_record(2))
+    assert repo.compact() is True
+    assert repo.compact() is False
+    assert _ids(repo) == ["doc-0", "doc-1", "doc-2"]
+
+
+def test_compaction_conflict_retry_does_not_duplicate_rows():
+    storage = FailingSyncStorage()
+    repo = ExcelRepository(storage)
+    repo.append_many([_record(0), _record(1)])
+    assert repo.compact() is True
+    repo.append(_record(2))
+
+    # another process compacts first; ours has to start again from its workbook
+    ExcelRepository(storage).compact()
+    repo.append(_record(3))
+    assert repo.compact() is True
+    assert _ids(repo) == ["doc-0", "doc-1", "doc-2", "doc-3"]
+    assert _ids(ExcelRepository(storage)) == ["doc-0", "doc-1", "doc-2", "doc-3"]
+
+
+def test_illegal_characters_do_not_wedge_compaction():
+    repo = ExcelRepository(InMemoryStorage())
+    record = _record(0)
+    record["filename"] = "bad\x01name\x1f.pdf"
+    repo.append(record)
+    repo.append(_record(1))
+
+    assert repo.compact() is True
+    entries = list(repo.iter_entries())
+    assert [entry["filename"] for entry in entries] == ["bad�name�.pdf", "f1.pdf"]
+
+
+def test_compaction_failing_partway_does_not_duplicate_rows(monkeypatch):
+    repo = ExcelRepository(InMemoryStorage())
+    repo.append_many([_record(0), _record(1), _record(2)])
+    failures = ["f1.pdf"]
+
+    def flaky_cell(value):
+        if value in failures:
+            failures.remove(value)
+            raise ValueError("cell rejected")
+        return value
+
+    # the first attempt fails after one row was already added to the workbook
+    monkeypatch.setattr(excel_repository, "xlsx_safe", flaky_cell)
+    with pytest.raises(ValueError):
+        repo.compact()
+
+    assert repo.compact() is True
+    assert _ids(repo) == ["doc-0", "doc-1", "doc-2"]
+
+
+def test_offloaded_payload_counts_records_without_decoding(monkeypatch):
+    from openpyxl import load_workbook
+
+    from app.services.document_service import DocumentService
+    from app.utils import payload_store
+    from app.utils.records import encode_record_list
+    from app.utils.workbook_reader import payload_reference
+
+    repo = ExcelRepository(InMemoryStorage())
+    encoded = encode_record_list({"n": i, "text": "x" * 100} for i in range(300))
+    with monkeypatch.context() as patch:
+        patch.setattr(payload_store, "decode_json_cell", lambda cell: pytest.fail("decoded"))
+        repo.append_many(
+            [
+                DocumentService.repository_record("doc-0", "a.pdf", "pdf", encoded),
+                DocumentService.repository_record("doc-1", "b.pdf", "pdf", encoded.text),
+            ]
+        )
+
+    assert repo.compact() is True
+    rows = load_workbook(repo.get_stream(), read_only=True).active.iter_rows(
+        min_row=2, values_only=True
+    )
+    assert [payload_reference(row[3]).records for row in rows] == [300, None]
+    assert [len(entry["transformed_data"]) for entry in repo.iter_entries()] == [300, 300]
+
+
+def _replacement(i: int, data: str) -> dict:
+    return {"id": f"doc-{i}", "filename": "ignored.pdf", "file_type": "pdf", "json_data": data}
+
+
+def test_replaced_json_data_is_materialized_in_place():
+    storage = InMemoryStorage()
+    repo = ExcelRepository(storage)
+    repo.append_many([_record(0), _record(1), _record(1)])
+    assert repo.compact() is True
+
+    repo.replace_json_data([_replacement(1, '[{"v":2}]')])
+    # a replacement adds no rows: the next append still gets the next row number
+    assert repo.append(_record(3)) == 5
+    # a row that is only journaled so far is replaced as well
+    repo.replace_json_data([_replacement(3, '[{"v":3}]')])
+    assert repo.compact() is True
+
+    entries = list(repo.iter_entries())
+    assert [entry["id"] for entry in entries] == ["doc-0", "doc-1", "doc-1", "doc-3"]
+    assert [entry["filename"] for entry in entries] == ["f0.pdf", "f1.pdf", "f1.pdf", "f3.pdf"]
+    assert [entry["transformed_data"] for entry in entries] == [
+        [0],
+        [{"v": 2}],
+        [{"v": 2}],
+        [{"v": 3}],
+    ]
+    # another process replaying the journal counts the same rows
+    assert ExcelRepository(storage).append(_record(4)) == 6
+
+
+def test_query_index_sees_replaced_rows():
+    from app.interfaces.excel_interface import RecordQuery
+
+    repo = ExcelRepository(InMemoryStorage())
+    repo.append_many([_record(0), _replacement(1, '[{"v":1}]')])
+    assert repo.query_records(RecordQuery(field_filters={"v": "1"}))[1] == 1
+
+    repo.replace_json_data([_replacement(1, '[{"v":2}]')])
+    assert repo.query_records(RecordQuery(field_filters={"v": "1"}))[1] == 0
+    assert repo.query_records(RecordQuery(field_filters={"v": "2"}))[1] == 1
+
+
+# appends _record-like rows from one process and prints the row each id received
+APPEND_WORKER = """
+import json
+import os
+import sys
+import time
+
+from app.implementations import excel_repository
+from app.implementations.excel_repository import ExcelRepository
+from app.implementations.local_file_storage import LocalFileStorage
+
+excel_repository.COMPACT_INTERVAL_SECONDS = 0
+root, writer, count, start = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4]
+repo = ExcelRepository(LocalFileStorage(root))
+# all writers start appending together once their workbook is loaded
+repo.compact()
+while not os.path.exists(start):
+    time.sleep(0.01)
+rows = {}
+for i in range(0, count, 2):
+    records = [
+        {"id": f"{writer}-{j}", "filename": f"{writer}.pdf", "file_type": "pdf", "json_data": "[]"}
+        for j in (i, i + 1)
+    ]
+    if i % 4:
+        rows.update(zip((r["id"] for r in records), repo.append_many(records)))
+    else:
+        for record in records:
+            rows[record["id"]] = repo.append(record)
+    if i == count // 2:
+        repo.compact()
+print(json.dumps(rows))
+"""
+
+
+def test_appends_from_several_processes_keep_their_rows(tmp_path):
+    # the worker processes import the checkout as ``app``
+    (tmp_path / "app").symlink_to(Path(excel_repository.__file__).resolve().parent.parent)
+    env = dict(os.environ, PYTHONPATH=str(tmp_path))
+    root, writers, count = str(tmp_path / "storage"), 4, 40
+    start = tmp_path / "start"
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", APPEND_WORKER, root, f"w{n}", str(count), str(start)],
+            cwd=tmp_path,
+            env=env,
+            stdout=subprocess.PIPE,
+        )
+        for n in range(writers)
+    ]
+    time.sleep(1)
+    start.touch()
+    rows = {}
+    for process in processes:
+        out, _ = process.communicate(timeout=120)
+        assert process.returncode == 0
+        rows.update(json.loads(out.decode().splitlines()[-1]))
+
+    # row numbers are unique and leave no gaps
+    assert sorted(rows.values()) == list(range(2, writers * count + 2))
+    for n in range(writers):
+        own = [rows[f"w{n}-{i}"] for i in range(count)]
+        assert own == sorted(own)
+
+    repo = ExcelRepository(LocalFileStorage(root))
+    repo.compact()
+    by_row = {row: doc_id for doc_id, row in rows.items()}
+    assert _ids(repo) == [by_row[row] for row in range(2, writers * count + 2)]
+
+
+class RacingCompactionStorage(InMemoryStorage):
+    """In-memory storage where another process compacts just before our next workbook write."""
+
+    def __init__(self):
+        super().__init__()
+        self.rival = None
+
+    def save_if_match(self, name, data, etag):
+        rival, self.rival = self.rival, None
+        if rival is not None:
+            rival.append(_record(9))
+            assert rival.compact() is True
+        return super().save_if_match(name, data, etag)
+
+
+def test_compaction_losing_the_if_match_race_keeps_every_row():
+    storage = RacingCompactionStorage()
+    repo = ExcelRepository(storage)
+    repo.append_many([_record(0), _record(1)])
+    assert repo.compact() is True
+    repo.append(_record(2))
+
+    rival = ExcelRepository(storage)
+    storage.rival = rival
+    # our write loses; the rival's workbook already holds our journaled row
+    assert repo.compact() is False
+
+    expected = ["doc-0", "doc-1", "doc-2", "doc-9"]
+    assert _ids(repo) == expected
+    assert _ids(ExcelRepository(storage)) == expected
+    # the next append on either side follows every journaled row
+    assert repo.append(_record(5)) == 6
+    assert rival.append(_record(6)) == 7
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+XLSX = "/api/documents/export?format=xlsx"
+
+
+def _document(name: str, data: str) -> dict:
+    return {"id": name, "filename": name, "file_type": "pdf", "json_data": data}
+
+
+@pytest.fixture
+def stored(service):
+    service.excel_repo.append_many([_document(f"{i}.pdf", f'[{{"n":{i}}}]') for i in range(3)])
+
+
+def test_full_workbook_advertises_ranges(client, stored):
+    response = client.get(XLSX)
+
+    assert response.status_code == 200
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert int(response.headers["Content-Length"]) == len(response.data)
+    assert response.data.startswith(b"PK")
+
+
+@pytest.mark.parametrize("header, start, stop", [("bytes=0-9", 0, 10), ("bytes=-5", -5, None)])
+def test_range_returns_partial_content(client, stored, header, start, stop):
+    full = client.get(XLSX).data
+    response = client.get(XLSX, headers={"Range": header})
+
+    assert response.status_code == 206
+    assert response.data == full[start:stop]
+    first = start % len(full)
+    last = first + len(response.data) - 1
+    assert response.headers["Content-Range"] == f"bytes {first}-{last}/{len(full)}"
+
+
+def test_unsatisfiable_range(client, stored):
+    size = len(client.get(XLSX).data)
+    response = client.get(XLSX, headers={"Range": f"bytes={size + 10}-"})
+
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{size}"
+
+
+def test_if_range_sends_whole_file_once_the_workbook_changed(client, service, stored):
+    etag = client.get(XLSX).headers["ETag"]
+    assert client.get(XLSX, headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+
+    service.excel_repo.append(_document("new.pdf", "[]"))
+    response = client.get(XLSX, headers={"Range": "bytes=0-9", "If-Range": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.data.startswith(b"PK") and len(response.data) > 10
+
+
+def test_unchanged_export_is_not_resent(client, stored):
+    etag = client.get(XLSX).headers["ETag"]
+    assert client.get(XLSX, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_ndjson_export_streams_every_entry(client, stored):
+    response = client.get("/api/documents/export", headers={"Accept": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    entries = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [entry["id"] for entry in entries] == ["0.pdf", "1.pdf", "2.pdf"]
+    assert entries[2]["transformed_data"] == [{"n": 2}]
+
+
+def test_workbook_replaced_while_opening_is_sent_under_its_own_tag(client, service, stored):
+    old_etag = client.get(XLSX).headers["ETag"]
+    storage = service.storage
+    open_blob = storage.open
+    replaced = []
+
+    def open_after_compaction(name):
+        # another writer compacts between reading the tag and opening the blob
+        if name == service.excel_repo.blob_name and not replaced:
+            replaced.append(name)
+            service.excel_repo.append(_document("late.pdf", "[]"))
+            service.excel_repo.compact()
+        return open_blob(name)
+
+    storage.open = open_after_compaction
+    try:
+        response = client.get(XLSX, headers={"Range": "bytes=0-9", "If-Range": old_etag})
+    finally:
+        del storage.open
+
+    assert replaced
+    # the old validator no longer matches, so the whole new workbook is sent
+    assert response.status_code == 200
+    assert response.data == storage.get(service.excel_repo.blob_name)
+    assert response.headers["ETag"] == f'"{service.get_excel_version()}.xlsx"'
+    assert response.headers["ETag"] != old_etag
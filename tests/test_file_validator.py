@@ -0,0 +1,88 @@
+import io
+import re
+import zipfile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.benchmarks.corpus import make_docx, make_pdf
+from app.utils.file_validator import validate_file
+
+LINES = ["Project Name   Task Name   Progress", "Alpha          Review      10%"]
+
+
+def _validate(data: bytes, filename: str = "doc.pdf"):
+    session = validate_file(FileStorage(stream=io.BytesIO(data), filename=filename))
+    session.close()
+    return session
+
+
+def _docx_with_body(body: str) -> bytes:
+    """A DOCX whose document.xml holds ``body`` verbatim, well-formed or not."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        zf.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>",
+        )
+    return out.getvalue()
+
+
+def _shift_startxref(data: bytes, delta: int) -> bytes:
+    def shift(match):
+        return b"startxref\n%d" % (int(match.group(1)) + delta)
+
+    return re.sub(rb"startxref\s+(\d+)", shift, data)
+
+
+def test_accepts_well_formed_pdf():
+    assert _validate(make_pdf([LINES])).ext == "pdf"
+
+
+@pytest.mark.parametrize("delta", [-2, 3])
+def test_accepts_pdf_with_startxref_slightly_off(delta):
+    _validate(_shift_startxref(make_pdf([LINES]), delta))
+
+
+def test_accepts_pdf_with_trailing_bytes_after_eof():
+    _validate(make_pdf([LINES]) + b"\x00" * 4096)
+
+
+def test_rejects_pdf_without_header():
+    data = make_pdf([LINES]).replace(b"%PDF-", b"%XYZ-", 1)
+    with pytest.raises(ValueError, match="invalid or corrupted"):
+        _validate(data)
+
+
+def test_rejects_unreadable_pdf_body():
+    with pytest.raises(ValueError, match="invalid or corrupted"):
+        _validate(b"%PDF-1.4\n" + b"garbage " * 512 + b"\n%%EOF\n")
+
+
+def test_rejects_docx_that_is_not_a_zip():
+    with pytest.raises(ValueError, match="invalid or corrupted"):
+        _validate(b"not a zip file", filename="doc.docx")
+
+
+def test_accepts_docx_with_text_and_leaves_extraction_to_the_parser():
+    session = _validate(make_docx(["Alpha Review 10%"]), filename="doc.docx")
+    assert session.docx is None
+
+
+def test_docx_probe_stops_at_the_first_text_run():
+    # the XML after the first run is never parsed, so its damage goes unnoticed here
+    data = _docx_with_body("<w:p><w:r><w:t>Alpha</w:t></w:r></w:p><w:p><broken")
+    _validate(data, filename="doc.docx")
+
+
+def test_rejects_docx_whose_text_lies_beyond_the_probe(monkeypatch):
+    monkeypatch.setattr("app.utils.file_validator.DOCX_TEXT_PROBE_BYTES", 4096)
+    data = make_docx([" "] * 200 + ["Alpha Review 10%"])
+    with pytest.raises(ValueError, match="no readable content"):
+        _validate(data, filename="doc.docx")
+
+
+def test_rejects_docx_with_blank_paragraphs_only():
+    with pytest.raises(ValueError, match="no readable content"):
+        _validate(make_docx(["", "  "], table=[["", " "]]), filename="doc.docx")
@@ -0,0 +1,58 @@
+import json
+import threading
+import time
+
+from app.services import ingest_jobs
+from app.services.ingest_jobs import FAILED, RUNNING, SUCCEEDED, IngestJobManager
+
+
+def _wait(manager, job_id, state, timeout=5.0):
+    deadline = time.time() + timeout
+    while manager.get(job_id).state != state:
+        assert time.time() < deadline, f"job never reached {state}"
+        time.sleep(0.01)
+
+
+def test_job_state_is_visible_to_another_manager(memory_storage):
+    release = threading.Event()
+    owner = IngestJobManager(memory_storage, workers=1)
+    other = IngestJobManager(memory_storage, workers=1)
+
+    job = owner.submit("doc.pdf", "blob", "url", lambda: release.wait(5) and 7)
+    _wait(owner, job.id, RUNNING)
+    assert other.get(job.id).state == RUNNING
+
+    release.set()
+    _wait(owner, job.id, SUCCEEDED)
+    _wait(other, job.id, SUCCEEDED)
+    assert other.get(job.id).excel_row == 7
+
+
+def test_job_abandoned_by_a_stopped_worker_is_reported_failed(memory_storage, monkeypatch):
+    manager = IngestJobManager(memory_storage, workers=1)
+    name = f"{manager.prefix}00000000-0000-4000-8000-000000000000.json"
+    stale = {
+        "id": "00000000-0000-4000-8000-000000000000",
+        "filename": "doc.pdf",
+        "blob_id": "blob",
+        "blob_url": "url",
+        "state": RUNNING,
+        "submitted_at": 1.0,
+        "started_at": 2.0,
+        "updated_at": time.time() - 10,
+    }
+    memory_storage.save(name, json.dumps(stale).encode())
+
+    monkeypatch.setattr(ingest_jobs, "INGEST_JOB_LEASE_SECONDS", 60)
+    assert manager.get(stale["id"]).state == RUNNING
+    monkeypatch.setattr(ingest_jobs, "INGEST_JOB_LEASE_SECONDS", 5)
+    job = manager.get(stale["id"])
+    assert job.state == FAILED
+    assert job.error
+
+
+def test_unknown_or_malformed_job_ids_are_not_found(memory_storage):
+    manager = IngestJobManager(memory_storage, workers=1)
+    memory_storage.save("secret.json", b"{}")
+    assert manager.get("00000000-0000-4000-8000-000000000000") is None
+    assert manager.get("../secret") is None
@@ -0,0 +1,75 @@
+import pytest
+
+from app.interfaces.storage_interface import ConcurrentModificationError
+from app.utils.streams import mapped_buffer
+
+
+def test_reads_are_memory_mapped_and_survive_a_replace(local_storage):
+    local_storage.save("docs/a.bin", b"first version")
+    with local_storage.open("docs/a.bin") as reader:
+        assert mapped_buffer(reader) is not None
+        local_storage.save("docs/a.bin", b"second")
+        assert reader.read() == b"first version"
+    assert local_storage.get("docs/a.bin") == b"second"
+
+
+def test_empty_files_are_readable(local_storage):
+    # empty files cannot be memory-mapped
+    local_storage.save("empty.bin", b"")
+    assert local_storage.get("empty.bin") == b""
+    assert local_storage.get_range("empty.bin", 0) == b""
+
+
+def test_get_range(local_storage):
+    local_storage.save("range.bin", b"0123456789")
+
+    assert local_storage.get_range("range.bin", 2, 3) == b"234"
+    assert local_storage.get_range("range.bin", 7) == b"789"
+    assert local_storage.get_range("range.bin", 8, 100) == b"89"
+    # at or past the end of the file
+    assert local_storage.get_range("range.bin", 10) == b""
+    assert local_storage.get_range("range.bin", 50, 5) == b""
+
+
+def test_append_is_conditional_on_the_expected_offset(local_storage):
+    assert local_storage.append("log/journal", b"abc", expected_offset=0) == 0
+    assert local_storage.append("log/journal", b"de", expected_offset=3) == 3
+    with pytest.raises(ConcurrentModificationError):
+        local_storage.append("log/journal", b"lost", expected_offset=3)
+    assert local_storage.append("log/journal", b"f") == 5
+    assert local_storage.get("log/journal") == b"abcdef"
+
+
+def test_save_if_match(local_storage):
+    etag = local_storage.save_if_match("book.xlsx", b"v1", None)
+    with pytest.raises(ConcurrentModificationError):
+        local_storage.save_if_match("book.xlsx", b"v2", None)
+
+    etag = local_storage.save_if_match("book.xlsx", b"v2", etag)
+    assert etag == local_storage.get_etag("book.xlsx")
+    with pytest.raises(ConcurrentModificationError):
+        local_storage.save_if_match("book.xlsx", b"stale", '"0-0-0"')
+
+    assert local_storage.get("book.xlsx") == b"v2"
+    # rejected writes leave no temporary files behind
+    assert sorted(p.name for p in local_storage.root.iterdir()) == ["book.xlsx"]
+
+
+def test_create_does_not_overwrite(local_storage):
+    assert local_storage.create("payload.json", b"one") is True
+    assert local_storage.create("payload.json", b"two") is False
+    assert local_storage.get("payload.json") == b"one"
+
+
+def test_list_skips_temporary_files_and_filters_by_prefix(local_storage):
+    local_storage.save("a/one", b"1")
+    local_storage.save("b/two", b"2")
+    (local_storage.root / "a" / ".one.123.tmp").write_bytes(b"partial")
+
+    assert sorted(local_storage.list()) == ["a/one", "b/two"]
+    assert list(local_storage.list("a/")) == ["a/one"]
+
+
+def test_names_cannot_escape_the_root(local_storage):
+    with pytest.raises(ValueError):
+        local_storage.save("../outside", b"x")
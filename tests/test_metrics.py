@@ -0,0 +1,77 @@
+import time
+
+from app.services import document_service
+from app.utils.metrics import STAGE_METRIC, MetricsRegistry
+from app.utils.parse_session import ParseSession
+from app.utils.records import Record
+
+
+def _stage_seconds(registry: MetricsRegistry, operation: str, stage: str) -> float:
+    series = registry._summaries[STAGE_METRIC]
+    summary = series[(("operation", operation), ("stage", stage))]
+    assert summary.count == 1
+    return summary.sum
+
+
+class _SlowParser:
+    def iter_records(self, session):
+        for n in range(2):
+            time.sleep(0.05)
+            yield Record.from_dict({"n": n, "text": "x"})
+
+
+def test_parse_and_consolidate_are_timed_separately(service, monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(document_service, "metrics", registry)
+    service.parsers["pdf"] = _SlowParser()
+    consolidate = service._consolidate_records
+
+    def slow_consolidate(records):
+        for record in consolidate(records):
+            time.sleep(0.05)
+            yield record
+
+    monkeypatch.setattr(service, "_consolidate_records", slow_consolidate)
+    service.parse_document(ParseSession.from_bytes("pdf", b""))
+
+    parse = _stage_seconds(registry, "upload", "parse")
+    consolidated = _stage_seconds(registry, "upload", "consolidate")
+    # each stage gets its own 0.1s of sleeps, not the other's
+    assert 0.1 <= parse < 0.2
+    assert 0.1 <= consolidated < 0.2
+
+
+def test_render_uses_the_prometheus_text_format():
+    registry = MetricsRegistry(window=4)
+    registry.describe("app_latency_seconds", "Latency by route.")
+    for value in (0.1, 0.2, 0.3, 0.4, 0.5):
+        registry.observe("app_latency_seconds", value, route="/a")
+    registry.set_gauge("app_rows", 3)
+    registry.inc_gauge("app_inflight", route='C:\\dir "x"')
+    registry.inc_gauge("app_inflight", route='C:\\dir "x"')
+
+    assert registry.render().splitlines() == [
+        "# HELP app_latency_seconds Latency by route.",
+        "# TYPE app_latency_seconds summary",
+        # quantiles cover the last four samples; sum and count cover all five
+        'app_latency_seconds{route="/a",quantile="0.5"} 0.4',
+        'app_latency_seconds{route="/a",quantile="0.95"} 0.5',
+        'app_latency_seconds{route="/a",quantile="0.99"} 0.5',
+        'app_latency_seconds_sum{route="/a"} 1.5',
+        'app_latency_seconds_count{route="/a"} 5',
+        "# TYPE app_inflight gauge",
+        'app_inflight{route="C:\\\\dir \\"x\\""} 2',
+        "# TYPE app_rows gauge",
+        "app_rows 3",
+    ]
+
+
+def test_metrics_route_exposes_stage_summaries(client):
+    client.get("/api/documents/excel")
+    response = client.get("/api/documents/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert f"# TYPE {STAGE_METRIC} summary" in text
+    assert f'{STAGE_METRIC}_count{{operation="get_excel",stage="version"}}' in text
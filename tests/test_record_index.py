@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from app.implementations.sqlite_record_repository import SqliteRecordRepository
+from app.interfaces.excel_interface import RecordQuery
+from app.utils.record_index import RecordIndex
+
+# numbers, numeric text, text, ties and records without the field
+DOCUMENTS = [
+    ("b.pdf", "10.pdf", [{"k": 10}, {"k": "9"}, {"k": "abc"}, {"other": 1}]),
+    ("a.pdf", "9.pdf", [{"k": "B"}, {"k": 2.5}, {"k": None}, {"k": "10"}]),
+    ("c.pdf", "b.pdf", [{"k": "abc"}, {"k": -1}, "not a dict", {"k": 10}]),
+]
+
+
+def _order(results) -> list:
+    return [(item["excel_row"], json.dumps(item["record"])) for item in results]
+
+
+@pytest.fixture
+def backends(tmp_path):
+    index = RecordIndex()
+    sqlite = SqliteRecordRepository(str(tmp_path / "records.db"))
+    for row, (doc_id, filename, records) in enumerate(DOCUMENTS, start=2):
+        index.add(row, doc_id, filename, "pdf", records)
+        data = json.dumps(records)
+        sqlite.append({"id": doc_id, "filename": filename, "file_type": "pdf", "json_data": data})
+    return index, sqlite
+
+
+@pytest.mark.parametrize("sort", ["k", "filename", "id", "row"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_in_memory_and_sqlite_sort_alike(backends, sort, descending):
+    index, sqlite = backends
+    query = RecordQuery(sort=sort, descending=descending)
+
+    assert _order(index.query(query)[0]) == _order(sqlite.query_records(query)[0])
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_numbers_sort_before_text_in_either_direction(backends, descending):
+    index, _ = backends
+    results, total = index.query(RecordQuery(sort="k", descending=descending))
+    values = [
+        item["record"].get("k") if isinstance(item["record"], dict) else None
+        for item in results
+    ]
+
+    # numeric text sorts as a number; equal values keep row order in the sort direction
+    numbers = [-1, 2.5, "9", 10, "10", 10]
+    texts = ["B", "abc", "abc"]
+    if descending:
+        numbers.reverse()
+        texts.reverse()
+    assert total == 12
+    assert values == numbers + texts + [None, None, None]
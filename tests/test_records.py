@@ -0,0 +1,92 @@
+import json
+
+from app.implementations.sqlite_record_repository import SqliteRecordRepository
+from app.interfaces.excel_interface import RecordQuery
+from app.services.document_service import DocumentService
+from app.utils.records import RecordLayout, encode_record_list, encode_records
+from app.utils.workbook_reader import XLSX_CELL_MAX_CHARS, decode_json_cell
+
+LAYOUT = RecordLayout(["Project Name", "Task Name", "Progress"])
+
+
+def _records(n):
+    return [LAYOUT.record([f"Project {i}", "Tâsk \"quoted\"", f"{i}%"]) for i in range(n)]
+
+
+def test_encoded_records_match_the_batched_encoding():
+    records = _records(2500) + [{"plain": "dict"}]
+    encoded = encode_record_list(records)
+
+    assert encoded.text == encode_records(records)
+    assert [json.loads(text) for text in encoded.encoded()] == json.loads(encoded.text)
+    assert encoded.records == tuple(records)
+
+
+def test_truncated_array_keeps_its_complete_records():
+    encoded = encode_record_list(_records(1000))
+    assert len(encoded.text) > XLSX_CELL_MAX_CHARS
+
+    values = decode_json_cell(encoded.text[:XLSX_CELL_MAX_CHARS])
+
+    complete = sum(1 for _, end in encoded.spans if end <= XLSX_CELL_MAX_CHARS)
+    assert len(values) == complete
+    assert values == json.loads(encoded.text)[:complete]
+
+
+def test_short_invalid_array_is_not_decoded_as_a_prefix():
+    assert decode_json_cell('[{"a":1},{"b"') == ['[{"a":1},{"b"']
+
+
+def test_sqlite_stores_encoded_records_as_sliced(tmp_path):
+    repo = SqliteRecordRepository(str(tmp_path / "records.db"))
+    encoded = encode_record_list(_records(3))
+    row = repo.append(DocumentService.repository_record("a.pdf", "a.pdf", "pdf", encoded))
+    # rows without the encoded records, e.g. from the hash index, are decoded instead
+    repo.append(DocumentService.repository_record("b.pdf", "b.pdf", "pdf", encoded.text))
+
+    entries, total = repo.get_entries()
+    assert row == 2 and total == 2
+    assert entries[0]["transformed_data"] == entries[1]["transformed_data"]
+    assert entries[0]["transformed_data"] == [record.to_dict() for record in _records(3)]
+
+    matches, count = repo.query_records(RecordQuery(field_filters={"Progress": "1%"}))
+    assert count == 2
+    assert {match["id"] for match in matches} == {"a.pdf", "b.pdf"}
+
+
+def test_sqlite_replaces_json_data_by_id(tmp_path):
+    repo = SqliteRecordRepository(str(tmp_path / "records.db"))
+    old, new = encode_record_list(_records(2)), encode_record_list(_records(3)[2:])
+    repo.append_many(
+        [
+            DocumentService.repository_record("a.pdf", "first.pdf", "pdf", old),
+            DocumentService.repository_record("b.pdf", "b.pdf", "pdf", old),
+            DocumentService.repository_record("a.pdf", "again.pdf", "pdf", old),
+        ]
+    )
+    version = repo.get_version()
+
+    repo.replace_json_data([DocumentService.repository_record("a.pdf", "x.pdf", "pdf", new)])
+
+    assert repo.get_version() != version
+    entries, total = repo.get_entries()
+    assert total == 3
+    assert [entry["filename"] for entry in entries] == ["first.pdf", "b.pdf", "again.pdf"]
+    assert [len(entry["transformed_data"]) for entry in entries] == [1, 2, 1]
+    matches, count = repo.query_records(RecordQuery(field_filters={"Progress": "2%"}))
+    assert count == 2 and {match["id"] for match in matches} == {"a.pdf"}
+    assert repo.query_records(RecordQuery(field_filters={"Progress": "0%"}))[1] == 1
+
+
+def test_sqlite_export_is_tagged_with_the_exported_version(tmp_path):
+    repo = SqliteRecordRepository(str(tmp_path / "records.db"))
+    repo.append(DocumentService.repository_record("a.pdf", "a.pdf", "pdf", "[]"))
+    stream, version = repo.get_versioned_stream()
+    stream.close()
+    assert version == repo.get_version()
+
+    repo.append(DocumentService.repository_record("b.pdf", "b.pdf", "pdf", "[]"))
+    stream, newer = repo.get_versioned_stream()
+    with stream:
+        assert stream.read(2) == b"PK"
+    assert newer == repo.get_version() != version
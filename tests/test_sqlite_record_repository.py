@@ -0,0 +1,105 @@
+import json
+import sqlite3
+import threading
+
+from openpyxl import load_workbook
+
+from app.implementations.sqlite_record_repository import SqliteRecordRepository
+from app.interfaces.excel_interface import RecordQuery
+
+
+def _document(name: str, records: int = 2, value: int = 0) -> dict:
+    data = json.dumps([{"n": n, "v": value} for n in range(records)])
+    return {"id": name, "filename": name, "file_type": "pdf", "json_data": data}
+
+
+def test_database_runs_in_wal_mode(tmp_path):
+    path = str(tmp_path / "records.db")
+    SqliteRecordRepository(path)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_readers_see_whole_documents_while_writers_append(tmp_path):
+    path = str(tmp_path / "records.db")
+    # two repositories stand in for two processes sharing the database
+    writer, reader = SqliteRecordRepository(path), SqliteRecordRepository(path)
+    writers, batches = 4, 25
+    rows, errors = [], []
+    done = threading.Event()
+
+    def write(n):
+        for i in range(batches):
+            batch = [_document(f"w{n}-{i}-{k}") for k in range(2)]
+            rows.extend(writer.append_many(batch))
+
+    def read():
+        try:
+            while not done.is_set():
+                entries, total = reader.get_entries()
+                assert len(entries) == total
+                # a document is committed with its records or not at all
+                assert all(len(entry["transformed_data"]) == 2 for entry in entries)
+                matches, count = reader.query_records(RecordQuery(field_filters={"n": "1"}))
+                assert len(matches) == count >= total
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    for thread in readers + threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    count = writers * batches * 2
+    assert sorted(rows) == list(range(2, count + 2))
+    assert reader.get_entries()[1] == count
+
+
+def test_iteration_keeps_its_snapshot_while_rows_are_written(tmp_path):
+    path = str(tmp_path / "records.db")
+    repo = SqliteRecordRepository(path)
+    repo.append_many([_document(f"{i}.pdf") for i in range(3)])
+
+    entries = repo.iter_entries()
+    first = next(entries)
+    # the writer is not blocked by the open read transaction
+    SqliteRecordRepository(path).append(_document("3.pdf"))
+    SqliteRecordRepository(path).replace_json_data([_document("1.pdf", records=1, value=1)])
+
+    rest = list(entries)
+    assert [entry["id"] for entry in [first, *rest]] == ["0.pdf", "1.pdf", "2.pdf"]
+    assert len(rest[0]["transformed_data"]) == 2
+    assert [entry["id"] for entry in repo.iter_entries()] == ["0.pdf", "1.pdf", "2.pdf", "3.pdf"]
+
+
+def test_replacements_version_the_rows_they_rewrite(tmp_path):
+    path = str(tmp_path / "records.db")
+    repo = SqliteRecordRepository(path)
+    repo.append_many([_document("a.pdf"), _document("b.pdf")])
+    assert repo.get_version() == "sqlite-2"
+    stream, exported = repo.get_versioned_stream()
+    stream.close()
+
+    repo.replace_json_data([_document("a.pdf", records=1, value=1)])
+    assert repo.get_version() == "sqlite-2-1"
+    repo.replace_json_data([_document("b.pdf", records=1, value=2)])
+    assert repo.get_version() == "sqlite-2-2"
+    # the revision survives a restart and a later append keeps it
+    reopened = SqliteRecordRepository(path)
+    assert reopened.get_version() == "sqlite-2-2"
+    reopened.append(_document("c.pdf"))
+    assert reopened.get_version() == "sqlite-3-2"
+
+    # the cached export is replaced once the rows it holds were rewritten
+    stream, version = repo.get_versioned_stream()
+    with stream:
+        rows = load_workbook(stream).active.iter_rows(min_row=2, values_only=True)
+        cells = [row[3] for row in rows]
+    assert version == "sqlite-3-2" != exported
+    assert [json.loads(cell) for cell in cells[:2]] == [[{"n": 0, "v": 1}], [{"n": 0, "v": 2}]]
@@ -0,0 +1,14 @@
+from app.utils.streams import map_file, positional_blocks
+
+
+def test_abandoned_block_iterator_does_not_pin_memory_map(tmp_path):
+    path = tmp_path / "upload.bin"
+    path.write_bytes(b"x" * 10)
+    with open(path, "rb") as fh:
+        stream = map_file(fh.fileno())
+    blocks = positional_blocks(stream, block_size=4)
+
+    assert next(blocks) == b"xxxx"
+    # the consumer failed and never finished the iterator
+    stream.close()
+    assert stream.closed
@@ -0,0 +1,74 @@
+from app.utils.table_layout import aligned_layout, infer_columns, slice_row
+
+HEADER = "Project Name   Task Name   Progress"
+ROWS = [
+    "Alpha          Review      10%",
+    "Beta Launch    Write docs  75%",
+]
+
+
+def _cells(header, rows):
+    columns = aligned_layout(header, rows)
+    assert columns is not None
+    return [slice_row(line, columns) for line in [header, *rows]]
+
+
+def test_aligned_columns_are_sliced_at_their_offsets():
+    assert infer_columns([HEADER, *ROWS]) == [(0, 12), (15, 25), (27, 35)]
+    assert _cells(HEADER, ROWS) == [
+        ["Project Name", "Task Name", "Progress"],
+        ["Alpha", "Review", "10%"],
+        ["Beta Launch", "Write docs", "75%"],
+    ]
+
+
+def test_sparse_row_keeps_its_values_in_their_columns():
+    header = "A    B    C"
+    rows = ["1    2    3", "4         6", "          9"]
+    assert _cells(header, rows)[1:] == [["1", "2", "3"], ["4", "", "6"], ["", "", "9"]]
+
+
+def test_blank_positions_on_some_lines_do_not_split_multi_word_cells():
+    # single spaces inside "Due Date" and "Write docs" never separate columns
+    header = "Task         Due Date"
+    rows = ["Write docs   2024-01-01", "Review       2024-02-01"]
+    assert _cells(header, rows) == [
+        ["Task", "Due Date"],
+        ["Write docs", "2024-01-01"],
+        ["Review", "2024-02-01"],
+    ]
+
+
+def test_overhanging_text_is_kept_in_its_cell():
+    header = "Name   Note"
+    rows = ["Alpha  ok", "Beta   a long note that runs past the header"]
+    assert _cells(header, rows)[2] == ["Beta", "a long note that runs past the header"]
+
+
+def test_tab_separated_lines_yield_no_columns():
+    lines = ["Name\tProgress", "Alpha\t10%"]
+    assert infer_columns(lines) == []
+    assert aligned_layout(lines[0], lines[1:]) is None
+
+
+def test_prose_falls_back_to_delimiter_splitting():
+    assert aligned_layout("This is a sentence.", ["And another one follows it."]) is None
+
+
+def test_rows_that_fill_the_header_gap_fall_back():
+    # the second row bridges the gap between the two headers: one column only
+    assert aligned_layout("Name   Progress", ["Alpha  10%", "Beta Launch Review"]) is None
+
+
+def test_column_without_a_header_falls_back():
+    # a row puts text under the header's inner gap, leaving a column without a header
+    header = "Name          Progress"
+    rows = ["Alpha  x     10%"]
+    assert aligned_layout(header, rows) is None
+
+
+def test_infer_columns_respects_min_gap():
+    lines = ["ab cd  ef"]
+    assert infer_columns(lines) == [(0, 5), (7, 9)]
+    assert infer_columns(lines, min_gap=1) == [(0, 2), (3, 5), (7, 9)]
+    assert infer_columns([]) == []
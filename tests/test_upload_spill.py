@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from app.benchmarks.corpus import make_pdf
+from app.utils import parse_session, upload_request
+
+LINES = ["Project Name   Task Name   Progress", "Alpha          Review      10%"]
+
+
+@pytest.fixture
+def spill_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "spill"
+    directory.mkdir()
+    # every upload is spilled to a memory-mapped temporary file
+    for module in (parse_session, upload_request):
+        monkeypatch.setattr(module, "UPLOAD_SPILL_THRESHOLD", 1)
+        monkeypatch.setattr(module, "UPLOAD_SPILL_DIR", str(directory))
+    return directory
+
+
+def _upload(client, data: bytes):
+    return client.post("/api/documents", data={"file": (io.BytesIO(data), "doc.pdf")})
+
+
+def test_spilled_upload_is_parsed_and_cleaned_up(client, spill_dir):
+    response = _upload(client, make_pdf([LINES] * 3))
+    assert response.status_code == 201
+    assert list(spill_dir.iterdir()) == []
+
+
+def test_storage_failure_of_spilled_upload_is_reported(client, service, spill_dir, monkeypatch):
+    def failing_save_stream(name, source):
+        next(iter(source))
+        raise OSError("storage unavailable")
+
+    monkeypatch.setattr(service.storage, "save_stream", failing_save_stream)
+    response = _upload(client, make_pdf([LINES] * 3))
+
+    assert response.status_code == 500
+    assert response.get_json() == {"error": "Internal server error"}
+    assert list(spill_dir.iterdir()) == []
@@ -0,0 +1,146 @@
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, List, Union
+from xml.etree.ElementTree import XMLPullParser, iterparse
+
+DOCUMENT_XML = "word/document.xml"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P = _W + "p"
+_T = _W + "t"
+_TAB = _W + "tab"
+_TABS = _W + "tabs"
+_BR = (_W + "br", _W + "cr")
+_TC = _W + "tc"
+_TR = _W + "tr"
+_TBL = _W + "tbl"
+
+# document XML is fed to the text probe in chunks of this size
+_PROBE_CHUNK = 64 * 1024
+
+# a block is either a paragraph (str) or a table row (list of cell texts)
+Block = Union[str, List[str]]
+
+
+@dataclass
+class DocxContent:
+    blocks: List[Block] = field(default_factory=list)
+
+    @property
+    def paragraphs(self) -> List[str]:
+        return [b for b in self.blocks if isinstance(b, str)]
+
+    @property
+    def tables(self) -> List[List[List[str]]]:
+        """Consecutive table rows grouped into tables."""
+        tables, current = [], []
+        for block in self.blocks:
+            if isinstance(block, list):
+                current.append(block)
+            elif current:
+                tables.append(current)
+                current = []
+        if current:
+            tables.append(current)
+        return tables
+
+    @property
+    def text(self) -> str:
+        """Plain text in document order, table cells separated by tabs."""
+        return "\n".join(b if isinstance(b, str) else "\t".join(b) for b in self.blocks)
+
+    def has_text(self) -> bool:
+        return any(
+            (b if isinstance(b, str) else "".join(b)).strip() for b in self.blocks
+        )
+
+
+def extract_docx(stream: BinaryIO) -> DocxContent:
+    """Extract paragraphs and table rows from a DOCX held in a seekable stream.
+
+    The zip is opened in place and ``word/document.xml`` is parsed
+    incrementally, so no temp file is written and parsed elements are
+    released as soon as their block is emitted. Cells of nested tables are
+    flattened into the enclosing cell, and a paragraph nested inside another
+    (a textbox) becomes a line of the enclosing paragraph.
+    """
+    stream.seek(0)
+    content = DocxContent()
+    with zipfile.ZipFile(stream) as zf, zf.open(DOCUMENT_XML) as xml:
+        table_depth = 0
+        # w:tab also defines tab stops inside w:tabs; only run tabs are text
+        in_tab_stops = False
+        # open paragraphs, each as lines of runs; a textbox nests one inside another
+        paragraphs: List[List[List[str]]] = []
+        runs: List[str] = []
+        cell: List[str] = []
+        row: List[str] = []
+        for event, elem in iterparse(xml, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == _TBL:
+                    table_depth += 1
+                elif tag == _TR and table_depth == 1:
+                    row = []
+                elif tag == _TC and table_depth == 1:
+                    cell = []
+                elif tag == _TABS:
+                    in_tab_stops = True
+                elif tag == _P:
+                    runs = []
+                    paragraphs.append([runs])
+                continue
+
+            if tag == _T:
+                runs.append(elem.text or "")
+            elif tag == _TABS:
+                in_tab_stops = False
+            elif tag == _TAB and not in_tab_stops:
+                runs.append("\t")
+            elif tag in _BR:
+                runs.append("\n")
+            elif tag == _P:
+                lines = ("".join(line) for line in paragraphs.pop())
+                text = "\n".join(line for line in lines if line)
+                if paragraphs:
+                    # kept in place; the enclosing paragraph continues on a new line
+                    runs = []
+                    paragraphs[-1] += [[text], runs]
+                elif table_depth:
+                    cell.append(text)
+                else:
+                    content.blocks.append(text)
+                elem.clear()
+            elif tag == _TC and table_depth == 1:
+                row.append("\n".join(p for p in cell if p.strip()).strip())
+            elif tag == _TR and table_depth == 1:
+                content.blocks.append(row)
+            elif tag == _TBL:
+                table_depth -= 1
+                elem.clear()
+    return content
+
+
+def docx_has_text(stream: BinaryIO, max_xml_bytes: int) -> bool:
+    """Whether a DOCX has a non-blank text run within its first ``max_xml_bytes`` of XML.
+
+    Parsing stops at the first such run, so the cost is bounded by the
+    position of the first text rather than by the size of the document;
+    the full extraction is left to ``extract_docx``.
+    """
+    stream.seek(0)
+    parser = XMLPullParser(events=("end",))
+    with zipfile.ZipFile(stream) as zf, zf.open(DOCUMENT_XML) as xml:
+        remaining = max_xml_bytes
+        while remaining > 0:
+            chunk = xml.read(min(_PROBE_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                if elem.tag == _T and (elem.text or "").strip():
+                    return True
+                if elem.tag == _P:
+                    elem.clear()
+    return False
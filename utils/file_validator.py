@@ -1,12 +1,57 @@
 import io
-import tempfile
-import docx2txt
-from PyPDF2 import PdfReader
+import os
+import re
+import struct
+import zipfile
+from typing import BinaryIO
+
+from app.logging_config import get_logger
+from app.utils.docx_extractor import DOCUMENT_XML, docx_has_text
+from app.utils.parse_session import ParseSession
+
+logger = get_logger(__name__)
 
 ALLOWED_EXTENSIONS = {'doc', 'docx', 'pdf'}
 
+# uploads larger than this are rejected before their content is read
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(512 * 1024 * 1024)))
+# PDFs declaring more pages than this are rejected
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', '10000'))
+# pages searched for text before a PDF counts as having no readable content
+PDF_TEXT_PROBE_PAGES = int(os.environ.get('PDF_TEXT_PROBE_PAGES', '20'))
+# upper bound for the uncompressed word/document.xml of a DOCX
+DOCX_MAX_XML_BYTES = int(os.environ.get('DOCX_MAX_XML_BYTES', str(256 * 1024 * 1024)))
+# upper bound for the number of members in a DOCX zip
+DOCX_MAX_ENTRIES = int(os.environ.get('DOCX_MAX_ENTRIES', '10000'))
+# document XML searched for text before a DOCX counts as having no readable content
+DOCX_TEXT_PROBE_BYTES = int(os.environ.get('DOCX_TEXT_PROBE_BYTES', str(16 * 1024 * 1024)))
+
+PDF_MAGIC = b'%PDF-'
+# the PDF header may be preceded by junk within the first kilobyte
+PDF_HEADER_WINDOW = 1024
+# startxref and %%EOF are looked for in this many trailing bytes
+PDF_TRAILER_WINDOW = 2048
+STARTXREF = re.compile(rb'startxref\s+(\d+)')
+# an xref offset points at a classic table or at an xref stream object
+XREF_TARGET = re.compile(rb'\s*(?:xref|\d+\s+\d+\s+obj)')
+
+ZIP_MAGIC = b'PK\x03\x04'
+ZIP_EOCD = b'PK\x05\x06'
+# end of central directory record size, without its trailing comment
+ZIP_EOCD_SIZE = 22
+ZIP_MAX_COMMENT = 0xFFFF
+ZIP64_MARKER = 0xFFFFFFFF
 
-def validate_file(file_storage):
+
+def validate_file(file_storage) -> ParseSession:
+    """Validate an uploaded file and return the parse session it produced.
+
+    Checks run from cheapest to most expensive, so a bad upload is rejected
+    by the first tier that catches it: name and size, then magic bytes and
+    container structure (read from a few small windows of the file), then
+    declared limits, and only then a bounded look at the content. A
+    structural probe only rejects what the reader tier would reject too.
+    """
     filename = file_storage.filename
     if not filename or '.' not in filename:
         raise ValueError('Filename invalid')
@@ -15,27 +60,125 @@ def validate_file(file_storage):
     if ext not in ALLOWED_EXTENSIONS:
         raise ValueError(f'Extension {ext} not allowed')
 
-    data = file_storage.stream.read()
-    if not data or len(data) == 0:
+    # check the size without reading the upload into memory
+    stream = file_storage.stream
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    if size == 0:
         raise ValueError('File is empty')
+    if size > UPLOAD_MAX_BYTES:
+        raise ValueError(f'File exceeds the maximum size of {UPLOAD_MAX_BYTES} bytes')
+
+    # structural checks read only the head and tail of the upload
+    if ext == 'pdf':
+        _check_pdf_structure(stream, size)
+    else:
+        _check_zip_structure(stream, size)
+    stream.seek(0)
+
+    # large uploads are read through a memory map instead of into memory
+    session = ParseSession.open(ext, stream)
+    try:
+        _validate_content(session)
+    except BaseException:
+        session.close()
+        raise
+    # reset stream for further processing
+    session.stream.seek(0)
+    return session
+
+
+def _read_at(stream: BinaryIO, offset: int, length: int) -> bytes:
+    stream.seek(offset)
+    return stream.read(length)
+
+
+def _check_pdf_structure(stream: BinaryIO, size: int):
+    """Require a PDF header; probe the trailer without rejecting on it.
+
+    PyPDF2 recovers from a startxref that is a few bytes off, from data
+    after %%EOF and from a damaged xref by scanning the file, so a failed
+    trailer probe only means the reader tier has to decide.
+    """
+    header = _read_at(stream, 0, PDF_HEADER_WINDOW).find(PDF_MAGIC)
+    if header < 0:
+        raise ValueError('PDF invalid or corrupted')
+    if not _pdf_trailer_intact(stream, size, header):
+        logger.info('PDF trailer probe inconclusive; leaving recovery to the reader')
+
+
+def _pdf_trailer_intact(stream: BinaryIO, size: int, header: int) -> bool:
+    """Whether the file ends in %%EOF after a startxref that points at an xref."""
+    tail = _read_at(stream, max(0, size - PDF_TRAILER_WINDOW), PDF_TRAILER_WINDOW)
+    matches = STARTXREF.findall(tail)
+    if b'%%EOF' not in tail or not matches:
+        return False
+    offset = int(matches[-1])
+    # offsets count from the header when junk precedes it
+    return any(
+        start < size and XREF_TARGET.match(_read_at(stream, start, 64))
+        for start in {offset, offset + header}
+    )
+
+
+def _check_zip_structure(stream: BinaryIO, size: int):
+    """Require a zip with an in-bounds central directory listing a bounded document.xml."""
+    if _read_at(stream, 0, len(ZIP_MAGIC)) != ZIP_MAGIC:
+        raise ValueError('DOC/DOCX invalid or corrupted')
+    window = ZIP_EOCD_SIZE + ZIP_MAX_COMMENT
+    tail = _read_at(stream, max(0, size - window), window)
+    eocd = tail.rfind(ZIP_EOCD)
+    if eocd < 0 or len(tail) - eocd < ZIP_EOCD_SIZE:
+        raise ValueError('DOC/DOCX invalid or corrupted')
+    entries, directory_size, directory_offset = struct.unpack_from('<HII', tail, eocd + 10)
+    if entries > DOCX_MAX_ENTRIES:
+        raise ValueError('DOC/DOCX has too many parts')
+    # zip64 archives keep the real values elsewhere; zipfile checks those
+    if directory_offset != ZIP64_MARKER and directory_offset + directory_size > size:
+        raise ValueError('DOC/DOCX invalid or corrupted')
+
+    stream.seek(0)
+    try:
+        with zipfile.ZipFile(stream) as zf:
+            info = zf.getinfo(DOCUMENT_XML)
+    except (KeyError, zipfile.BadZipFile, OSError, ValueError):
+        raise ValueError('DOC/DOCX invalid or corrupted')
+    if info.file_size > DOCX_MAX_XML_BYTES:
+        raise ValueError('DOC/DOCX document is too large')
+
+
+def _validate_content(session: ParseSession):
+    ext = session.ext
+    stream = session.stream
 
     # PDF validation
     if ext == 'pdf':
+        from PyPDF2 import PdfReader
+
         try:
-            reader = PdfReader(io.BytesIO(data))
+            reader = PdfReader(stream)
 
             if reader.is_encrypted:
                 raise ValueError('PDF is encrypted')
 
+            # the page tree root declares the count; check it before walking the tree
+            tree = reader.trailer['/Root']['/Pages']
+            if '/Count' in tree and tree['/Count'] > PDF_MAX_PAGES:
+                raise ValueError(f'PDF has more than {PDF_MAX_PAGES} pages')
+
             # no pages
-            if len(reader.pages) == 0:
+            page_count = len(reader.pages)
+            if page_count == 0:
                 raise ValueError('PDF has no pages')
+            if page_count > PDF_MAX_PAGES:
+                raise ValueError(f'PDF has more than {PDF_MAX_PAGES} pages')
 
-            # no readable content
+            # no readable content within the first pages; extracted pages are kept for the parser
+            session.reader = reader
             has_text = False
-            for page in reader.pages:
-                text = page.extract_text()
-                if text and text.strip():
+            for index in range(min(page_count, PDF_TEXT_PROBE_PAGES)):
+                text = session.page_text(index)
+                if text.strip():
                     has_text = True
                     break
 
@@ -50,18 +193,11 @@ def validate_file(file_storage):
     # DOC / DOCX validation
     if ext in ('doc', 'docx'):
         try:
-            with tempfile.NamedTemporaryFile(delete=True, suffix=f'.{ext}') as tmp:
-                tmp.write(data)
-                tmp.flush()
-
-                text = docx2txt.process(tmp.name)
-                if not text or not text.strip():
-                    raise ValueError('DOC/DOCX has no readable content')
+            # no readable content within the first part of the XML; the parser extracts the rest
+            if not docx_has_text(stream, DOCX_TEXT_PROBE_BYTES):
+                raise ValueError('DOC/DOCX has no readable content')
 
         except ValueError:
             raise
         except Exception:
             raise ValueError('DOC/DOCX invalid or corrupted')
-
-    # reset stream for further processing
-    file_storage.stream.seek(0)
\ No newline at end of file
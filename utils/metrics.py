@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Tuple
+
+# number of most recent samples per series used for the quantile estimates
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "1024"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+STAGE_METRIC = "app_stage_duration_seconds"
+STAGE_HELP = "Duration of each pipeline stage, by operation and stage."
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Summary:
+    def __init__(self, window: int):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: float("nan") for q in QUANTILES}
+        return {q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """Thread-safe summaries and gauges rendered in Prometheus text format.
+
+    Summaries keep an exact count and sum plus a sliding window of recent
+    samples for the p50/p95/p99 quantiles.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self._summaries: Dict[str, Dict[Labels, _Summary]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            if key not in series:
+                series[key] = _Summary(self.window)
+            series[key].observe(value)
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self._gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def inc_gauge(self, name: str, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe_stage(self, operation: str, stage: str, seconds: float):
+        """Record the duration of one stage of an operation that was timed elsewhere."""
+        self.observe(STAGE_METRIC, seconds, operation=operation, stage=stage)
+
+    @contextmanager
+    def stage(self, operation: str, stage: str):
+        """Time the enclosed block as one stage of an operation."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(operation, stage, time.perf_counter() - start)
+
+    def render(self) -> str:
+        """Render all series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._summaries.items()):
+                self._header(lines, name, "summary")
+                for key, summary in sorted(series.items()):
+                    for q, value in summary.quantiles().items():
+                        lines.append(f"{name}{_labels(key + (('quantile', str(q)),))} {value}")
+                    lines.append(f"{name}_sum{_labels(key)} {summary.sum}")
+                    lines.append(f"{name}_count{_labels(key)} {summary.count}")
+            for name, series in sorted(self._gauges.items()):
+                self._header(lines, name, "gauge")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: list, name: str, kind: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+class TimedIterator:
+    """Iterator that adds up the time spent producing each of its items.
+
+    Lazy pipeline stages run interleaved, so a stage's own time is what
+    its iterator took minus what the iterator it consumes took.
+    """
+
+    def __init__(self, items: Iterable):
+        self._items = iter(items)
+        self.elapsed = 0.0
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._items)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in key
+    )
+    return "{" + pairs + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe(STAGE_METRIC, STAGE_HELP)
+metrics.describe("app_workbook_rows", "Rows in the Excel workbook, including the header.")
+metrics.describe("app_workbook_bytes", "Size of the last serialized Excel workbook.")
+metrics.describe("app_inflight_requests", "Document API requests currently being served.")
@@ -0,0 +1,142 @@
+import io
+import os
+import tempfile
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterable, List, Optional, Union
+
+from app.logging_config import get_logger
+from app.utils.docx_extractor import DocxContent
+from app.utils.streams import iter_blocks, map_file, mapped_buffer, positional_blocks
+
+if TYPE_CHECKING:
+    from PyPDF2 import PdfReader
+
+logger = get_logger(__name__)
+
+# in-memory uploads of at least this many bytes are spilled to a temporary file
+UPLOAD_SPILL_THRESHOLD = int(os.environ.get("UPLOAD_SPILL_THRESHOLD", str(8 * 1024 * 1024)))
+# directory for spilled uploads; empty uses the system temporary directory
+UPLOAD_SPILL_DIR = os.environ.get("UPLOAD_SPILL_DIR") or None
+
+
+def _file_backed(stream: BinaryIO):
+    """Return the real file behind a stream (also inside a rolled-over spool), or None."""
+    raw = getattr(stream, "_file", stream)
+    try:
+        raw.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    return raw
+
+
+def _spill(stream: BinaryIO):
+    """Copy an in-memory stream to a named temporary file, deleted when closed."""
+    spill = tempfile.NamedTemporaryFile(prefix="upload-", dir=UPLOAD_SPILL_DIR)
+    stream.seek(0)
+    for block in iter_blocks(stream):
+        spill.write(block)
+    spill.flush()
+    stream.seek(0)
+    return spill
+
+
+@dataclass
+class ParseSession:
+    """Parsing state produced by validation and reused by the parsers.
+
+    Validation already opens the PDF reader and extracts page text, so the
+    session keeps those results around and the parsers pick them up instead
+    of repeating the work. ``docx`` is filled by the DOCX parser, since
+    validation only probes the start of the document for text. The upload is kept as a seekable
+    stream and only read into memory by code paths that need raw bytes.
+
+    Sessions built with ``open`` read file-backed uploads through a memory
+    map, and large in-memory uploads are spilled to disk first, so the
+    parsers never need the document as one ``bytes`` object. ``path`` names
+    the file on disk when it has one; ``close`` releases what the session owns.
+    """
+
+    ext: str
+    stream: BinaryIO
+    reader: Optional["PdfReader"] = None
+    page_texts: Dict[int, str] = field(default_factory=dict)
+    docx: Optional[DocxContent] = None
+    path: Optional[str] = None
+    _data: Optional[bytes] = field(default=None, repr=False)
+    _owned: List[BinaryIO] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def from_bytes(cls, ext: str, data: bytes) -> "ParseSession":
+        return cls(ext=ext, stream=BytesIO(data), _data=data)
+
+    @classmethod
+    def open(cls, ext: str, stream: BinaryIO) -> "ParseSession":
+        """Build a session that reads the upload from disk through a memory map when it can."""
+        if mapped_buffer(stream) is not None:
+            stream.seek(0)
+            return cls(ext=ext, stream=stream)
+        backing = _file_backed(stream)
+        owned = []
+        if backing is None:
+            size = stream.seek(0, io.SEEK_END)
+            stream.seek(0)
+            if size < UPLOAD_SPILL_THRESHOLD:
+                if hasattr(getattr(stream, "_file", stream), "getbuffer"):
+                    return cls(ext=ext, stream=stream)
+                # other streams may be remote; small ones are cheaper to parse from memory
+                return cls.from_bytes(ext, stream.read())
+            backing = _spill(stream)
+            owned.append(backing)
+        # buffered writes must reach the file before it is mapped
+        backing.flush()
+        mapped = map_file(backing.fileno())
+        owned.insert(0, mapped)
+        name = getattr(backing, "name", None)
+        path = name if isinstance(name, str) and os.path.isfile(name) else None
+        return cls(ext=ext, stream=mapped, path=path, _owned=owned)
+
+    def close(self):
+        """Release the memory map and spill file; the caller's stream stays open.
+
+        A map still referenced elsewhere cannot be closed; it is then left to
+        the garbage collector, and the spill file is removed all the same.
+        """
+        for owned in self._owned:
+            try:
+                owned.close()
+            except BufferError:
+                logger.warning("Memory map of an upload still in use; leaving it to be collected")
+        self._owned.clear()
+
+    def read_bytes(self) -> bytes:
+        """Return the whole upload as bytes, reading the stream at most once."""
+        if self._data is None:
+            self.stream.seek(0)
+            self._data = self.stream.read()
+        return self._data
+
+    def upload_source(self) -> Union[BinaryIO, Iterable[bytes]]:
+        """Return the upload's bytes in a form that does not share ``stream``'s position.
+
+        Storing from this source can run on another thread while the parsers
+        read ``stream``. Call it before that concurrent parsing starts.
+        """
+        if self._data is not None:
+            return BytesIO(self._data)
+        blocks = positional_blocks(self.stream)
+        if blocks is not None:
+            return blocks
+        return BytesIO(self.read_bytes())
+
+    def page_text(self, index: int) -> str:
+        """Return the extracted text of a PDF page, extracting it at most once."""
+        if index not in self.page_texts:
+            self.page_texts[index] = self.reader.pages[index].extract_text() or ""
+        return self.page_texts[index]
+
+    def take_page_text(self, index: int) -> str:
+        """Return a page's text without keeping it, for parsers that stream pages once."""
+        if index in self.page_texts:
+            return self.page_texts.pop(index)
+        return self.reader.pages[index].extract_text() or ""
@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from app.interfaces.storage_interface import IStorage
+from app.logging_config import get_logger
+from app.utils.metrics import metrics
+from app.utils.workbook_reader import PayloadReference, decode_json_cell, payload_reference
+
+logger = get_logger(__name__)
+
+# json_data longer than this many characters is stored in its own blob; keep it
+# well below the 32767 characters an xlsx cell holds
+PAYLOAD_OFFLOAD_CHARS = int(os.environ.get("EXCEL_PAYLOAD_OFFLOAD_CHARS", "16384"))
+# offloaded payloads are stored under this prefix, named by content hash
+PAYLOAD_PREFIX = os.environ.get("EXCEL_PAYLOAD_PREFIX", "transformed_data/payloads/")
+# "gzip" compresses offloaded payloads, "identity" stores them as plain JSON
+PAYLOAD_ENCODING = os.environ.get("EXCEL_PAYLOAD_ENCODING", "gzip").lower()
+# threads storing and fetching offloaded payloads concurrently
+PAYLOAD_IO_WORKERS = int(os.environ.get("EXCEL_PAYLOAD_IO_WORKERS", "8"))
+# gzip level; JSON compresses well already at moderate levels
+GZIP_LEVEL = 6
+
+
+class PayloadStore:
+    """Keeps oversized json_data out of workbook cells.
+
+    ``offload`` writes a payload longer than PAYLOAD_OFFLOAD_CHARS to its own
+    blob and returns the reference cell that replaces it. Blobs are named by
+    the SHA-256 of the payload and written create-if-absent, so a payload
+    recorded twice is stored once and concurrent writers do not conflict.
+    Readers resolve references only for the entries they return, fetching
+    several payloads at once.
+    """
+
+    def __init__(self, storage: IStorage, prefix: str = PAYLOAD_PREFIX):
+        self.storage = storage
+        self.prefix = prefix
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=max(PAYLOAD_IO_WORKERS, 1), thread_name_prefix="payload-io"
+                    )
+        return self._pool
+
+    def _map(self, func, items: list) -> list:
+        """Apply func to items, concurrently when there is more than one."""
+        if len(items) < 2:
+            return [func(item) for item in items]
+        return list(self._executor().map(func, items))
+
+    def offload(self, json_data, records: Optional[int] = None):
+        """Return the value to store in the json_data cell: the payload itself or a reference.
+
+        ``records`` is the number of records in the payload if the caller
+        knows it; the payload is not decoded to count them.
+        """
+        if not isinstance(json_data, str) or len(json_data) <= PAYLOAD_OFFLOAD_CHARS:
+            return json_data
+        if payload_reference(json_data) is not None:
+            return json_data
+        data = json_data.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        encoding = "gzip" if PAYLOAD_ENCODING == "gzip" else "identity"
+        if encoding == "gzip":
+            data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+            name = f"{self.prefix}{digest}.json.gz"
+        else:
+            name = f"{self.prefix}{digest}.json"
+        with metrics.stage("excel_repository", "offload_payload"):
+            if not self.storage.create(name, data):
+                logger.info("Offloaded payload already stored: name='%s'", name)
+        reference = PayloadReference(
+            name=name,
+            encoding=encoding,
+            records=records,
+            chars=len(json_data),
+            bytes=len(data),
+        )
+        return reference.to_cell()
+
+    def offload_many(self, records: List[dict]) -> List[dict]:
+        """Offload the json_data of several records, storing their payloads concurrently."""
+        large = [
+            i
+            for i, record in enumerate(records)
+            if isinstance(record.get("json_data"), str)
+            and len(record["json_data"]) > PAYLOAD_OFFLOAD_CHARS
+        ]
+        if not large:
+            return records
+        cells = self._map(
+            lambda i: self.offload(records[i]["json_data"], _record_count(records[i])), large
+        )
+        records = list(records)
+        for i, cell in zip(large, cells):
+            records[i] = {**records[i], "json_data": cell}
+        return records
+
+    def load(self, reference: PayloadReference) -> list:
+        """Fetch and decode the records of one offloaded payload."""
+        try:
+            data = self.storage.get(reference.name)
+        except Exception as e:
+            # not a missing workbook; keep it from being reported as one
+            raise RuntimeError(f"Offloaded payload {reference.name} could not be read") from e
+        if reference.encoding == "gzip":
+            data = gzip.decompress(data)
+        return decode_json_cell(data.decode("utf-8"))
+
+    def load_many(self, references: List[PayloadReference]) -> List[list]:
+        with metrics.stage("excel_repository", "load_payloads"):
+            return self._map(self.load, references)
+
+    def resolve_entries(self, entries: List[dict]) -> List[dict]:
+        """Replace payload references in a page of entries with their records, in place."""
+        pending = [
+            entry for entry in entries if isinstance(entry["transformed_data"], PayloadReference)
+        ]
+        if pending:
+            records = self.load_many([entry["transformed_data"] for entry in pending])
+            for entry, values in zip(pending, records):
+                entry["transformed_data"] = values
+        return entries
+
+    def iter_resolved(self, entries: Iterable[dict]) -> Iterator[dict]:
+        """Yield entries in order, fetching the payloads of the next few ahead of time."""
+        window = deque()
+        for entry in entries:
+            reference = entry["transformed_data"]
+            future = None
+            if isinstance(reference, PayloadReference):
+                future = self._executor().submit(self.load, reference)
+            window.append((entry, future))
+            if len(window) > PAYLOAD_IO_WORKERS:
+                yield self._finish(*window.popleft())
+        while window:
+            yield self._finish(*window.popleft())
+
+    @staticmethod
+    def _finish(entry: dict, future) -> dict:
+        if future is not None:
+            entry["transformed_data"] = future.result()
+        return entry
+
+
+def _record_count(record: dict) -> Optional[int]:
+    encoded = record.get("encoded")
+    return None if encoded is None else len(encoded)
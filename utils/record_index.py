@@ -0,0 +1,158 @@
+import json
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from app.interfaces.excel_interface import DOCUMENT_FIELDS, RecordQuery
+
+
+def index_value(value) -> Optional[str]:
+    """Text a scalar record value is filtered on; None for values that are not indexed."""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def sort_number(text: Optional[str]) -> Optional[float]:
+    """Numeric form of an indexed value so "9" sorts before "10"; None if not numeric."""
+    if text is None:
+        return None
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def order_by(value: str, number: Optional[str], direction: str) -> str:
+    """SQL ORDER BY terms for the sort collation RecordIndex applies in memory.
+
+    Numbers come before text and missing values come last, in either
+    direction; only the values within each group follow ``direction``.
+    ``number`` is the column holding ``sort_number`` of the value; without
+    it values are compared as text only, as document columns are.
+    """
+    terms = [f"{value} IS NULL"]
+    if number is not None:
+        terms += [f"{number} IS NULL", f"{number} {direction}"]
+    terms.append(f"{value} {direction}")
+    return ", ".join(terms)
+
+
+def project(record, fields: Optional[List[str]]):
+    """Keep only the requested top-level fields of a dict record."""
+    if fields is None or not isinstance(record, dict):
+        return record
+    return {name: record[name] for name in fields if name in record}
+
+
+def result(row: int, doc_id, filename, file_type, record, fields: Optional[List[str]]) -> dict:
+    return {
+        "id": doc_id,
+        "filename": filename,
+        "file_type": file_type,
+        "excel_row": row,
+        "record": project(record, fields),
+    }
+
+
+class RecordIndex:
+    """In-memory secondary indexes over transformed records.
+
+    Documents are added in row order and never change, so every posting
+    list stays sorted by record position and the index is extended one row
+    at a time instead of being rebuilt. Filters intersect the posting lists
+    of the requested values, starting from the shortest. Sorting follows the
+    collation of ``order_by``, with ties broken by row and position in the
+    requested direction, so results match the SQLite store.
+
+    The index holds every decoded record plus a posting per indexed field
+    value: about seven times the size of the records' JSON for typical
+    table rows. Datasets that do not fit in memory that way belong in the
+    SQLite store.
+    """
+
+    def __init__(self):
+        self._documents: List[tuple] = []
+        # (document index, position within the document, record)
+        self._records: List[Tuple[int, int, object]] = []
+        self._postings: Dict[tuple, List[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @property
+    def documents(self) -> int:
+        return len(self._documents)
+
+    def add(self, row: int, doc_id, filename, file_type, records: list):
+        with self._lock:
+            doc_index = len(self._documents)
+            self._documents.append((row, doc_id, filename, file_type))
+            meta = dict(zip(DOCUMENT_FIELDS, (doc_id, filename, file_type)))
+            for position, record in enumerate(records):
+                record_index = len(self._records)
+                self._records.append((doc_index, position, record))
+                for name, value in meta.items():
+                    text = index_value(value)
+                    if text is not None:
+                        self._postings[("document", name, text)].append(record_index)
+                if isinstance(record, dict):
+                    for name, value in record.items():
+                        text = index_value(value)
+                        if text is not None:
+                            self._postings[("field", name, text)].append(record_index)
+
+    def _sort_value(self, record_index: int, name: str) -> Tuple[Optional[str], Optional[float]]:
+        """Return the text and, for numeric record values, the number a record sorts by."""
+        doc_index, _, record = self._records[record_index]
+        row, doc_id, filename, file_type = self._documents[doc_index]
+        if name == "row":
+            return str(row), float(row)
+        if name in DOCUMENT_FIELDS:
+            # document columns compare as text, like the SQLite columns they mirror
+            meta = {"id": doc_id, "filename": filename, "file_type": file_type}
+            return index_value(meta[name]), None
+        text = index_value(record.get(name)) if isinstance(record, dict) else None
+        return text, sort_number(text)
+
+    def query(self, query: RecordQuery) -> Tuple[List[dict], int]:
+        keys = [("document", k, v) for k, v in query.filters.items()]
+        keys += [("field", k, v) for k, v in query.field_filters.items()]
+        with self._lock:
+            if keys:
+                postings = sorted((self._postings.get(key, []) for key in keys), key=len)
+                matched = postings[0]
+                for other in postings[1:]:
+                    members = set(other)
+                    matched = [i for i in matched if i in members]
+            else:
+                matched = range(len(self._records))
+
+            if query.sort:
+                # numbers, then text, then records without the field, in either
+                # direction; record indexes follow row and position order
+                numbers, texts, missing = [], [], []
+                for i in matched:
+                    text, number = self._sort_value(i, query.sort)
+                    if text is None:
+                        missing.append((i,))
+                    elif number is not None:
+                        numbers.append((number, text, i))
+                    else:
+                        texts.append((text, i))
+                matched = [
+                    key[-1]
+                    for group in (numbers, texts, missing)
+                    for key in sorted(group, reverse=query.descending)
+                ]
+
+            total = len(matched)
+            stop = None if query.limit is None else query.offset + query.limit
+            results = []
+            for i in matched[query.offset : stop]:
+                doc_index, _, record = self._records[i]
+                row, doc_id, filename, file_type = self._documents[doc_index]
+                results.append(result(row, doc_id, filename, file_type, record, query.fields))
+        return results, total
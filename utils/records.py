@@ -0,0 +1,167 @@
+import json
+from dataclasses import dataclass
+from io import StringIO
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Sequence, Tuple
+
+
+class Record:
+    """One extracted record: field names and values kept as two tuples.
+
+    Behaves like a read-only dict for consolidation and indexing. Records
+    built from the same ``RecordLayout`` share one keys tuple, so a table
+    costs one header tuple plus a values tuple per row instead of a dict
+    per row.
+    """
+
+    __slots__ = ("_keys", "_values")
+
+    def __init__(self, keys: Tuple[str, ...], values: tuple):
+        self._keys = keys
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, mapping: Dict[str, object]) -> "Record":
+        return cls(tuple(mapping), tuple(mapping.values()))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __getitem__(self, key: str):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Record):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._keys
+
+    def values(self) -> tuple:
+        return self._values
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        return zip(self._keys, self._values)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._keys, self._values))
+
+
+class RecordLayout:
+    """Column names shared by the rows of one table.
+
+    ``record(values)`` gives the same fields as ``dict(zip(headers, values))``:
+    surplus cells are dropped and a repeated header keeps its last value.
+    """
+
+    __slots__ = ("headers", "_keys", "_indexes")
+
+    def __init__(self, headers: Sequence[str]):
+        self.headers = tuple(headers)
+        last = {name: i for i, name in enumerate(self.headers)}
+        self._keys = tuple(last)
+        # only repeated headers need their values picked out by position
+        self._indexes = None if len(last) == len(self.headers) else tuple(last.values())
+
+    def record(self, values: Sequence) -> Record:
+        n = len(self.headers)
+        if len(values) < n:
+            # short row: only the leading headers get values
+            return Record.from_dict(dict(zip(self.headers, values)))
+        if self._indexes is None:
+            return Record(self._keys, tuple(values[:n]))
+        return Record(self._keys, tuple(values[i] for i in self._indexes))
+
+
+def _default(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+# records handed to the JSON encoder per call; bounds what is buffered at once
+ENCODE_BATCH = 1000
+
+
+@dataclass(frozen=True)
+class EncodedRecords:
+    """Records together with the JSON array cell text they were encoded into.
+
+    ``spans`` holds the (start, end) offsets of each record's JSON within
+    ``text``, so a store that keeps records one by one slices them out
+    instead of decoding the array and encoding every record again.
+    """
+
+    text: str
+    records: tuple
+    spans: Tuple[Tuple[int, int], ...]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def encoded(self) -> Iterator[str]:
+        """Yield the JSON text of each record."""
+        text = self.text
+        return (text[start:end] for start, end in self.spans)
+
+
+def encode_records(records: Iterable) -> str:
+    """Serialize records as one compact JSON array, consuming them lazily.
+
+    Readers decode the whole cell with a single ``json.loads``.
+    """
+    out = StringIO()
+    out.write("[")
+    records = iter(records)
+    first = True
+    while True:
+        batch = list(islice(records, ENCODE_BATCH))
+        if not batch:
+            break
+        if not first:
+            out.write(",")
+        # encode the batch as an array and keep only its elements
+        out.write(_ENCODER.encode(batch)[1:-1])
+        first = False
+    out.write("]")
+    return out.getvalue()
+
+
+def encode_record_list(records: Iterable) -> EncodedRecords:
+    """Serialize records like ``encode_records``, keeping them and each one's offsets.
+
+    Records are encoded one at a time, which is slower than the batched
+    encoder, so use this only where the per-record text is needed.
+    """
+    kept, parts, spans = [], [], []
+    # the first record starts after the opening bracket
+    start = 1
+    for record in records:
+        part = _ENCODER.encode(record)
+        kept.append(record)
+        parts.append(part)
+        spans.append((start, start + len(part)))
+        start += len(part) + 1
+    return EncodedRecords("[" + ",".join(parts) + "]", tuple(kept), tuple(spans))
@@ -0,0 +1,149 @@
+import hashlib
+import io
+import mmap
+import os
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+# default size of the blocks uploads are read and staged in
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def iter_blocks(
+    source: Union[BinaryIO, Iterable[bytes]], block_size: int = DEFAULT_BLOCK_SIZE
+) -> Iterator[bytes]:
+    """Yield the contents of a file-like object or byte iterable in fixed-size blocks.
+
+    Only the final block may be shorter than ``block_size``.
+    """
+    if hasattr(source, "read"):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return
+            yield block
+
+    buffer = bytearray()
+    for chunk in source:
+        buffer += chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def sha256_of(stream: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE) -> str:
+    """Hash a seekable stream from the start and rewind it afterwards."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for block in iter_blocks(stream, block_size):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class MappedFile(io.RawIOBase):
+    """Read-only, seekable file object over a memory map; reads slice the map."""
+
+    def __init__(self, mapped: mmap.mmap):
+        self._map = mapped
+        self._view = memoryview(mapped)
+        self._pos = 0
+
+    @property
+    def buffer(self) -> memoryview:
+        """The mapped bytes; slicing it does not copy."""
+        return self._view
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._pos : self._pos + len(buffer)]
+        n = len(chunk)
+        buffer[:n] = chunk
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._view.release()
+                self._map.close()
+            finally:
+                super().close()
+
+
+def map_file(fd: int) -> BinaryIO:
+    """Return a buffered, read-only reader over a memory map of an open file.
+
+    The map stays valid after ``fd`` is closed or the file is unlinked.
+    """
+    if os.fstat(fd).st_size == 0:
+        # empty files cannot be mapped
+        return io.BytesIO()
+    return io.BufferedReader(MappedFile(mmap.mmap(fd, 0, access=mmap.ACCESS_READ)))
+
+
+def mapped_buffer(stream: BinaryIO) -> Optional[memoryview]:
+    """Return the memory map behind a reader from ``map_file``, or None."""
+    raw = getattr(stream, "raw", None)
+    return raw.buffer if isinstance(raw, MappedFile) else None
+
+
+def positional_blocks(
+    stream: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE
+) -> Optional[Iterator[bytes]]:
+    """Yield a stream's contents without using its file position, or return None.
+
+    In-memory buffers are sliced and real files are read with ``os.pread``,
+    so another thread can keep seeking and reading the same stream meanwhile.
+    """
+    mapped = mapped_buffer(stream)
+    if mapped is not None:
+        return _slice_blocks(mapped, block_size)
+    # SpooledTemporaryFile keeps its data in a BytesIO until it rolls over to disk
+    raw = getattr(stream, "_file", stream)
+    if hasattr(raw, "getbuffer"):
+        return _slice_blocks(raw.getvalue(), block_size)
+    try:
+        fd = raw.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    return _pread_blocks(fd, block_size)
+
+
+def _slice_blocks(data: Union[bytes, memoryview], block_size: int) -> Iterator[bytes]:
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    for start in range(0, len(view), block_size):
+        # release each slice before yielding: a generator abandoned mid-way, for
+        # example by a failed upload, must not keep the memory map from closing
+        with view[start : start + block_size] as block:
+            chunk = bytes(block)
+        yield chunk
+
+
+def _pread_blocks(fd: int, block_size: int) -> Iterator[bytes]:
+    offset = 0
+    while True:
+        block = os.pread(fd, block_size, offset)
+        if not block:
+            return
+        offset += len(block)
+        yield block
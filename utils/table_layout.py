@@ -0,0 +1,104 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+# patterns shared by the PDF and DOCX table detection, compiled once
+MULTI_SPACE = re.compile(r"\s{2,}")
+WHITESPACE = re.compile(r"\s+")
+PIPE = re.compile(r"\|")
+NON_SPACE_RUN = re.compile(r"\S+")
+KV_SEPARATOR = re.compile(r"[;,]\s*")
+ALPHA = re.compile(r"[A-Za-z]")
+DIGITS = re.compile(r"\d+")
+NUMBER = re.compile(r"\d+(\.\d+)?")
+
+# minimum run of all-blank character positions that separates two columns
+MIN_COLUMN_GAP = 2
+
+Column = Tuple[int, int]
+
+
+def split_raw(line: str, delimiter: str = " ") -> List[str]:
+    """Split a line on tab ("\\t"), pipe ("|") or runs of 2+ whitespace (" ")."""
+    if delimiter == "\t":
+        return line.split("\t")
+    if delimiter == "|":
+        return PIPE.split(line)
+    return MULTI_SPACE.split(line)
+
+
+def split_cells(line: str, delimiter: str = " ") -> List[str]:
+    """Split a line like ``split_raw`` and drop empty cells."""
+    return [p.strip() for p in split_raw(line, delimiter) if p.strip()]
+
+
+def detect_delimiter(line: str) -> Optional[str]:
+    """Return the delimiter a line uses ("\\t", "|" or " "), or None."""
+    if "\t" in line:
+        return "\t"
+    if "|" in line:
+        return "|"
+    if MULTI_SPACE.search(line):
+        return " "
+    return None
+
+
+def infer_columns(lines: Sequence[str], min_gap: int = MIN_COLUMN_GAP) -> List[Column]:
+    """Infer column spans from a whitespace occupancy profile of all lines.
+
+    Every non-space run of every line marks its character positions as
+    occupied in a single pass; runs of at least ``min_gap`` positions that
+    are blank on every line separate the columns. Lines containing tabs do
+    not have stable character offsets and yield no columns.
+    """
+    if not lines or any("\t" in line for line in lines):
+        return []
+    width = max(len(line) for line in lines)
+    occupied = bytearray(width)
+    for line in lines:
+        for m in NON_SPACE_RUN.finditer(line):
+            occupied[m.start():m.end()] = b"\x01" * (m.end() - m.start())
+
+    columns = []
+    start = None
+    gap = 0
+    for pos, used in enumerate(occupied):
+        if used:
+            if start is None:
+                start = pos
+            elif gap >= min_gap:
+                columns.append((start, pos - gap))
+                start = pos
+            gap = 0
+        elif start is not None:
+            gap += 1
+    if start is not None:
+        columns.append((start, width - gap))
+    return columns
+
+
+def slice_row(line: str, columns: Sequence[Column]) -> List[str]:
+    """Cut a line into cells at the given column spans."""
+    cells = []
+    for i, (start, _) in enumerate(columns):
+        # each cell runs up to the next column so overhanging text is kept
+        stop = columns[i + 1][0] if i + 1 < len(columns) else None
+        cells.append(line[start:stop].strip())
+    return cells
+
+
+def aligned_layout(header: str, rows: Sequence[str]) -> Optional[List[Column]]:
+    """Return column spans when header and rows are laid out in fixed columns.
+
+    The layout is only trusted when it has at least two columns, agrees with
+    the header's own delimiter split and gives every column a header, so
+    free-flowing text falls back to delimiter splitting.
+    """
+    columns = infer_columns([header, *rows])
+    if len(columns) < 2:
+        return None
+    header_cells = slice_row(header, columns)
+    if not all(header_cells):
+        return None
+    if len(header_cells) != len(split_cells(header)):
+        return None
+    return columns
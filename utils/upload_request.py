@@ -0,0 +1,28 @@
+import tempfile
+from io import BytesIO
+from typing import BinaryIO, Optional
+
+from flask import Request
+
+from app.utils.parse_session import UPLOAD_SPILL_DIR, UPLOAD_SPILL_THRESHOLD
+
+
+class UploadRequest(Request):
+    """Request that writes large uploaded files straight to a named temporary file.
+
+    Werkzeug spools files to an anonymous temporary file; a named one can be
+    memory-mapped by the parse session and opened by the PDF page workers
+    without copying the document into their arguments.
+    """
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ) -> BinaryIO:
+        size = content_length or total_content_length
+        if size is not None and size < UPLOAD_SPILL_THRESHOLD:
+            return BytesIO()
+        return tempfile.NamedTemporaryFile("rb+", prefix="upload-", dir=UPLOAD_SPILL_DIR)
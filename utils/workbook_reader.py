@@ -0,0 +1,249 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# longest string an xlsx cell holds; openpyxl truncates longer values
+XLSX_CELL_MAX_CHARS = 32767
+# control characters an xlsx cell cannot hold; openpyxl refuses strings containing them
+XLSX_ILLEGAL_CHARACTERS = re.compile(r"[\000-\010\013\014\016-\037]")
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"\s*")
+
+# json_data cells that point at a separately stored payload start with this
+PAYLOAD_REFERENCE_PREFIX = '{"$payload":'
+
+# common column names that may contain transformed JSON
+JSON_COLUMNS = ("json_data", "transformed_data")
+META_COLUMNS = ("id", "filename", "file_type")
+
+
+def xlsx_safe(value):
+    """Return a cell value with characters xlsx cannot store replaced by U+FFFD."""
+    if isinstance(value, str):
+        return XLSX_ILLEGAL_CHARACTERS.sub("\ufffd", value)
+    return value
+
+
+def _decode_array_prefix(cell: str) -> list:
+    """Decode the leading complete elements of a JSON array that was cut short."""
+    values = []
+    pos = 1
+    while True:
+        pos = _WHITESPACE.match(cell, pos).end()
+        try:
+            value, pos = _DECODER.raw_decode(cell, pos)
+        except ValueError:
+            return values
+        values.append(value)
+        pos = _WHITESPACE.match(cell, pos).end()
+        if not cell.startswith(",", pos):
+            return values
+        pos += 1
+
+
+@dataclass(frozen=True)
+class PayloadReference:
+    """A json_data cell whose records are stored in their own blob.
+
+    The cell keeps the blob name and a summary of the payload, so the
+    workbook stays small; the records are loaded only when they are read.
+    ``records`` is None when the writer did not know the count.
+    """
+
+    name: str
+    encoding: str
+    records: Optional[int]
+    chars: int
+    bytes: int
+
+    def to_cell(self) -> str:
+        cell = {"$payload": self.name, "encoding": self.encoding}
+        if self.records is not None:
+            cell["records"] = self.records
+        cell["chars"] = self.chars
+        cell["bytes"] = self.bytes
+        return json.dumps(cell, separators=(",", ":"))
+
+
+def payload_reference(cell) -> Optional[PayloadReference]:
+    """Return the payload reference held by a json_data cell, or None for inline data."""
+    if not isinstance(cell, str) or not cell.startswith(PAYLOAD_REFERENCE_PREFIX):
+        return None
+    try:
+        value = json.loads(cell)
+        return PayloadReference(
+            name=value["$payload"],
+            encoding=value.get("encoding", "identity"),
+            records=value.get("records"),
+            chars=value.get("chars", 0),
+            bytes=value.get("bytes", 0),
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def decode_json_cell(cell) -> list:
+    """Decode a transformed-data cell holding NDJSON or a JSON array."""
+    if not cell:
+        return []
+    if not isinstance(cell, str):
+        # non-string (unlikely) - include raw
+        return [cell]
+    if cell.startswith("["):
+        # cells are written as one JSON array, decoded in a single pass
+        try:
+            val = json.loads(cell)
+        except ValueError:
+            # xlsx cells are cut at 32767 characters; keep the complete records
+            if len(cell) >= XLSX_CELL_MAX_CHARS:
+                return _decode_array_prefix(cell)
+        else:
+            if isinstance(val, list):
+                return val
+    lines = [l for l in cell.splitlines() if l.strip()]
+    parsed = []
+    for ln in lines:
+        try:
+            val = json.loads(ln)
+        except Exception:
+            # if the cell is a JSON array
+            try:
+                val = json.loads(cell)
+                if isinstance(val, list):
+                    parsed.extend(val)
+                    break
+            except Exception:
+                val = ln
+        if isinstance(val, list):
+            parsed.extend(val)
+        else:
+            parsed.append(val)
+    return parsed
+
+
+class EntryDecoder:
+    """Turns workbook rows into entry dicts using the header row layout.
+
+    A json_data cell referring to an offloaded payload is decoded to its
+    PayloadReference; the caller loads the records from storage.
+    """
+
+    def __init__(self, headers):
+        self.headers = list(headers)
+        json_cols = [name for name in JSON_COLUMNS if name in self.headers]
+        self.json_col_idx = self.headers.index(json_cols[0]) if json_cols else None
+        # locate id/filename/file_type indices if present
+        self.id_idx = self._index("id")
+        self.filename_idx = self._index("filename")
+        self.filetype_idx = self._index("file_type")
+
+    def _index(self, name: str) -> Optional[int]:
+        return self.headers.index(name) if name in self.headers else None
+
+    def decode_document(self, row) -> dict:
+        """Return only the id, filename and file_type of a row."""
+        return {
+            "id": row[self.id_idx] if self.id_idx is not None else None,
+            "filename": row[self.filename_idx] if self.filename_idx is not None else None,
+            "file_type": row[self.filetype_idx] if self.filetype_idx is not None else None,
+        }
+
+    @property
+    def document_columns(self) -> int:
+        """Number of leading columns that hold every document column."""
+        indexes = [i for i in (self.id_idx, self.filename_idx, self.filetype_idx) if i is not None]
+        return max(indexes) + 1 if indexes else 1
+
+    def decode(self, row) -> dict:
+        entry = {
+            "id": row[self.id_idx] if self.id_idx is not None else None,
+            "filename": row[self.filename_idx] if self.filename_idx is not None else None,
+            "file_type": row[self.filetype_idx] if self.filetype_idx is not None else None,
+            "transformed_data": [],
+        }
+        if self.json_col_idx is not None:
+            cell = row[self.json_col_idx]
+            # offloaded payloads are left as references for the repository to load
+            reference = payload_reference(cell)
+            entry["transformed_data"] = (
+                reference if reference is not None else decode_json_cell(cell)
+            )
+        else:
+            # reconstruct object from all columns except id/filename/file_type
+            entry["transformed_data"] = [
+                {k: val for k, val in zip(self.headers, row) if k not in META_COLUMNS}
+            ]
+        return entry
+
+
+def read_entries(
+    stream: BinaryIO, offset: int = 0, limit: Optional[int] = None
+) -> Tuple[List[dict], int]:
+    """Decode one page of workbook entries and return it with the total entry count.
+
+    The workbook is opened in read-only mode and iteration stops once the page
+    is filled, so memory stays proportional to the page rather than the sheet.
+    """
+    stream.seek(0)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(stream, read_only=True)
+    try:
+        ws = wb.active
+        header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None)
+        if not header_row:
+            return [], 0
+
+        max_row = ws.max_row
+        if max_row is None:
+            # sheet has no dimension record; count rows without decoding them
+            max_row = sum(1 for _ in ws.iter_rows(values_only=True))
+        total = max(max_row - 1, 0)
+
+        decoder = EntryDecoder(header_row)
+        first_row = offset + 2
+        last_row = offset + 1 + limit if limit is not None else None
+        entries = [
+            decoder.decode(r)
+            for r in ws.iter_rows(min_row=first_row, max_row=last_row, values_only=True)
+        ]
+        return entries, total
+    finally:
+        wb.close()
+
+
+def iter_entries(stream: BinaryIO) -> Iterator[dict]:
+    """Decode every workbook entry lazily, holding one row at a time."""
+    stream.seek(0)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(stream, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if not header_row:
+            return
+        decoder = EntryDecoder(header_row)
+        for row in rows:
+            yield decoder.decode(row)
+    finally:
+        wb.close()
+
+
+def iter_documents(stream: BinaryIO) -> Iterator[dict]:
+    """Yield the document columns of every workbook entry; json_data is not read."""
+    stream.seek(0)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(stream, read_only=True)
+    try:
+        ws = wb.active
+        header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None)
+        if not header_row:
+            return
+        decoder = EntryDecoder(header_row)
+        for row in ws.iter_rows(min_row=2, max_col=decoder.document_columns, values_only=True):
+            yield decoder.decode_document(row)
+    finally:
+        wb.close()